@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-import discord
-
 from discord_guild_configurator.models import (
     Category,
     CommunityFeatures,
@@ -32,24 +30,23 @@ ROLE_SPONSORS = "Sponsors"
 ROLE_PARTICIPANTS = "Participants"
 ROLE_EVERYONE = "@everyone"
 ROLE_BEGINNERS_DAY = "Beginners Day"
-ROLES_COC = [ROLE_COC]
-ROLES_MODERATORS = [ROLE_MODERATORS, *ROLES_COC]
-ROLES_ORGANIZERS = [ROLE_ORGANIZERS, *ROLES_MODERATORS]
-ROLES_VOLUNTEERS = [ROLE_VOLUNTEERS, *ROLES_ORGANIZERS]
-ROLES_SPEAKERS = [ROLE_SPEAKERS, *ROLES_ORGANIZERS]
-ROLES_SPONSORS = [ROLE_SPONSORS, *ROLES_ORGANIZERS]
-ROLES_REGISTERED = [
-    ROLE_PARTICIPANTS,
-    ROLE_SPONSORS,
-    ROLE_SPEAKERS,
-    *ROLES_VOLUNTEERS,
-    ROLE_BEGINNERS_DAY,
-]
+# role groups, resolved by the configurator
+GROUP_MODERATORS = "moderators"
+GROUP_ORGANIZERS = "organizers"
+GROUP_VOLUNTEERS = "volunteers"
+GROUP_SPEAKERS = "speakers"
+GROUP_SPONSORS = "sponsors"
+GROUP_REGISTERED = "registered"
+# overwrite sets
+ONLY_REGISTERED = "only-registered"
+ONLY_UNREGISTERED = "only-unregistered"
+READ_ONLY = "read-only"
+SPEAKER_THREADS = "speaker-threads"
 CONFIG = GuildConfig(
-    verification_level=discord.VerificationLevel.medium,
-    default_notifications=discord.NotificationLevel.only_mentions,
-    explicit_content_filter=discord.ContentFilter.all_members,
-    preferred_locale=discord.Locale.american_english,
+    verification_level="medium",
+    default_notifications="only_mentions",
+    explicit_content_filter="all_members",
+    preferred_locale="american_english",
     roles=[
         Role(
             name=ROLE_COC,
@@ -140,6 +137,39 @@ CONFIG = GuildConfig(
             ],
         ),
     ],
+    role_groups={
+        GROUP_MODERATORS: [ROLE_MODERATORS, ROLE_COC],
+        GROUP_ORGANIZERS: [ROLE_ORGANIZERS, GROUP_MODERATORS],
+        GROUP_VOLUNTEERS: [ROLE_VOLUNTEERS, GROUP_ORGANIZERS],
+        GROUP_SPEAKERS: [ROLE_SPEAKERS, GROUP_ORGANIZERS],
+        GROUP_SPONSORS: [ROLE_SPONSORS, GROUP_ORGANIZERS],
+        GROUP_REGISTERED: [
+            ROLE_PARTICIPANTS,
+            ROLE_SPONSORS,
+            ROLE_SPEAKERS,
+            GROUP_VOLUNTEERS,
+            ROLE_BEGINNERS_DAY,
+        ],
+    },
+    overwrite_sets={
+        ONLY_REGISTERED: [
+            PermissionOverwrite(roles=[ROLE_EVERYONE], deny=["view_channel"]),
+            PermissionOverwrite(roles=[GROUP_REGISTERED], allow=["view_channel"]),
+        ],
+        ONLY_UNREGISTERED: [
+            PermissionOverwrite(roles=[GROUP_REGISTERED], deny=["view_channel"]),
+            PermissionOverwrite(roles=[GROUP_ORGANIZERS], allow=["view_channel"]),
+        ],
+        READ_ONLY: [
+            PermissionOverwrite(
+                roles=[ROLE_EVERYONE], deny=["send_messages", "create_public_threads"]
+            ),
+        ],
+        SPEAKER_THREADS: [
+            PermissionOverwrite(roles=[GROUP_REGISTERED], deny=["create_public_threads"]),
+            PermissionOverwrite(roles=[GROUP_SPEAKERS], allow=["create_public_threads"]),
+        ],
+    },
     system_channel=SystemChannel(
         name="system-events",
         guild_reminder_notifications=False,
@@ -253,7 +283,7 @@ CONFIG = GuildConfig(
                     require_tag=True,
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=ROLES_SPONSORS, allow=["send_messages", "create_public_threads"]
+                            roles=[GROUP_SPONSORS], allow=["send_messages", "create_public_threads"]
                         ),
                     ],
                 ),
@@ -344,10 +374,7 @@ CONFIG = GuildConfig(
                     ),
                 ),
             ],
-            permission_overwrites=[
-                PermissionOverwrite(roles=[ROLE_EVERYONE], deny=["view_channel"]),
-                PermissionOverwrite(roles=ROLES_REGISTERED, allow=["view_channel"]),
-            ],
+            overwrite_sets=[ONLY_REGISTERED],
         ),
         Category(
             name="Remote Attendees",
@@ -355,18 +382,12 @@ CONFIG = GuildConfig(
                 TextChannel(name="remote-text", topic="Text chat for remote attendees"),
                 VoiceChannel(name="remote-voice"),
             ],
-            permission_overwrites=[
-                PermissionOverwrite(roles=[ROLE_EVERYONE], deny=["view_channel"]),
-                PermissionOverwrite(roles=ROLES_REGISTERED, allow=["view_channel"]),
-            ],
+            overwrite_sets=[ONLY_REGISTERED],
         ),
         Category(
             name="Sponsors",
             channels=[],
-            permission_overwrites=[
-                PermissionOverwrite(roles=[ROLE_EVERYONE], deny=["view_channel"]),
-                PermissionOverwrite(roles=ROLES_REGISTERED, allow=["view_channel"]),
-            ],
+            overwrite_sets=[ONLY_REGISTERED],
         ),
         Category(
             name="Rooms",
@@ -402,16 +423,7 @@ CONFIG = GuildConfig(
                         - On desktop, you can open a forum thread in "full window mode" using the `...` option menu in the top bar.
                         - If you select to "follow" a thread, it will appear directly in your channel list.
                         """,  # noqa: E501 (line too long)
-                    permission_overwrites=[
-                        PermissionOverwrite(
-                            roles=ROLES_REGISTERED,
-                            deny=["create_public_threads"],
-                        ),
-                        PermissionOverwrite(
-                            roles=ROLES_SPEAKERS,
-                            allow=["create_public_threads"],
-                        ),
-                    ],
+                    overwrite_sets=[SPEAKER_THREADS],
                 ),
                 ForumChannel(
                     name="sprints",
@@ -443,22 +455,10 @@ CONFIG = GuildConfig(
                         - Only create a single post per talk!
                         - Participants can't send messages in the thread.
                         """,  # noqa: E501 (line too long)
-                    permission_overwrites=[
-                        PermissionOverwrite(
-                            roles=ROLES_REGISTERED,
-                            deny=["create_public_threads"],
-                        ),
-                        PermissionOverwrite(
-                            roles=ROLES_SPEAKERS,
-                            allow=["create_public_threads"],
-                        ),
-                    ],
+                    overwrite_sets=[SPEAKER_THREADS],
                 ),
             ],
-            permission_overwrites=[
-                PermissionOverwrite(roles=[ROLE_EVERYONE], deny=["view_channel"]),
-                PermissionOverwrite(roles=ROLES_REGISTERED, allow=["view_channel"]),
-            ],
+            overwrite_sets=[ONLY_REGISTERED],
         ),
         Category(
             name="Conference Organization",
@@ -472,7 +472,7 @@ CONFIG = GuildConfig(
                     ),
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=ROLES_VOLUNTEERS,
+                            roles=[GROUP_VOLUNTEERS],
                             allow=["view_channel"],
                         ),
                     ],
@@ -484,7 +484,7 @@ CONFIG = GuildConfig(
                     ),
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=ROLES_VOLUNTEERS,
+                            roles=[GROUP_VOLUNTEERS],
                             allow=["view_channel"],
                         ),
                     ],
@@ -496,7 +496,7 @@ CONFIG = GuildConfig(
                     ),
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=[*ROLES_SPONSORS, *ROLES_VOLUNTEERS],
+                            roles=[GROUP_SPONSORS, GROUP_VOLUNTEERS],
                             allow=["view_channel"],
                         ),
                     ],
@@ -509,7 +509,7 @@ CONFIG = GuildConfig(
                     ),
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=[*ROLES_SPEAKERS, *ROLES_VOLUNTEERS],
+                            roles=[GROUP_SPEAKERS, GROUP_VOLUNTEERS],
                             allow=["view_channel"],
                         ),
                     ],
@@ -522,7 +522,7 @@ CONFIG = GuildConfig(
                     ),
                     permission_overwrites=[
                         PermissionOverwrite(
-                            roles=ROLES_MODERATORS,
+                            roles=[GROUP_MODERATORS],
                             allow=["view_channel"],
                         ),
                     ],
@@ -549,24 +549,12 @@ CONFIG = GuildConfig(
                         If you encounter any problems with registration, please ask in <<#registration-help>>.
                         """,  # noqa: E501 (line too long)
                     ],
-                    permission_overwrites=[
-                        PermissionOverwrite(
-                            roles=[ROLE_EVERYONE], deny=["send_messages", "create_public_threads"]
-                        ),
-                        PermissionOverwrite(roles=ROLES_REGISTERED, deny=["view_channel"]),
-                        PermissionOverwrite(roles=ROLES_ORGANIZERS, allow=["view_channel"]),
-                    ],
+                    overwrite_sets=[READ_ONLY, ONLY_UNREGISTERED],
                 ),
                 TextChannel(
                     name="registration-form",
                     topic="Please follow the registration instructions.",
-                    permission_overwrites=[
-                        PermissionOverwrite(
-                            roles=[ROLE_EVERYONE], deny=["send_messages", "create_public_threads"]
-                        ),
-                        PermissionOverwrite(roles=ROLES_REGISTERED, deny=["view_channel"]),
-                        PermissionOverwrite(roles=ROLES_ORGANIZERS, allow=["view_channel"]),
-                    ],
+                    overwrite_sets=[READ_ONLY, ONLY_UNREGISTERED],
                 ),
                 ForumChannel(
                     name="registration-help",
@@ -575,10 +563,7 @@ CONFIG = GuildConfig(
 
                         As this community is only intended for EuroPython participants, there are no public discussion channels.
                         """,  # noqa: E501 (line too long)
-                    permission_overwrites=[
-                        PermissionOverwrite(roles=ROLES_REGISTERED, deny=["view_channel"]),
-                        PermissionOverwrite(roles=ROLES_ORGANIZERS, allow=["view_channel"]),
-                    ],
+                    overwrite_sets=[ONLY_UNREGISTERED],
                 ),
                 TextChannel(
                     name="registration-log",
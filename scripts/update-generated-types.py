@@ -1,4 +1,3 @@
-# ruff: noqa: F541
 """Generate types based on Discord API."""
 
 from pathlib import Path
@@ -10,44 +9,43 @@ import discord_guild_configurator
 generated_file = Path(discord_guild_configurator.__file__).parent / "generated_models.py"
 
 
-def generate_flag_lines(flags_cls: type[discord.flags.BaseFlags]) -> list[str]:
+def generate_flag_lines(flags_cls: type[discord.flags.BaseFlags], values_name: str) -> list[str]:
+    # bit of each flag, aliases share the same bit
+    name = flags_cls.__name__
     return [
-        f"{flags_cls.__name__} = Literal[",
+        f"{name} = Literal[",
         *(f'    "{option}",' for option in sorted(flags_cls.VALID_FLAGS)),
         "]",
+        f"{values_name}: Final[dict[{name}, int]] = {{",
+        *(
+            f'    "{option}": 1 << {flags_cls.VALID_FLAGS[option].bit_length() - 1},'
+            for option in sorted(flags_cls.VALID_FLAGS)
+        ),
+        "}",
     ]
 
 
-def generate_enum_annotated_lines(enum_cls: type[discord.Enum]) -> list[str]:
+def generate_enum_lines(enum_cls: type[discord.Enum], values_name: str) -> list[str]:
+    # static tables, so the models can be used without importing discord.py
     name = enum_cls.__name__
     return [
-        f"{name} = Annotated[",
-        f"    discord.{name},",
-        f"    pydantic.PlainValidator(",
-        f"        lambda value: discord.{name}[value] if isinstance(value, str) else value",
-        f"    ),",
-        f"    pydantic.PlainSerializer(lambda value: value.name),",
-        f"    pydantic.Field(",
-        f"        json_schema_extra={{",
-        f'            "enum": [option.name for option in discord.{name}],',
-        f'            "type": "string",',
-        f"        }},",
-        f"    ),",
-        f"]",
+        f"{name} = Literal[",
+        *(f'    "{option.name}",' for option in enum_cls),
+        "]",
+        f"{values_name}: Final[dict[{name}, {type(next(iter(enum_cls)).value).__name__}]] = {{",
+        *(f'    "{option.name}": {option.value!r},' for option in enum_cls),
+        "}",
     ]
 
 
 lines: list[str] = [
-    "from typing import Annotated, Literal",
-    "",
-    "import discord",
-    "import pydantic",
+    "from typing import Final, Literal",
     "",
-    *generate_flag_lines(discord.Permissions),
-    *generate_enum_annotated_lines(discord.VerificationLevel),
-    *generate_enum_annotated_lines(discord.NotificationLevel),
-    *generate_enum_annotated_lines(discord.Locale),
-    *generate_enum_annotated_lines(discord.ContentFilter),
+    *generate_flag_lines(discord.Permissions, "PERMISSION_VALUES"),
+    *generate_enum_lines(discord.VerificationLevel, "VERIFICATION_LEVEL_VALUES"),
+    *generate_enum_lines(discord.NotificationLevel, "NOTIFICATION_LEVEL_VALUES"),
+    *generate_enum_lines(discord.Locale, "LOCALE_VALUES"),
+    *generate_enum_lines(discord.ContentFilter, "CONTENT_FILTER_VALUES"),
     "",
 ]
 
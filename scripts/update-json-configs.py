@@ -1,34 +1,151 @@
-"""Update JSON configs from Python config files."""
+"""Update JSON configs from Python config files.
 
+Each config module is only rebuilt if it, one of the config modules it imports, or the
+'discord_guild_configurator' package changed since the last build. Modules are built in
+parallel processes.
+
+For each config, this writes:
+- configs/<name>.json: the JSON config
+- build/configs/<name>.payload.json: the compiled guild creation payload (not committed)
+
+Only successful builds are cached. Exits with a non-zero status if any config failed to build.
+"""
+
+import ast
+import hashlib
 import importlib
+import json
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import discord_guild_configurator
+from discord_guild_configurator.bootstrap import GuildPayloadCompiler
 from discord_guild_configurator.models import GuildConfig
 
-configs_dir = Path(__file__).parent.parent / "configs"
-sys.path.append(str(configs_dir.absolute()))
+root_dir = Path(__file__).parent.parent
+configs_dir = root_dir / "configs"
+build_dir = root_dir / "build" / "configs"
+cache_file = build_dir / "cache.json"
+package_dir = Path(discord_guild_configurator.__file__).parent
+
+
+def hash_package() -> str:
+    package_hash = hashlib.sha256()
+    for source_file in sorted(package_dir.glob("*.py")):
+        package_hash.update(source_file.name.encode("UTF-8"))
+        package_hash.update(source_file.read_bytes())
+    return package_hash.hexdigest()
+
+
+def get_local_imports(config_py_file: Path) -> set[Path]:
+    """Find all config modules which are imported by a config module, recursively."""
+    imported_files = set()
+    unvisited_files = [config_py_file]
+    while unvisited_files:
+        tree = ast.parse(unvisited_files.pop().read_bytes())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                module_names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module is not None:
+                module_names = [node.module]
+            else:
+                continue
+            for module_name in module_names:
+                imported_file = configs_dir / f"{module_name}.py"
+                if imported_file.exists() and imported_file not in imported_files:
+                    imported_files.add(imported_file)
+                    unvisited_files.append(imported_file)
+    return imported_files
+
+
+def hash_inputs(config_py_file: Path, package_hash: str) -> str:
+    input_hash = hashlib.sha256(package_hash.encode("UTF-8"))
+    for source_file in sorted({config_py_file, *get_local_imports(config_py_file)}):
+        input_hash.update(source_file.name.encode("UTF-8"))
+        input_hash.update(source_file.read_bytes())
+    # manually edited outputs are rebuilt
+    for output_file in get_output_files(config_py_file):
+        if output_file.exists():
+            input_hash.update(output_file.read_bytes())
+    return input_hash.hexdigest()
+
+
+def get_output_files(config_py_file: Path) -> tuple[Path, Path]:
+    return (
+        config_py_file.with_suffix(".json"),
+        build_dir / f"{config_py_file.stem}.payload.json",
+    )
 
-for config_py_file in Path("configs").glob("*.py"):
+
+def write_if_changed(path: Path, content: str) -> bool:
+    if not content.endswith("\n"):
+        content += "\n"
+    if path.exists() and path.read_text(encoding="UTF-8") == content:
+        return False
+    path.write_text(content, encoding="UTF-8")
+    return True
+
+
+def build_config(config_py_file: Path) -> tuple[bool, str]:
+    """Build a single config module, runs in a worker process.
+
+    Returns whether the build succeeded, and a message to print.
+    """
+    sys.path.append(str(configs_dir.absolute()))
     config_module = importlib.import_module(config_py_file.stem)
     config = getattr(config_module, "CONFIG", None)
 
     if config is None:
-        print(f"{config_py_file.name}: No variable 'CONFIG' found")
-        continue
-
+        return False, f"{config_py_file.name}: No variable 'CONFIG' found"
     if not isinstance(config, GuildConfig):
-        print(f"{config_py_file.name}: Variable 'CONFIG' is not of type GuildConfig")
-        continue
+        return False, f"{config_py_file.name}: Variable 'CONFIG' is not of type GuildConfig"
+
+    config_json_file, payload_file = get_output_files(config_py_file)
+    payload = GuildPayloadCompiler(config).compile(name=config_py_file.stem)
+    write_if_changed(payload_file, json.dumps(payload, indent=2))
+
+    if not write_if_changed(config_json_file, config.model_dump_json(indent=2)):
+        return True, f"JSON config is up-to-date: {config_json_file.name}"
+    return True, f"Updated JSON config: {config_json_file.name}"
+
+
+def main() -> int:
+    build_dir.mkdir(parents=True, exist_ok=True)
+    cache: dict[str, str] = {}
+    if cache_file.exists():
+        cache = json.loads(cache_file.read_text(encoding="UTF-8"))
+
+    package_hash = hash_package()
+    outdated_files = []
+    for config_py_file in sorted(configs_dir.glob("*.py")):
+        if cache.get(config_py_file.name) == hash_inputs(config_py_file, package_hash):
+            print(f"JSON config is up-to-date: {config_py_file.with_suffix('.json').name}")
+        else:
+            outdated_files.append(config_py_file)
+
+    failed = False
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(build_config, config_py_file) for config_py_file in outdated_files
+        ]
+        for config_py_file, future in zip(outdated_files, futures, strict=True):
+            try:
+                success, message = future.result()
+            except Exception as error:  # noqa: BLE001 (e.g., errors in the config module)
+                success, message = False, f"{config_py_file.name}: {error!r}"
+            print(message)
+            if success:
+                # hashed after building, so the hash includes the new outputs
+                cache[config_py_file.name] = hash_inputs(config_py_file, package_hash)
+            else:
+                # failed builds are retried next time
+                cache.pop(config_py_file.name, None)
+                failed = True
 
-    new_config_str = config.model_dump_json(indent=2)
-    if not new_config_str.endswith("\n"):
-        new_config_str += "\n"
+    cache_file.write_text(json.dumps(cache, indent=2, sort_keys=True) + "\n", encoding="UTF-8")
+    return 1 if failed else 0
 
-    config_json_file = config_py_file.with_suffix(".json")
-    if config_json_file.exists() and config_json_file.read_text(encoding="UTF-8") == new_config_str:
-        print(f"JSON config is up-to-date: {config_json_file.name}")
-        continue
 
-    config_json_file.write_text(new_config_str, encoding="UTF-8")
-    print(f"Updated JSON config: {config_json_file.name}")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Final
+
+import discord
+from discord.http import Route
+
+from discord_guild_configurator.generated_models import (
+    CONTENT_FILTER_VALUES,
+    NOTIFICATION_LEVEL_VALUES,
+    VERIFICATION_LEVEL_VALUES,
+)
+from discord_guild_configurator.models import (
+    ForumChannel,
+    TextChannel,
+    VoiceChannel,
+)
+
+if TYPE_CHECKING:
+    from discord_guild_configurator.configurator import Phase
+    from discord_guild_configurator.models import (
+        ChannelTemplate,
+        GuildConfig,
+        OverwriteMasks,
+        Role,
+    )
+
+logger = logging.getLogger(__name__)
+
+# placeholder ID of '@everyone', which is the first role of the payload
+EVERYONE_PLACEHOLDER_ID: Final = 0
+
+# phases for everything the guild creation payload cannot express:
+# - system channel and 'COMMUNITY' settings
+# - forum tags and the 'require_tag' flag (via 'channels', which also fixes positions)
+# - default messages
+BOOTSTRAP_PHASES: Final[tuple[Phase, ...]] = ("system-channel", "community", "channels", "messages")
+
+# overwrite types: 0 = role, 1 = member
+ROLE_OVERWRITE_TYPE: Final = 0
+
+
+class GuildPayloadCompiler:
+    def __init__(self, template: GuildConfig) -> None:
+        """Compile a guild configuration to a payload for creating a guild with one request.
+
+        The payload follows the format of 'POST /guilds', which is also used by guild templates.
+        Roles and channels reference each other via integer placeholder IDs, which Discord
+        replaces by real IDs.
+        """
+        self.template: Final[GuildConfig] = template
+        self._role_ids: Final[dict[str, int]] = {"@everyone": EVERYONE_PLACEHOLDER_ID}
+        self._next_id = EVERYONE_PLACEHOLDER_ID + 1
+
+    def _new_placeholder_id(self) -> int:
+        placeholder_id = self._next_id
+        self._next_id += 1
+        return placeholder_id
+
+    def compile(self, *, name: str) -> dict[str, Any]:
+        return {
+            "name": name,
+            "roles": self.compile_roles(),
+            "channels": self.compile_channels(),
+            "verification_level": VERIFICATION_LEVEL_VALUES[self.template.verification_level],
+            "default_message_notifications": NOTIFICATION_LEVEL_VALUES[
+                self.template.default_notifications
+            ],
+            "explicit_content_filter": CONTENT_FILTER_VALUES[self.template.explicit_content_filter],
+        }
+
+    def compile_roles(self) -> list[dict[str, Any]]:
+        # the first role is always '@everyone', of which only the permissions can be configured
+        everyone_role: dict[str, Any] = {"id": EVERYONE_PLACEHOLDER_ID}
+        roles = [everyone_role]
+        for role_template in self.template.roles:
+            if role_template.name == "@everyone":
+                everyone_role["permissions"] = self._compile_permissions(role_template)
+                continue
+
+            placeholder_id = self._new_placeholder_id()
+            self._role_ids[role_template.name] = placeholder_id
+            roles.append(
+                {
+                    "id": placeholder_id,
+                    "name": role_template.name,
+                    "color": discord.Color.from_str(role_template.color).value,
+                    "hoist": role_template.hoist,
+                    "mentionable": role_template.mentionable,
+                    "permissions": self._compile_permissions(role_template),
+                }
+            )
+        return roles
+
+    @staticmethod
+    def _compile_permissions(role_template: Role) -> str:
+        return str(role_template.permissions_mask)
+
+    def compile_channels(self) -> list[dict[str, Any]]:
+        # categories must be listed before their channels
+        channels = []
+        for category_template in self.template.categories:
+            category_id = self._new_placeholder_id()
+            channels.append(
+                {
+                    "id": category_id,
+                    "name": category_template.name,
+                    "type": discord.ChannelType.category.value,
+                }
+            )
+            channels.extend(
+                self.compile_channel(
+                    channel_template,
+                    parent_id=category_id,
+                    permission_overwrites=self.compile_overwrites(
+                        self.template.get_overwrite_masks(channel_template)
+                    ),
+                )
+                for channel_template in category_template.channels
+            )
+        return channels
+
+    def compile_channel(
+        self,
+        channel_template: ChannelTemplate,
+        *,
+        parent_id: int,
+        permission_overwrites: list[dict[str, Any]],
+    ) -> dict[str, Any]:
+        channel: dict[str, Any] = {
+            "id": self._new_placeholder_id(),
+            "name": channel_template.name,
+            "parent_id": parent_id,
+            "permission_overwrites": permission_overwrites,
+        }
+        if isinstance(channel_template, TextChannel):
+            channel["type"] = discord.ChannelType.text.value
+            channel["topic"] = channel_template.topic
+        elif isinstance(channel_template, ForumChannel):
+            # forum tags are not part of the payload
+            channel["type"] = discord.ChannelType.forum.value
+            channel["topic"] = channel_template.topic
+        elif isinstance(channel_template, VoiceChannel):
+            channel["type"] = discord.ChannelType.voice.value
+        return channel
+
+    def compile_overwrites(self, overwrite_masks: OverwriteMasks) -> list[dict[str, Any]]:
+        overwrites = []
+        for role_name, (allow, deny) in overwrite_masks.items():
+            overwrites.append(
+                {
+                    "id": self._role_ids[role_name],
+                    "type": ROLE_OVERWRITE_TYPE,
+                    "allow": str(allow),
+                    "deny": str(deny),
+                }
+            )
+        return overwrites
+
+
+async def create_guild(payload: dict[str, Any], token: str) -> int:
+    """Create a guild with a single request and return its ID.
+
+    Discord only allows bots which are member of less than 10 guilds to create guilds.
+    """
+    async with discord.Client(intents=discord.Intents.none()) as client:
+        await client.login(token)
+        logger.info("Creating guild %s", payload["name"])
+        data = await client.http.request(Route("POST", "/guilds"), json=payload)
+    return int(data["id"])
@@ -8,6 +8,8 @@ import discord
 from discord import Guild
 from discord.ext.commands import Bot
 
+from discord_guild_configurator.logs import log_context
+
 if TYPE_CHECKING:
     from collections.abc import Awaitable, Callable
 
@@ -16,31 +18,53 @@ logger = logging.getLogger(__name__)
 
 
 class GuildConfigurationBot(Bot):
-    def __init__(self, guild_id: int, action: Callable[[Guild], Awaitable[None]]) -> None:
-        """Discord bot which exports all guild members to .csv files and then stops itself."""
+    def __init__(
+        self,
+        guild_id: int,
+        action: Callable[[Guild], Awaitable[None]],
+        *,
+        close_after_action: bool = True,
+        cache_members: bool = True,
+    ) -> None:
+        """Discord bot which runs an action on a guild and then stops itself.
+
+        If `close_after_action` is False, the bot stays connected after the action is done.
+        If `cache_members` is False, guild members are neither requested on startup nor cached.
+        """
         intents = discord.Intents.all()
         intents.presences = False
-        super().__init__(intents=intents, command_prefix="$")
+        if cache_members:
+            super().__init__(intents=intents, command_prefix="$")
+        else:
+            super().__init__(
+                intents=intents,
+                command_prefix="$",
+                member_cache_flags=discord.MemberCacheFlags.none(),
+                chunk_guilds_at_startup=False,
+            )
 
         self.guild_id: Final[int] = guild_id
         self.action: Final[Callable[[Guild], Awaitable[None]]] = action
+        self.close_after_action: Final[bool] = close_after_action
 
     async def on_ready(self) -> None:
         """Event handler for successful connection."""
         guild = self.get_guild(self.guild_id)
         if guild is None:
             raise RuntimeError(f"Could not find guild with ID {self.guild_id}")
-        await self.action(guild)
+        with log_context(guild=guild.id):
+            await self.action(guild)
 
-        await self.close()
+        if self.close_after_action:
+            await self.close()
 
     async def on_error(self, event: str, /, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401 (Any)
         """Event handler for uncaught exceptions."""
         exc_type, exc_value, _exc_traceback = sys.exc_info()
         if exc_type is None:
-            logger.error(f"Unknown error during {event}(*{args}, **{kwargs})")
+            logger.error("Unknown error during %s(*%s, **%s)", event, args, kwargs)
         else:
-            logger.error(f"{exc_type.__name__} {exc_value}")
+            logger.error("%s %s", exc_type.__name__, exc_value)
 
         # let discord.py log the exception
         await super().on_error(event, *args, **kwargs)
@@ -48,7 +72,7 @@ class GuildConfigurationBot(Bot):
         await self.close()
 
 
-async def run_bot(bot: Bot, token: str) -> None:
+async def run_bot(bot: discord.Client, token: str) -> None:
     """Run a Discord bot."""
     async with bot as _bot:
         try:
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, TextIO
+
+from discord_guild_configurator.models import (
+    Category,
+    GuildConfig,
+    GuildSettings,
+    get_template_key,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+# chunked configurations are either an NDJSON file or a directory with this settings file
+NDJSON_SUFFIX: Final = ".ndjson"
+SETTINGS_FILE_NAME: Final = "guild.json"
+
+# characters which are replaced in file names of category chunks
+UNSAFE_FILE_NAME_PATTERN: Final = re.compile("[^a-zA-Z0-9_-]+")
+# digits of the position prefix of category chunk files, guilds have at most 500 channels
+POSITION_WIDTH: Final = 3
+# names of category chunk files written by `ChunkedConfigWriter`, also of older widths
+CHUNK_FILE_NAME_PATTERN: Final = re.compile("[0-9]+-[a-z0-9_-]*\\.json")
+
+
+def is_chunked_config(path: Path) -> bool:
+    return path.is_dir() or path.suffix == NDJSON_SUFFIX
+
+
+def load_config(path: Path) -> GuildConfig:
+    """Load a complete guild configuration from a JSON file or a chunked configuration."""
+    if is_chunked_config(path):
+        return ChunkedConfigReader(path).read_config()
+    return GuildConfig.model_validate_json(path.read_text(encoding="UTF-8"))
+
+
+def load_settings(path: Path) -> GuildSettings:
+    """Load the guild settings, without reading the categories of chunked configurations."""
+    if is_chunked_config(path):
+        return ChunkedConfigReader(path).settings
+    return load_config(path)
+
+
+def write_chunked_config(config: GuildConfig, path: Path) -> None:
+    """Write a guild configuration as NDJSON file if `path` ends with '.ndjson', else as directory.
+
+    See `open_chunked_config_writer` for the requirements on directories.
+    """
+    with open_chunked_config_writer(path) as writer:
+        writer.write_settings(config)
+        for category in config.categories:
+            writer.write_category(category)
+
+
+@contextmanager
+def open_chunked_config_writer(output: Path | TextIO) -> Iterator[ChunkedConfigWriter]:
+    """Open a chunked configuration for writing.
+
+    Streams and paths ending with '.ndjson' are written as NDJSON, other paths as directory.
+    Directories must be empty or contain a chunked configuration, whose settings and category
+    chunks are replaced. Other files in the directory are kept.
+    """
+    if not isinstance(output, Path):
+        yield ChunkedConfigWriter(ndjson_file=output)
+    elif output.suffix == NDJSON_SUFFIX:
+        with output.open("w", encoding="UTF-8") as ndjson_file:
+            yield ChunkedConfigWriter(ndjson_file=ndjson_file)
+    else:
+        _prepare_chunk_directory(output)
+        yield ChunkedConfigWriter(directory=output)
+
+
+def _prepare_chunk_directory(directory: Path) -> None:
+    """Create a directory for chunks, or remove the chunks of a previous configuration."""
+    if directory.exists() and not directory.is_dir():
+        raise ValueError(f"{directory} is not a directory")
+    if directory.is_dir() and any(directory.iterdir()):
+        if not (directory / SETTINGS_FILE_NAME).is_file():
+            raise ValueError(
+                f"{directory} is not empty and contains no chunked configuration "
+                f"('{SETTINGS_FILE_NAME}' is missing)"
+            )
+        (directory / SETTINGS_FILE_NAME).unlink()
+        for old_chunk_file in directory.iterdir():
+            if CHUNK_FILE_NAME_PATTERN.fullmatch(old_chunk_file.name):
+                old_chunk_file.unlink()
+    directory.mkdir(parents=True, exist_ok=True)
+
+
+class ChunkedConfigWriter:
+    def __init__(self, *, ndjson_file: TextIO | None = None, directory: Path | None = None) -> None:
+        """Write a chunked guild configuration chunk by chunk, starting with the guild settings.
+
+        Chunks are written to an `ndjson_file` or a `directory`, in the layouts read by
+        `ChunkedConfigReader`. Each chunk is written immediately, so configurations can be
+        written while they are produced.
+        """
+        if (ndjson_file is None) == (directory is None):
+            raise ValueError("Either 'ndjson_file' or 'directory' is required")
+        self.ndjson_file: Final[TextIO | None] = ndjson_file
+        self.directory: Final[Path | None] = directory
+        self._category_count = 0
+
+    def write_settings(self, settings: GuildSettings) -> None:
+        # categories of a complete configuration are written as separate chunks
+        exclude = {"categories"} if isinstance(settings, GuildConfig) else None
+        if self.ndjson_file is not None:
+            self._write_line(self.ndjson_file, settings.model_dump_json(exclude=exclude))
+        elif self.directory is not None:
+            (self.directory / SETTINGS_FILE_NAME).write_text(
+                settings.model_dump_json(exclude=exclude, indent=2) + "\n", encoding="UTF-8"
+            )
+
+    def write_category(self, category: Category) -> None:
+        position = self._category_count
+        self._category_count += 1
+        if self.ndjson_file is not None:
+            self._write_line(self.ndjson_file, category.model_dump_json())
+        elif self.directory is not None:
+            # file names start with the zero-padded position, since chunks are read in file
+            # name order
+            name = UNSAFE_FILE_NAME_PATTERN.sub("-", get_template_key(category)).strip("-").lower()
+            (self.directory / f"{position:0{POSITION_WIDTH}d}-{name}.json").write_text(
+                category.model_dump_json(indent=2) + "\n", encoding="UTF-8"
+            )
+
+    @staticmethod
+    def _write_line(ndjson_file: TextIO, line: str) -> None:
+        ndjson_file.write(line + "\n")
+        # readers of a stream receive each chunk as soon as it is written
+        ndjson_file.flush()
+
+
+class ChunkedConfigReader:
+    def __init__(self, path: Path) -> None:
+        """Read a guild configuration which is split into one chunk per category.
+
+        Supported layouts:
+        - NDJSON file: the first line contains everything except the categories, each following
+          line contains one category
+        - Directory: 'guild.json' contains everything except the categories, each other JSON
+          file contains one category. Categories are ordered by file name.
+
+        The guild settings are read immediately. Categories are read, validated, and returned
+        one by one, so only one category is kept in memory at a time. All cross-reference checks
+        of `GuildConfig` are done incrementally, except for the system channels, which are
+        checked after the last category.
+        """
+        self.path: Final[Path] = path
+        settings_chunk = next(self._iter_chunks(), None)
+        if settings_chunk is None:
+            raise ValueError(f"{path.name} contains no guild settings chunk")
+        settings_chunk_name, settings_chunk_content = settings_chunk
+        try:
+            self.settings: Final[GuildSettings] = GuildSettings.model_validate_json(
+                settings_chunk_content
+            )
+        except ValueError as error:
+            raise ValueError(f"Invalid chunk {settings_chunk_name}: {error}") from error
+
+    def _iter_chunks(self) -> Iterator[tuple[str, str]]:
+        """Yield chunk names and contents, starting with the guild settings."""
+        if self.path.is_dir():
+            settings_file = self.path / SETTINGS_FILE_NAME
+            yield settings_file.name, settings_file.read_text(encoding="UTF-8")
+            for chunk_file in sorted(self.path.glob("*.json")):
+                if chunk_file != settings_file:
+                    yield chunk_file.name, chunk_file.read_text(encoding="UTF-8")
+            return
+
+        with self.path.open(encoding="UTF-8") as ndjson_file:
+            for line_number, line in enumerate(ndjson_file, start=1):
+                if line.strip():
+                    yield f"{self.path.name}:{line_number}", line
+
+    def hash_chunks(self) -> str:
+        """Hash the content of all chunks, without validating them."""
+        chunks_hash = hashlib.sha256()
+        for chunk_name, chunk in self._iter_chunks():
+            chunks_hash.update(chunk_name.encode("UTF-8"))
+            chunks_hash.update(chunk.encode("UTF-8"))
+        return chunks_hash.hexdigest()
+
+    def iter_categories(self) -> Iterator[Category]:
+        """Read and validate the categories one by one.
+
+        Raises ValueError for the first invalid chunk. Categories of earlier chunks were
+        already returned at that point, so use `read_config` to validate all chunks first.
+        """
+        validator = ChunkedConfigValidator(self.settings)
+        chunks = self._iter_chunks()
+        next(chunks, None)  # guild settings
+        for chunk_name, chunk in chunks:
+            try:
+                category = Category.model_validate_json(chunk)
+                validator.verify_category(category)
+            except ValueError as error:
+                raise ValueError(f"Invalid chunk {chunk_name}: {error}") from error
+            logger.debug("Read category %s from chunk %s", category.name, chunk_name)
+
+            self.settings.compile_overwrite_masks(category)
+            yield category
+
+        validator.verify_complete()
+
+    def read_config(self) -> GuildConfig:
+        """Read all chunks into a single configuration."""
+        categories = list(self.iter_categories())
+        return GuildConfig.model_validate({**self.settings.model_dump(), "categories": categories})
+
+
+class ChunkedConfigValidator:
+    def __init__(self, settings: GuildSettings) -> None:
+        """Validate the categories of a chunked configuration one by one.
+
+        Does the cross-reference checks of `GuildConfig` incrementally: keys must be unique,
+        permission overwrites must reference known roles, and the system channels must exist
+        once all categories were verified.
+        """
+        self.settings: Final[GuildSettings] = settings
+        self._category_keys: Final[set[str]] = set()
+        self._channel_keys: Final[set[str]] = set()
+        self._channel_names: Final[set[str]] = set()
+
+    def verify_category(self, category: Category) -> None:
+        """Verify a category against the settings and all previously verified categories."""
+        new_channel_keys = Counter(get_template_key(channel) for channel in category.channels)
+        duplicate_keys = {
+            key for key, count in new_channel_keys.items() if key in self._channel_keys or count > 1
+        }
+        if get_template_key(category) in self._category_keys:
+            duplicate_keys.add(get_template_key(category))
+        if duplicate_keys:
+            raise ValueError(f"Duplicate names or keys: {duplicate_keys}")
+        self.settings.verify_category_references(category)
+
+        self._category_keys.add(get_template_key(category))
+        self._channel_keys.update(new_channel_keys)
+        self._channel_names.update(channel.name for channel in category.channels)
+
+    def verify_complete(self) -> None:
+        """Verify that the categories contain all system channels."""
+        missing_channels = [
+            channel
+            for channel in self.settings.get_required_channel_names()
+            if channel not in self._channel_names
+        ]
+        if missing_channels:
+            raise ValueError(f"Missing system channels: {missing_channels}")
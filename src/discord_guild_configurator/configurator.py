@@ -1,76 +1,708 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
-from collections import defaultdict
-from typing import Final, assert_never
+from functools import partial
+from typing import TYPE_CHECKING, Final, TypeVar, assert_never
 
 import discord
 from discord import VerificationLevel
 from discord.utils import get as discord_get
 
+from discord_guild_configurator.execution import Operation, OperationExecutor
+from discord_guild_configurator.generated_models import VERIFICATION_LEVEL_VALUES
 from discord_guild_configurator.models import (
     Category,
+    ChannelTemplate,
     CommunityFeatures,
     ForumChannel,
+    ForumTag,
     GuildConfig,
-    PermissionOverwrite,
+    GuildSettings,
     Role,
     SystemChannel,
     TextChannel,
     VoiceChannel,
+    get_template_key,
 )
+from discord_guild_configurator.phases import PHASES, Phase
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Collection, Iterable, Sequence
+
+    from discord_guild_configurator.chunked_config import ChunkedConfigReader
+    from discord_guild_configurator.diff import ConfigDiff
+    from discord_guild_configurator.id_mapping import IdMapping
+    from discord_guild_configurator.journal import OperationJournal
+    from discord_guild_configurator.models import OverwriteMasks
+    from discord_guild_configurator.profiling import PhaseProfiler
 
 logger = logging.getLogger(__name__)
 
+ChannelT = TypeVar("ChannelT", bound=discord.abc.GuildChannel)
+
+
+# placeholders for mentions in channel messages
+CHANNEL_MENTION_PATTERN: Final = re.compile("<<#([a-zA-Z0-9 _-]+)>>")
+ROLE_MENTION_PATTERN: Final = re.compile("<<@&([a-zA-Z0-9 _-]+)>>")
+
+# phases which require the channels to exist
+CHANNEL_PHASES: Final[set[Phase]] = {"permissions", "topics", "messages"}
+# phases which configure the guild itself, skipped for selected categories unless requested
+GUILD_SETTINGS_PHASES: Final[set[Phase]] = {"system-channel", "community"}
+
 
 class GuildConfigurator:
-    def __init__(self, guild: discord.Guild) -> None:
+    def __init__(
+        self,
+        guild: discord.Guild,
+        *,
+        journal: OperationJournal | None = None,
+        id_mapping: IdMapping | None = None,
+        max_concurrency: int = 5,
+        profiler: PhaseProfiler | None = None,
+    ) -> None:
+        """Apply guild configurations.
+
+        If a `journal` is given, operations recorded in it are skipped, and completed operations
+        are recorded. The journal is cleared after the configuration was applied completely.
+
+        If an `id_mapping` is given, roles, categories, and channels are looked up by ID first.
+        Objects found this way are renamed if their name differs from the configuration.
+        After applying a configuration, the IDs of all configured objects are stored in it.
+
+        Up to `max_concurrency` operations run at the same time, as long as they do not depend
+        on each other. Requests are additionally delayed by discord.py if a rate limit is hit.
+
+        If a `profiler` is given, the planning and the operations of each phase are profiled.
+        """
         self.guild: Final[discord.Guild] = guild
+        self.journal: Final[OperationJournal | None] = journal
+        self.id_mapping: Final[IdMapping | None] = id_mapping
+        self.max_concurrency: Final[int] = max_concurrency
+        self.profiler: Final[PhaseProfiler | None] = profiler
+
+        # IDs of created or changed roles, categories, and channels, and IDs of channels whose
+        # messages were sent or deleted, for verifying what Discord stored
+        self.written_ids: Final[set[int]] = set()
+        self.written_message_channel_ids: Final[set[int]] = set()
+        # the guild as returned by Discord after the last change of the guild settings
+        self.written_guild: discord.Guild | None = None
+
+        # IDs of found or created objects, by configured name
+        self._role_ids: Final[dict[str, int]] = {}
+        self._category_ids: Final[dict[str, int]] = {}
+        self._channel_ids: Final[dict[str, int]] = {}
+        # configured objects, as returned by Discord after creating or changing them, since the
+        # gateway cache only contains new objects after the corresponding gateway event
+        self._written_roles: Final[dict[int, discord.Role]] = {}
+        self._written_channels: Final[dict[int, discord.abc.GuildChannel]] = {}
+
+    def _load_role_ids(self, role_templates: list[Role]) -> None:
+        if self.id_mapping is None:
+            return
+        for role_template in role_templates:
+            role_id = self.id_mapping.roles.get(get_template_key(role_template))
+            if role_id is not None:
+                self._role_ids[role_template.name] = role_id
+
+    def _load_category_ids(self, category_template: Category) -> None:
+        if self.id_mapping is None:
+            return
+        category_id = self.id_mapping.categories.get(get_template_key(category_template))
+        if category_id is not None:
+            self._category_ids[category_template.name] = category_id
+        for channel_template in category_template.channels:
+            channel_id = self.id_mapping.channels.get(get_template_key(channel_template))
+            if channel_id is not None:
+                self._channel_ids[channel_template.name] = channel_id
+
+    def _update_role_ids(self, role_templates: list[Role]) -> None:
+        if self.id_mapping is None:
+            return
+        for role_template in role_templates:
+            role = self.find_role(role_template.name)
+            if role is not None:
+                self.id_mapping.roles[get_template_key(role_template)] = role.id
+
+    def _update_category_ids(self, category_template: Category) -> None:
+        if self.id_mapping is None:
+            return
+        category = self.find_category(category_template.name)
+        if category is not None:
+            self.id_mapping.categories[get_template_key(category_template)] = category.id
+        for channel_template in category_template.channels:
+            channel = self.find_channel(channel_template.name)
+            if channel is not None:
+                self.id_mapping.channels[get_template_key(channel_template)] = channel.id
+
+    async def apply_configuration(
+        self,
+        template: GuildConfig,
+        *,
+        phases: Collection[Phase] | None = None,
+        categories: Collection[str] | None = None,
+    ) -> None:
+        """Apply a guild configuration.
 
-    async def apply_configuration(self, template: GuildConfig) -> None:
+        `phases` and `categories` restrict the configuration to a subset of phases and
+        categories. Roles referenced by permission overwrites of the selected categories are
+        always ensured, even if the 'roles' phase is not selected. If `categories` are given,
+        the system channel and community features are only configured if their phases are
+        given explicitly.
+        """
         self._check_config_compatibility(template)
+        selected_phases = set(PHASES if phases is None else phases)
+        if categories is not None and phases is None:
+            selected_phases -= GUILD_SETTINGS_PHASES
+        # fail before the first change, the planner checks the channels of each category again
+        category_templates = self._select_categories(template, categories)
+        if "channels" not in selected_phases and selected_phases & CHANNEL_PHASES:
+            self._load_role_ids(template.roles)
+            for category_template in category_templates:
+                self._load_category_ids(category_template)
+            self._check_channels_exist(category_templates)
 
-        logger.info("Configuring roles")
-        for role_template in template.roles:
-            await self.ensure_role(role_template)
+        await OperationExecutor(
+            max_concurrency=self.max_concurrency, journal=self.journal, profiler=self.profiler
+        ).execute(
+            self.plan_operations(
+                template,
+                template.categories,
+                selected_phases=selected_phases,
+                selected_categories=categories,
+            )
+        )
 
-        logger.info("Configuring system channel")
-        await self.ensure_system_channel(template.system_channel)
+        self._update_role_ids(template.roles)
+        # a partial run does not complete the operations of an interrupted full run
+        if self.journal is not None and phases is None and categories is None:
+            self.journal.clear()
 
-        if template.community_features:
-            logger.info("Configuring 'COMMUNITY' features")
-            await self.ensure_community_feature(template.community_features)
+    async def apply_chunked_configuration(
+        self, reader: ChunkedConfigReader, *, phases: Collection[Phase] | None = None
+    ) -> None:
+        """Apply a chunked guild configuration while its categories are read.
+
+        Each category is planned as soon as its chunk was read and validated. Categories are
+        released when their operations are completed, so only categories with pending operations,
+        and default messages which mention channels of later categories, are kept in memory.
+
+        An invalid chunk stops the configuration, while earlier categories stay applied.
+        """
+        template = reader.settings
+        self._check_config_compatibility(template)
+
+        await OperationExecutor(
+            max_concurrency=self.max_concurrency, journal=self.journal, profiler=self.profiler
+        ).execute(
+            self.plan_operations(
+                template,
+                reader.iter_categories(),
+                selected_phases=set(PHASES if phases is None else phases),
+            )
+        )
+
+        self._update_role_ids(template.roles)
+        if self.journal is not None and phases is None:
+            self.journal.clear()
+
+    async def plan_operations(
+        self,
+        template: GuildSettings,
+        category_templates: Iterable[Category],
+        *,
+        selected_phases: set[Phase],
+        selected_categories: Collection[str] | None = None,
+    ) -> AsyncIterator[Operation]:
+        """Plan the operations for applying a configuration, category by category.
+
+        Operations are yielded as soon as their category was planned, so they can be executed
+        while later categories are still planned or read. Categories and channels are created
+        and moved one after another, since their positions depend on each other. All other
+        operations only depend on the objects they refer to.
+
+        The system channel and 'COMMUNITY' features are planned after all categories. Default
+        messages which mention channels of later categories are planned after them.
+
+        Role permissions, permission overwrites, and new channels have the highest priority, so
+        private channels are secured before positions, topics, and messages are updated.
+        """
+        self._load_role_ids(template.roles)
+        plan = _PlanState()
+        if "roles" in selected_phases:
+            for role_template in template.roles:
+                yield plan.add(self._plan_role(role_template))
+
+        # channel positions are global, not per-category
+        channel_position = 0
+        for category_position, category_template in enumerate(category_templates):
+            if selected_categories is None or category_template.name in selected_categories:
+                for operation in self._plan_category(
+                    template,
+                    category_template,
+                    plan,
+                    positions=(category_position, channel_position),
+                    selected_phases=selected_phases,
+                ):
+                    yield plan.add(operation)
+                # let the executor start the operations of this category
+                await asyncio.sleep(0)
+            channel_position += len(category_template.channels)
+
+        for operation in plan.deferred_operations:
+            yield plan.add(operation)
+        for operation in self._plan_guild_settings(template, selected_phases):
+            yield plan.add(operation)
+
+    def _plan_role(self, role_template: Role) -> Operation:
+        return Operation(
+            f"role:{role_template.name}",
+            partial(self.ensure_role, role_template),
+            priority="security",
+            phase="roles",
+        )
+
+    def _plan_category(
+        self,
+        template: GuildSettings,
+        category_template: Category,
+        plan: _PlanState,
+        *,
+        positions: tuple[int, int],
+        selected_phases: set[Phase],
+    ) -> list[Operation]:
+        """Plan the operations of a category and its channels.
+
+        `positions` are the positions of the category and of its first channel.
+        """
+        category_position, channel_position = positions
+        self._load_category_ids(category_template)
+        if "channels" not in selected_phases and selected_phases & CHANNEL_PHASES:
+            self._check_channels_exist([category_template])
+
+        # referenced roles are ensured, even if the 'roles' phase is not selected
+        operations = [
+            self._plan_role(role_template)
+            for role_template in self._select_roles(template, [category_template], selected_phases)
+            if f"role:{role_template.name}" not in plan.keys
+        ]
+        if "channels" in selected_phases:
+            category_key = f"category:{category_template.name}"
+            operations.append(
+                Operation(
+                    category_key,
+                    partial(
+                        self.ensure_category,
+                        name=category_template.name,
+                        position=category_position,
+                    ),
+                    dependencies=plan.get_position_dependencies(category_key),
+                    priority="structure",
+                    phase="channels",
+                )
+            )
+            for offset, channel_template in enumerate(category_template.channels):
+                channel_key = f"channel:{channel_template.name}"
+                overwrite_masks = template.get_overwrite_masks(channel_template)
+                operations.append(
+                    Operation(
+                        channel_key,
+                        partial(
+                            self._ensure_channel_in_category,
+                            channel_template,
+                            category_name=category_template.name,
+                            position=channel_position + offset,
+                            overwrite_masks=overwrite_masks,
+                        ),
+                        dependencies=[
+                            *plan.get_position_dependencies(channel_key),
+                            category_key,
+                            *(f"role:{role_name}" for role_name in overwrite_masks),
+                        ],
+                        # new channels are created with their overwrites, existing channels
+                        # are only renamed and moved
+                        priority=(
+                            "cosmetic"
+                            if self.find_configured_channel(channel_template)
+                            else "security"
+                        ),
+                        phase="channels",
+                    )
+                )
+        operations.append(
+            Operation(
+                f"ids:{category_template.name}",
+                partial(self._update_category_ids_after_operations, category_template),
+                dependencies=[operation.key for operation in operations],
+                recorded=False,
+                phase="channels",
+            )
+        )
+
+        for channel_template in category_template.channels:
+            operations.extend(
+                self._plan_channel_updates(template, channel_template, selected_phases)
+            )
+        if "messages" in selected_phases:
+            for channel_template in category_template.channels:
+                if isinstance(channel_template, TextChannel):
+                    plan.add_messages(self._plan_messages(channel_template), operations)
+        return operations
+
+    def _plan_channel_updates(
+        self,
+        template: GuildSettings,
+        channel_template: ChannelTemplate,
+        selected_phases: set[Phase],
+    ) -> list[Operation]:
+        channel_key = f"channel:{channel_template.name}"
+        overwrite_masks = template.get_overwrite_masks(channel_template)
+        operations = []
+        if "permissions" in selected_phases:
+            # overwrites of existing channels do not wait until channels before them were moved
+            channel_dependencies = (
+                [] if self.find_configured_channel(channel_template) else [channel_key]
+            )
+            operations.append(
+                Operation(
+                    f"permissions:{channel_template.name}",
+                    partial(
+                        self._ensure_channel_permissions_by_name,
+                        channel_template.name,
+                        overwrite_masks,
+                    ),
+                    dependencies=[
+                        *channel_dependencies,
+                        *(f"role:{role_name}" for role_name in overwrite_masks),
+                    ],
+                    priority="security",
+                    phase="permissions",
+                )
+            )
+        if "topics" in selected_phases:
+            operations.append(
+                Operation(
+                    f"topic:{channel_template.name}",
+                    partial(self.ensure_channel_topic, channel_template),
+                    dependencies=[channel_key],
+                    priority="cosmetic",
+                    phase="topics",
+                )
+            )
+        return operations
+
+    def _plan_messages(self, channel_template: TextChannel) -> Operation:
+        dependencies = [f"channel:{channel_template.name}"]
+        for message in channel_template.channel_messages:
+            dependencies.extend(
+                f"channel:{name}" for name in CHANNEL_MENTION_PATTERN.findall(message)
+            )
+            dependencies.extend(f"role:{name}" for name in ROLE_MENTION_PATTERN.findall(message))
+        return Operation(
+            f"messages:{channel_template.name}",
+            partial(self.ensure_default_messages_for_channel, channel_template),
+            dependencies=dependencies,
+            priority="cosmetic",
+            phase="messages",
+        )
+
+    def _plan_guild_settings(
+        self, template: GuildSettings, selected_phases: set[Phase]
+    ) -> list[Operation]:
+        operations = []
+        if "system-channel" in selected_phases:
+            operations.append(
+                Operation(
+                    "system-channel",
+                    partial(self.ensure_system_channel, template.system_channel),
+                    dependencies=[f"channel:{template.system_channel.name}"],
+                    phase="system-channel",
+                )
+            )
+        if "community" in selected_phases and template.community_features:
+            community_channels = template.get_required_channel_names()[1:]
+            operations.append(
+                Operation(
+                    "community",
+                    partial(self.ensure_community_feature, template.community_features),
+                    dependencies=[
+                        "system-channel",
+                        *(f"channel:{name}" for name in community_channels),
+                    ],
+                    phase="community",
+                )
+            )
+        return operations
+
+    async def _ensure_channel_in_category(
+        self,
+        channel_template: ChannelTemplate,
+        *,
+        category_name: str,
+        position: int,
+        overwrite_masks: OverwriteMasks,
+    ) -> None:
+        # the category is looked up when the operation runs, since it might be created before
+        await self.ensure_channel(
+            channel_template,
+            category=self.get_category(category_name),
+            position=position,
+            overwrite_masks=overwrite_masks,
+        )
+
+    async def _ensure_channel_permissions_by_name(
+        self, name: str, overwrite_masks: OverwriteMasks
+    ) -> None:
+        await self.ensure_channel_permissions(self.get_channel(name), overwrite_masks)
+
+    async def _update_category_ids_after_operations(self, category_template: Category) -> None:
+        self._update_category_ids(category_template)
+
+    @staticmethod
+    def _select_categories(
+        template: GuildConfig, categories: Collection[str] | None
+    ) -> list[Category]:
+        if categories is None:
+            return template.categories
+        unknown_categories = set(categories) - {category.name for category in template.categories}
+        if unknown_categories:
+            raise ValueError(f"Unknown categories: {unknown_categories}")
+        return [category for category in template.categories if category.name in categories]
 
-        logger.info("Configuring categories and channels")
-        await self.ensure_categories_and_channels(template.categories)
+    @classmethod
+    def _select_roles(
+        cls,
+        template: GuildSettings,
+        category_templates: list[Category],
+        selected_phases: set[Phase],
+    ) -> list[Role]:
+        if "roles" in selected_phases:
+            return template.roles
+        referenced_roles = cls._get_referenced_roles(template, category_templates, selected_phases)
+        return [role for role in template.roles if role.name in referenced_roles]
 
-        logger.info("Configuring permissions")
-        await self.ensure_category_and_channel_permissions(template.categories)
+    @staticmethod
+    def _get_referenced_roles(
+        template: GuildSettings, category_templates: list[Category], selected_phases: set[Phase]
+    ) -> set[str]:
+        referenced_roles: set[str] = set()
+        for category_template in category_templates:
+            for channel_template in category_template.channels:
+                # new channels are created with their permission overwrites
+                if selected_phases & {"channels", "permissions"}:
+                    referenced_roles.update(template.get_overwrite_masks(channel_template))
+                if "messages" in selected_phases and isinstance(channel_template, TextChannel):
+                    for message in channel_template.channel_messages:
+                        referenced_roles.update(ROLE_MENTION_PATTERN.findall(message))
+        return referenced_roles
 
-        logger.info("Configure channel topics")
-        await self.ensure_channel_topics(template.categories)
+    def _check_channels_exist(self, category_templates: list[Category]) -> None:
+        missing_channels = [
+            channel_template.name
+            for category_template in category_templates
+            for channel_template in category_template.channels
+            if self.find_channel(channel_template.name) is None
+        ]
+        if missing_channels:
+            raise RuntimeError(
+                f"Missing channels: {missing_channels}. "
+                "Include the 'channels' phase to create them."
+            )
+
+    async def apply_changes(self, template: GuildConfig, diff: ConfigDiff) -> None:
+        """Apply only the parts of `template` listed in `diff`.
+
+        Renamed objects are looked up by their ID in the ID mapping or by their old name, so they
+        are renamed instead of recreated.
+        """
+        self._check_config_compatibility(template)
+        self._load_role_ids(template.roles)
+        for category_template in template.categories:
+            self._load_category_ids(category_template)
+        self._load_renamed_ids(diff)
+
+        for role_change in diff.roles:
+            await self.reconcile_role(template, role_change.name)
+        for category_change in diff.categories:
+            await self.reconcile_category(template, category_change.name)
+        for channel_change in diff.channels:
+            await self.reconcile_channel(
+                template, channel_change.name, include_messages=channel_change.messages_changed
+            )
+        if diff.guild_settings is not None:
+            await self.reconcile_guild_settings(template)
 
-        logger.info("Configure channel default messages")
-        await self.ensure_default_messages(template.categories)
+        self._update_role_ids(template.roles)
+        for category_template in template.categories:
+            self._update_category_ids(category_template)
 
-    def _check_config_compatibility(self, template: GuildConfig) -> None:
+    def _load_renamed_ids(self, diff: ConfigDiff) -> None:
+        """Map the new names of renamed objects to the IDs of the objects with the old names."""
+        for role_change in diff.roles:
+            if role_change.renamed_from is not None and role_change.name not in self._role_ids:
+                role = self.find_role(role_change.renamed_from)
+                if role is not None:
+                    self._role_ids[role_change.name] = role.id
+        for category_change in diff.categories:
+            if (
+                category_change.renamed_from is not None
+                and category_change.name not in self._category_ids
+            ):
+                category = self.find_category(category_change.renamed_from)
+                if category is not None:
+                    self._category_ids[category_change.name] = category.id
+        for channel_change in diff.channels:
+            if (
+                channel_change.renamed_from is not None
+                and channel_change.name not in self._channel_ids
+            ):
+                channel = self.find_channel(channel_change.renamed_from)
+                if channel is not None:
+                    self._channel_ids[channel_change.name] = channel.id
+
+    async def reconcile_role(self, template: GuildConfig, name: str) -> None:
+        """Apply the configuration of a single role."""
+        role_template = discord_get(template.roles, name=name)
+        if role_template is None:
+            logger.debug("Role %s is not part of the configuration", name)
+            return
+        await self.ensure_role(role_template)
+
+    async def reconcile_category(self, template: GuildConfig, name: str) -> None:
+        """Apply the position of a single category."""
+        for category_position, category_template in enumerate(template.categories):
+            if category_template.name == name:
+                await self.ensure_category(name=name, position=category_position)
+                return
+        logger.debug("Category %s is not part of the configuration", name)
+
+    async def reconcile_channel(
+        self, template: GuildConfig, name: str, *, include_messages: bool = False
+    ) -> None:
+        """Apply the configuration of a single channel.
+
+        Default messages require fetching the channel history, so they are only checked
+        if `include_messages` is set.
+        """
+        channel_position = 0
+        for category_template in template.categories:
+            for channel_template in category_template.channels:
+                if channel_template.name == name:
+                    logger.info("Reconcile channel %s", name)
+                    category = self.get_category(category_template.name)
+                    overwrite_masks = template.get_overwrite_masks(channel_template)
+                    await self.ensure_channel(
+                        channel_template,
+                        category=category,
+                        position=channel_position,
+                        overwrite_masks=overwrite_masks,
+                    )
+                    await self.ensure_channel_permissions(self.get_channel(name), overwrite_masks)
+                    await self.ensure_channel_topic(channel_template)
+                    if include_messages and isinstance(channel_template, TextChannel):
+                        await self.ensure_default_messages_for_channel(channel_template)
+                    return
+                channel_position += 1
+        logger.debug("Channel %s is not part of the configuration", name)
+
+    async def reconcile_guild_settings(self, template: GuildConfig) -> None:
+        """Apply the system channel and 'COMMUNITY' configuration."""
+        self._check_config_compatibility(template)
+        await self.ensure_system_channel(template.system_channel)
+        if template.community_features:
+            await self.ensure_community_feature(template.community_features)
+
+    def _check_config_compatibility(self, template: GuildSettings) -> None:
         if (
             "COMMUNITY" in self.guild.features
-            and template.verification_level < discord.VerificationLevel.medium  # type: ignore[unsupported-operator]
+            and VERIFICATION_LEVEL_VALUES[template.verification_level]
+            < VERIFICATION_LEVEL_VALUES["medium"]
         ):
             raise ValueError(
                 "The Community feature requires a verification level of at least medium"
             )
 
+    def _find_channel(
+        self, name: str, channel_type: type[ChannelT] | tuple[type[ChannelT], ...]
+    ) -> ChannelT | None:
+        channel_id = self._channel_ids.get(name)
+        if channel_id is not None:
+            channel = self._get_written_channel(channel_id)
+            if isinstance(channel, channel_type):
+                return channel
+
+        for channel in self.guild.channels:
+            if channel.name == name and isinstance(channel, channel_type):
+                self._channel_ids[name] = channel.id
+                return channel
+        return None
+
+    def _get_written_channel(self, channel_id: int) -> discord.abc.GuildChannel | None:
+        return self._written_channels.get(channel_id) or self.guild.get_channel(channel_id)
+
+    def find_text_channel(self, name: str) -> discord.TextChannel | None:
+        return self._find_channel(name, discord.TextChannel)
+
+    def find_forum(self, name: str) -> discord.ForumChannel | None:
+        return self._find_channel(name, discord.ForumChannel)
+
+    def find_voice_channel(self, name: str) -> discord.VoiceChannel | None:
+        return self._find_channel(name, discord.VoiceChannel)
+
+    def find_channel(
+        self, name: str
+    ) -> discord.TextChannel | discord.ForumChannel | discord.VoiceChannel | None:
+        return self._find_channel(
+            name, (discord.TextChannel, discord.ForumChannel, discord.VoiceChannel)
+        )
+
+    def find_configured_channel(
+        self, channel_template: ChannelTemplate
+    ) -> discord.TextChannel | discord.ForumChannel | discord.VoiceChannel | None:
+        """Find a channel of the configured type, other channels are replaced by new ones."""
+        if isinstance(channel_template, TextChannel):
+            return self.find_text_channel(channel_template.name)
+        if isinstance(channel_template, VoiceChannel):
+            return self.find_voice_channel(channel_template.name)
+        if isinstance(channel_template, ForumChannel):
+            return self.find_forum(channel_template.name)
+        # hint for the type checker: report error if there can be more channel types
+        assert_never(channel_template)
+
+    def find_category(self, name: str) -> discord.CategoryChannel | None:
+        category_id = self._category_ids.get(name)
+        if category_id is not None:
+            category = self._get_written_channel(category_id)
+            if isinstance(category, discord.CategoryChannel):
+                return category
+
+        category = discord_get(self.guild.categories, name=name)
+        if category is not None:
+            self._category_ids[name] = category.id
+        return category
+
+    def find_role(self, name: str) -> discord.Role | None:
+        role_id = self._role_ids.get(name)
+        if role_id is not None:
+            role = self._written_roles.get(role_id) or self.guild.get_role(role_id)
+            if role is not None:
+                return role
+
+        role = discord_get(self.guild.roles, name=name)
+        if role is not None:
+            self._role_ids[name] = role.id
+        return role
+
     def get_text_channel(self, name: str) -> discord.TextChannel:
-        channel = discord_get(self.guild.text_channels, name=name)
+        channel = self.find_text_channel(name)
         if channel is None:
             raise RuntimeError(f"Could not find text channel with name '{name}'")
         return channel
 
     def get_forum(self, name: str) -> discord.ForumChannel:
-        channel = discord_get(self.guild.forums, name=name)
+        channel = self.find_forum(name)
         if channel is None:
             raise RuntimeError(f"Could not find forum with name '{name}'")
         return channel
@@ -78,21 +710,19 @@ class GuildConfigurator:
     def get_channel(
         self, name: str
     ) -> discord.TextChannel | discord.ForumChannel | discord.VoiceChannel:
-        channel = discord_get(self.guild.channels, name=name)
-        if channel is None or not isinstance(
-            channel, (discord.TextChannel, discord.ForumChannel, discord.VoiceChannel)
-        ):
+        channel = self.find_channel(name)
+        if channel is None:
             raise RuntimeError(f"Could not find text, forum, or voice channel with name '{name}'")
         return channel
 
     def get_role(self, name: str) -> discord.Role:
-        role = discord_get(self.guild.roles, name=name)
+        role = self.find_role(name)
         if role is None:
             raise RuntimeError(f"Could not find role with name '{name}'")
         return role
 
     def get_category(self, name: str) -> discord.CategoryChannel:
-        category = discord_get(self.guild.categories, name=name)
+        category = self.find_category(name)
         if category is None:
             raise RuntimeError(f"Could not find category with name '{name}'")
         return category
@@ -100,226 +730,311 @@ class GuildConfigurator:
     async def ensure_channel_permissions(
         self,
         channel: discord.TextChannel | discord.ForumChannel | discord.VoiceChannel,
-        permission_overwrite_templates: list[PermissionOverwrite],
+        overwrite_masks: OverwriteMasks,
     ) -> None:
         logger.info("Ensure permissions for channel %s", channel.name)
 
-        logger.debug("Accumulating expected permission overwrites")
-        expected_overwrites_by_role: dict[str, dict[str, bool]] = defaultdict(dict)
-        for overwrite_template in permission_overwrite_templates:
-            for role_name in overwrite_template.roles:
-                for permission in overwrite_template.allow:
-                    expected_overwrites_by_role[role_name][permission] = True
-                for permission in overwrite_template.deny:
-                    expected_overwrites_by_role[role_name][permission] = False
-
         logger.debug("Determine if update is required")
         # Enabling some settings for some roles sometimes enables it also for @everyone.
         # Workaround: If any update is required, do a full update
         update_required = False
-        updates_by_role: dict[discord.Role, discord.PermissionOverwrite] = {}
-        for role_name, expected_overwrites in expected_overwrites_by_role.items():
-            role = self.get_role(role_name)
-            current_permissions = channel.permissions_for(role)
-            for permission, expected in expected_overwrites.items():
-                current_value = getattr(current_permissions, permission)
-                if current_value != expected:
-                    update_required = True
-            updates_by_role[role] = discord.PermissionOverwrite(**expected_overwrites)
+        for role_name, (allow, deny) in overwrite_masks.items():
+            current = channel.permissions_for(self.get_role(role_name)).value
+            if current & allow != allow or current & deny:
+                update_required = True
+                break
 
         if update_required:
             logger.debug("Update permissions")
-            await channel.edit(overwrites=updates_by_role)
-
-    async def ensure_category_and_channel_permissions(
-        self, category_templates: list[Category]
-    ) -> None:
-        for category_template in category_templates:
-            for channel_template in category_template.channels:
-                channel = self.get_channel(channel_template.name)
-                await self.ensure_channel_permissions(
-                    channel,
-                    category_template.permission_overwrites
-                    + channel_template.permission_overwrites,
-                )
+            self.written_ids.add(channel.id)
+            channel = (
+                await channel.edit(overwrites=self.compute_overwrites(overwrite_masks)) or channel
+            )
+            self._written_channels[channel.id] = channel
 
-    async def ensure_categories_and_channels(self, category_templates: list[Category]) -> None:
-        # channel positions are global, not per-category
-        channel_position = 0
-        for category_position, category_template in enumerate(category_templates):
-            await self.ensure_category(name=category_template.name, position=category_position)
+    def compute_overwrites(
+        self, overwrite_masks: OverwriteMasks
+    ) -> dict[discord.Role | discord.Member | discord.Object, discord.PermissionOverwrite]:
+        """Convert merged overwrite masks to discord.py permission overwrites."""
+        return {
+            self.get_role(role_name): discord.PermissionOverwrite.from_pair(
+                discord.Permissions(allow), discord.Permissions(deny)
+            )
+            for role_name, (allow, deny) in overwrite_masks.items()
+        }
 
-            category = self.get_category(category_template.name)
-            for channel_template in category_template.channels:
-                if isinstance(channel_template, TextChannel):
-                    await self.ensure_text_channel(
-                        channel_template.name, category=category, position=channel_position
-                    )
-                elif isinstance(channel_template, VoiceChannel):
-                    await self.ensure_voice_channel(
-                        channel_template.name, category=category, position=channel_position
-                    )
-                elif isinstance(channel_template, ForumChannel):
-                    await self.ensure_forum_channel(
-                        channel_template.name,
-                        category=category,
-                        position=channel_position,
-                        expected_tags=channel_template.tags,
-                        require_tag=channel_template.require_tag,
-                    )
-                else:
-                    # hint for the type checker: report error if there can be more channel types
-                    assert_never(channel_template)
+    async def ensure_channel(
+        self,
+        channel_template: ChannelTemplate,
+        *,
+        category: discord.CategoryChannel,
+        position: int,
+        overwrite_masks: OverwriteMasks,
+    ) -> None:
+        """Ensure that a channel exists at the given position.
 
-                channel_position += 1
+        New channels are created with their permission overwrites, topic, and forum tags, so
+        the later phases have nothing left to do for them.
+        """
+        if isinstance(channel_template, TextChannel):
+            await self.ensure_text_channel(
+                channel_template,
+                category=category,
+                position=position,
+                overwrite_masks=overwrite_masks,
+            )
+        elif isinstance(channel_template, VoiceChannel):
+            await self.ensure_voice_channel(
+                channel_template,
+                category=category,
+                position=position,
+                overwrite_masks=overwrite_masks,
+            )
+        elif isinstance(channel_template, ForumChannel):
+            await self.ensure_forum_channel(
+                channel_template,
+                category=category,
+                position=position,
+                overwrite_masks=overwrite_masks,
+            )
+        else:
+            # hint for the type checker: report error if there can be more channel types
+            assert_never(channel_template)
 
     async def ensure_category(self, *, name: str, position: int) -> None:
         logger.info("Ensure category %s at position %d", name, position)
-        category = discord_get(self.guild.categories, name=name)
+        category = self.find_category(name)
         if category is None:
             logger.debug("Create category")
-            await self.guild.create_category(name, position=position)
+            category = await self.guild.create_category(name, position=position)
+            self._category_ids[name] = category.id
+            self.written_ids.add(category.id)
         else:
             logger.debug("Found category")
+            if category.name != name:
+                logger.debug("Rename category %s", category.name)
+                self.written_ids.add(category.id)
+                category = await category.edit(name=name) or category
             if category.position != position:
                 logger.debug("Update position")
-                await category.edit(position=position)
+                self.written_ids.add(category.id)
+                category = await category.edit(position=position) or category
+        self._written_channels[category.id] = category
 
     async def ensure_text_channel(
-        self, name: str, *, category: discord.CategoryChannel | None, position: int
+        self,
+        template: TextChannel,
+        *,
+        category: discord.CategoryChannel | None,
+        position: int,
+        overwrite_masks: OverwriteMasks,
     ) -> None:
+        name = template.name
         logger.info("Ensure text channel %s at position %d", name, position)
-        channel = discord_get(self.guild.text_channels, name=name)
+        channel = self.find_text_channel(name)
         if channel is None:
             logger.debug("Create text channel %s", name)
-            await self.guild.create_text_channel(name=name, category=category, position=position)
+            channel = await self.guild.create_text_channel(
+                name=name,
+                category=category,
+                position=position,
+                topic=template.topic,
+                overwrites=self.compute_overwrites(overwrite_masks),
+            )
+            self._channel_ids[name] = channel.id
+            self.written_ids.add(channel.id)
         else:
             logger.debug("Found text channel")
+            if channel.name != name:
+                logger.debug("Rename channel %s", channel.name)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(name=name) or channel
             if channel.category != category:
                 logger.debug("Update category")
-                await channel.edit(category=category)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(category=category) or channel
             if channel.position != position:
                 logger.debug("Update position")
-                await channel.edit(position=position)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(position=position) or channel
+        self._written_channels[channel.id] = channel
 
     async def ensure_voice_channel(
-        self, name: str, *, category: discord.CategoryChannel | None, position: int
+        self,
+        template: VoiceChannel,
+        *,
+        category: discord.CategoryChannel | None,
+        position: int,
+        overwrite_masks: OverwriteMasks,
     ) -> None:
+        name = template.name
         logger.info("Ensure voice channel %s at position %d", name, position)
-        channel = discord_get(self.guild.voice_channels, name=name)
+        channel = self.find_voice_channel(name)
         if channel is None:
             logger.debug("Create voice channel %s", name)
-            await self.guild.create_voice_channel(name=name, category=category, position=position)
+            channel = await self.guild.create_voice_channel(
+                name=name,
+                category=category,
+                position=position,
+                overwrites=self.compute_overwrites(overwrite_masks),
+            )
+            self._channel_ids[name] = channel.id
+            self.written_ids.add(channel.id)
         else:
             logger.debug("Found voice channel")
+            if channel.name != name:
+                logger.debug("Rename channel %s", channel.name)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(name=name) or channel
             if channel.category != category:
                 logger.debug("Update category")
-                await channel.edit(category=category)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(category=category) or channel
             if channel.position != position:
                 logger.debug("Update position")
-                await channel.edit(position=position)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(position=position) or channel
+        self._written_channels[channel.id] = channel
 
     async def ensure_forum_channel(
         self,
-        name: str,
+        template: ForumChannel,
         *,
         category: discord.CategoryChannel,
         position: int,
-        expected_tags: list[str],
-        require_tag: bool,
+        overwrite_masks: OverwriteMasks,
     ) -> None:
+        name = template.name
         logger.info("Configure forum channel %s at position %d", name, position)
-        channel = discord_get(self.guild.forums, name=name)
+        channel = self.find_forum(name)
         if channel is None:
             logger.debug("Create forum channel %s", name)
-            channel = await self.guild.create_forum(name, category=category, position=position)
+            # 'require_tag' cannot be set on creation, 'ensure_tags' sets it if required
+            channel = await self.guild.create_forum(
+                name,
+                category=category,
+                position=position,
+                topic=template.topic,
+                overwrites=self.compute_overwrites(overwrite_masks),
+                available_tags=self.build_tags(template.forum_tags, []),
+            )
+            self._channel_ids[name] = channel.id
+            self.written_ids.add(channel.id)
         else:
             logger.debug("Found forum channel")
+            if channel.name != name:
+                logger.debug("Rename channel %s", channel.name)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(name=name) or channel
             if channel.category is None or channel.category != category:
                 logger.debug("Update category")
-                await channel.edit(category=category)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(category=category) or channel
             if channel.position != position:
                 logger.debug("Update position")
-                await channel.edit(position=position)
+                self.written_ids.add(channel.id)
+                channel = await channel.edit(position=position) or channel
+        self._written_channels[channel.id] = channel
 
-        await self.ensure_tags(channel, expected_tags, require_tag=require_tag)
+        await self.ensure_tags(channel, template.forum_tags, require_tag=template.require_tag)
 
-    @staticmethod
     async def ensure_tags(
-        channel: discord.ForumChannel, expected_tags: list[str], *, require_tag: bool
+        self, channel: discord.ForumChannel, expected_tags: list[ForumTag], *, require_tag: bool
     ) -> None:
-        logger.info("Ensure tags %s for channel %s", expected_tags, channel.name)
-        existing_tags = {tag.name: tag for tag in channel.available_tags}
-        tags_to_create = set(expected_tags) - set(existing_tags)
-
-        if tags_to_create:
-            for tag_name in tags_to_create:
-                logger.debug("Create tag %s", tag_name)
-                existing_tags[tag_name] = await channel.create_tag(name=tag_name)
-
-            logger.debug("Update available tags for channel %s", channel.name)
-            await channel.edit(available_tags=(list(existing_tags.values())))
+        logger.info("Ensure %d tags for channel %s", len(expected_tags), channel.name)
+        available_tags = self.build_tags(expected_tags, channel.available_tags)
+        tags_changed = [tag.to_dict() for tag in available_tags] != [
+            tag.to_dict() for tag in channel.available_tags
+        ]
+        if tags_changed or channel.flags.require_tag != require_tag:
+            # a single request, since each tag change replaces the whole tag list anyway
+            logger.debug("Update available tags and 'require_tag' flag")
+            self.written_ids.add(channel.id)
+            channel = (
+                await channel.edit(available_tags=available_tags, require_tag=require_tag)
+                or channel
+            )
+            self._written_channels[channel.id] = channel
 
-        if require_tag and not channel.flags.require_tag:
-            logger.debug("Update 'require_tag' flag")
-            await channel.edit(require_tag=require_tag)
+    @staticmethod
+    def build_tags(
+        expected_tags: list[ForumTag], current_tags: Sequence[discord.ForumTag]
+    ) -> list[discord.ForumTag]:
+        """Build the complete list of available tags, keeping unconfigured tags at the end."""
+        existing_tags = {tag.name: tag for tag in current_tags}
+        available_tags = []
+        for tag_template in expected_tags:
+            tag = discord.ForumTag(
+                name=tag_template.name, emoji=tag_template.emoji, moderated=tag_template.moderated
+            )
+            existing_tag = existing_tags.pop(tag_template.name, None)
+            if existing_tag is not None:
+                # keep the ID, so the tag stays assigned to existing posts
+                tag.id = existing_tag.id
+            available_tags.append(tag)
+        available_tags.extend(existing_tags.values())
+        return available_tags
 
     async def ensure_role(self, template: Role) -> None:
         logger.info("Ensure role %s", template.name)
-        permissions = discord.Permissions(
-            **dict.fromkeys(template.permissions, True),
-        )
+        permissions = discord.Permissions(template.permissions_mask)
         expected_color = discord.Color.from_str(template.color)
 
-        role = discord_get(self.guild.roles, name=template.name)
+        role = self.find_role(template.name)
         if role is None:
             logger.debug("Create role %s", template.name)
-            await self.guild.create_role(
+            role = await self.guild.create_role(
                 name=template.name,
                 colour=expected_color,
                 hoist=template.hoist,
                 mentionable=template.mentionable,
                 permissions=permissions,
             )
+            self._role_ids[template.name] = role.id
+            self.written_ids.add(role.id)
         else:
             logger.debug("Found role")
+            if role.name != template.name:
+                logger.debug("Rename role %s", role.name)
+                self.written_ids.add(role.id)
+                role = await role.edit(name=template.name) or role
             if role.name != "@everyone" and role.colour != expected_color:
                 logger.debug("Update color")
-                await role.edit(colour=expected_color)
+                self.written_ids.add(role.id)
+                role = await role.edit(colour=expected_color) or role
             if role.hoist != template.hoist:
                 logger.debug("Update hoist")
-                await role.edit(hoist=template.hoist)
+                self.written_ids.add(role.id)
+                role = await role.edit(hoist=template.hoist) or role
             if role.mentionable != template.mentionable:
                 logger.debug("Update mentionable")
-                await role.edit(mentionable=template.mentionable)
+                self.written_ids.add(role.id)
+                role = await role.edit(mentionable=template.mentionable) or role
             if role.permissions != permissions:
                 logger.debug("Update permissions")
-                await role.edit(permissions=permissions)
+                self.written_ids.add(role.id)
+                role = await role.edit(permissions=permissions) or role
+        self._written_roles[role.id] = role
 
-    async def ensure_default_messages(self, categories: list[Category]) -> None:
-        logger.info("Ensure default expected_messages")
-        for category_template in categories:
-            for channel_template in category_template.channels:
-                if not isinstance(channel_template, TextChannel):
-                    continue
-                channel = self.get_text_channel(channel_template.name)
-                expected_messages = await self.insert_mentions_into_messages(
-                    channel_template.channel_messages
-                )
-                if expected_messages:
-                    await self.ensure_channel_messages(channel, expected_messages)
+    async def ensure_default_messages_for_channel(self, channel_template: TextChannel) -> None:
+        channel = self.get_text_channel(channel_template.name)
+        expected_messages = await self.insert_mentions_into_messages(
+            channel_template.channel_messages
+        )
+        if expected_messages and await self.ensure_channel_messages(channel, expected_messages):
+            self.written_message_channel_ids.add(channel.id)
 
     async def insert_mentions_into_messages(self, messages: list[str]) -> list[str]:
         logger.info("Insert mentions in messages")
         fixed_messages = []
         for message in messages:
             fixed_message = message
-            for match in re.finditer("<<#([a-zA-Z0-9 _-]+)>>", message):
+            for match in CHANNEL_MENTION_PATTERN.finditer(message):
                 channel = self.get_channel(match.group(1))
                 logger.debug("Found mentioned channel %s", channel.name)
                 fixed_message = fixed_message.replace(match.group(0), channel.mention)
 
-            for match in re.finditer("<<@&([a-zA-Z0-9 _-]+)>>", message):
+            for match in ROLE_MENTION_PATTERN.finditer(message):
                 role = self.get_role(match.group(1))
                 logger.debug("Found mentioned role %s", role.name)
                 fixed_message = fixed_message.replace(match.group(0), role.mention)
@@ -329,18 +1044,27 @@ class GuildConfigurator:
         return fixed_messages
 
     @staticmethod
-    async def ensure_channel_messages(channel: discord.TextChannel, messages: list[str]) -> None:
+    async def ensure_channel_messages(channel: discord.TextChannel, messages: list[str]) -> bool:
+        """Ensure the messages of a channel, and return whether messages were sent or deleted."""
         logger.info("Ensure channel messages for channel %s", channel.name)
         existing_messages = []
         async for server_message in channel.history(limit=None, oldest_first=True):
             if not server_message.author.bot:
                 logger.warning("Channel has messages from non-bot users, skipping message creation")
-                return
+                return False
             existing_messages.append(server_message)
 
-        if [msg.content for msg in existing_messages] == messages:
+        existing_contents = [msg.content for msg in existing_messages]
+        if existing_contents == messages:
             logger.debug("No update required")
-            return
+            return False
+
+        if existing_contents == messages[: len(existing_contents)]:
+            # e.g. an interrupted previous run, or messages appended to the configuration
+            logger.debug("Existing messages are up-to-date, send missing messages")
+            for new_message in messages[len(existing_contents) :]:
+                await channel.send(content=new_message, suppress_embeds=True)
+            return True
 
         for server_message in existing_messages:
             logger.debug("Deleting existing message")
@@ -348,20 +1072,20 @@ class GuildConfigurator:
         for new_message in messages:
             logger.debug("Send new message")
             await channel.send(content=new_message, suppress_embeds=True)
+        return True
 
-    async def ensure_channel_topics(self, category_templates: list[Category]) -> None:
-        logger.info("Ensure channel topics")
-        for category_template in category_templates:
-            for channel_template in category_template.channels:
-                if isinstance(channel_template, VoiceChannel):
-                    continue  # voice channels have no topic
-                channel = self.get_channel(channel_template.name)
-                if isinstance(channel, discord.VoiceChannel):
-                    continue  # voice channels have no topic
-                expected_topic = channel_template.topic
-                if channel.topic != expected_topic:
-                    logger.debug("Update topic of channel %s", channel_template.name)
-                    await channel.edit(topic=expected_topic)
+    async def ensure_channel_topic(self, channel_template: ChannelTemplate) -> None:
+        if isinstance(channel_template, VoiceChannel):
+            return  # voice channels have no topic
+        channel = self.get_channel(channel_template.name)
+        if isinstance(channel, discord.VoiceChannel):
+            return  # voice channels have no topic
+        expected_topic = channel_template.topic
+        if channel.topic != expected_topic:
+            logger.debug("Update topic of channel %s", channel_template.name)
+            self.written_ids.add(channel.id)
+            channel = await channel.edit(topic=expected_topic) or channel
+            self._written_channels[channel.id] = channel
 
     async def ensure_system_channel(self, system_channel: SystemChannel) -> None:
         logger.info("Ensure system channel configuration")
@@ -369,7 +1093,7 @@ class GuildConfigurator:
         if current_system_channel is None or current_system_channel.name != system_channel.name:
             logger.debug("Update system channel")
             new_system_channel = self.get_text_channel(system_channel.name)
-            await self.guild.edit(system_channel=new_system_channel)
+            self.written_guild = await self.guild.edit(system_channel=new_system_channel)
 
         target_flags = discord.SystemChannelFlags(
             join_notifications=system_channel.join_notifications,
@@ -381,7 +1105,7 @@ class GuildConfigurator:
         )
         if self.guild.system_channel_flags != target_flags:
             logger.debug("Update system channel flags")
-            await self.guild.edit(system_channel_flags=target_flags)
+            self.written_guild = await self.guild.edit(system_channel_flags=target_flags)
 
     async def ensure_community_feature(self, community_features: CommunityFeatures) -> None:
         logger.info("Ensure 'COMMUNITY' feature configuration")
@@ -389,14 +1113,18 @@ class GuildConfigurator:
         logger.debug("Ensure rules and public updates channels")
         if self.guild.verification_level < VerificationLevel.medium:  # type: ignore[unsupported-operator]
             logger.debug("Raise verification level at medium")
-            await self.guild.edit(verification_level=discord.VerificationLevel.medium)
+            self.written_guild = await self.guild.edit(
+                verification_level=discord.VerificationLevel.medium
+            )
 
         if self.guild.default_notifications != discord.NotificationLevel.only_mentions:
-            await self.guild.edit(default_notifications=discord.NotificationLevel.only_mentions)
+            self.written_guild = await self.guild.edit(
+                default_notifications=discord.NotificationLevel.only_mentions
+            )
 
         if "COMMUNITY" not in self.guild.features:
             logger.debug("Enable guild 'COMMUNITY' feature")
-            await self.guild.edit(
+            self.written_guild = await self.guild.edit(
                 community=True,
                 public_updates_channel=self.get_text_channel(
                     community_features.public_updates_channel
@@ -408,3 +1136,31 @@ class GuildConfigurator:
                 description=community_features.guild_description,
                 explicit_content_filter=discord.ContentFilter.all_members,
             )
+
+
+class _PlanState:
+    def __init__(self) -> None:
+        """Keys of planned operations, and operations which are planned at the end."""
+        self.keys: Final[set[str]] = set()
+        self.deferred_operations: Final[list[Operation]] = []
+        # categories and channels are positioned relative to each other, so each of their
+        # operations depends on the previous one
+        self._last_positioned_key: str | None = None
+
+    def add(self, operation: Operation) -> Operation:
+        self.keys.add(operation.key)
+        return operation
+
+    def get_position_dependencies(self, key: str) -> list[str]:
+        """Get the dependencies of a category or channel operation due to its position."""
+        dependencies = [] if self._last_positioned_key is None else [self._last_positioned_key]
+        self._last_positioned_key = key
+        return dependencies
+
+    def add_messages(self, operation: Operation, operations: list[Operation]) -> None:
+        """Add a messages operation to `operations`, or defer it if it mentions later channels."""
+        planned_keys = self.keys | {planned.key for planned in operations}
+        if all(key in planned_keys for key in operation.dependencies if key.startswith("channel:")):
+            operations.append(operation)
+        else:
+            self.deferred_operations.append(operation)
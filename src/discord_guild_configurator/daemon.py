@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Final
+
+import discord
+from aiohttp import web
+from discord.ext.commands import Bot
+
+from discord_guild_configurator.configurator import GuildConfigurator
+from discord_guild_configurator.diff import ConfigDiff, diff_configs
+from discord_guild_configurator.exporter import GuildExporter
+from discord_guild_configurator.logs import log_context
+from discord_guild_configurator.models import GuildConfig
+from discord_guild_configurator.snapshot import SnapshotRefresher
+from discord_guild_configurator.verification import WriteVerifier
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+    from pathlib import Path
+
+    from discord_guild_configurator.snapshot import GuildSnapshot
+
+    Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+logger = logging.getLogger(__name__)
+
+# TCP servers only accept local connections
+LOCALHOST: Final = "127.0.0.1"
+
+# only the owner of the daemon may use the Unix socket, it is created with permissions 0o600
+SOCKET_UMASK: Final = 0o177
+
+
+class ConfiguratorDaemon(Bot):
+    def __init__(
+        self,
+        *,
+        socket_path: Path | None = None,
+        port: int | None = None,
+        api_token: str | None = None,
+        max_concurrency: int = 5,
+    ) -> None:
+        """Discord bot which stays connected and serves a local API for configuring guilds.
+
+        The API is served on the Unix socket `socket_path`, or on localhost at `port`. Any local
+        user can connect to the port, so requests on it must carry `api_token` in an
+        'Authorization: Bearer <api_token>' header. Requests from web browsers, i.e., with an
+        'Origin' header, are rejected, and request bodies must have the content type
+        'application/json', so web pages cannot send requests to the API.
+
+        - 'GET /guilds/{guild_id}/export': export the guild configuration
+        - 'POST /guilds/{guild_id}/plan': compare the guild to the configuration in the body
+        - 'POST /guilds/{guild_id}/apply': apply the configuration in the body. Query
+          parameters: 'verify' to verify written objects, 'full' to apply the complete
+          configuration.
+
+        The session, the gateway cache, and the HTTP connection pool are shared by all requests,
+        so requests only cost the REST calls they need. Plans are computed from guild snapshots,
+        which are kept in memory and refreshed from the audit log. The first apply for a guild
+        applies the complete configuration, later applies only apply the changes to the
+        previously applied configuration, unless 'full' is given.
+
+        Requests for the same guild are queued and handled one after another. Requests for
+        different guilds are handled concurrently. Guild members are not cached.
+        """
+        if (socket_path is None) == (port is None):
+            raise ValueError("Either 'socket_path' or 'port' is required")
+        if port is not None and not api_token:
+            raise ValueError("'api_token' is required when serving the API on a port")
+
+        intents = discord.Intents.all()
+        intents.presences = False
+        super().__init__(
+            intents=intents,
+            command_prefix="$",
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            chunk_guilds_at_startup=False,
+        )
+
+        self.socket_path: Final[Path | None] = socket_path
+        self.port: Final[int | None] = port
+        self.api_token: Final[str | None] = api_token
+        self.max_concurrency: Final[int] = max_concurrency
+
+        self._runner: web.AppRunner | None = None
+        self._guild_locks: Final[dict[int, asyncio.Lock]] = {}
+        self._snapshots: Final[dict[int, GuildSnapshot]] = {}
+        self._applied_templates: Final[dict[int, GuildConfig]] = {}
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._access_middleware, self._error_middleware])
+        app.add_routes(
+            [
+                web.get("/guilds/{guild_id}/export", self.handle_export),
+                web.post("/guilds/{guild_id}/plan", self.handle_plan),
+                web.post("/guilds/{guild_id}/apply", self.handle_apply),
+            ]
+        )
+        return app
+
+    async def on_ready(self) -> None:
+        """Event handler for successful connection."""
+        # 'on_ready' is dispatched again after reconnects
+        if self._runner is not None:
+            return
+
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        if self.socket_path is not None:
+            site: web.BaseSite = web.SockSite(self._runner, bind_unix_socket(self.socket_path))
+        else:
+            site = web.TCPSite(self._runner, LOCALHOST, self.port)
+        await site.start()
+        logger.info("Serving the configurator API on %s", site.name)
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            if self.socket_path is not None:
+                self.socket_path.unlink(missing_ok=True)
+        await super().close()
+
+    @web.middleware
+    async def _access_middleware(
+        self, request: web.Request, handler: Handler
+    ) -> web.StreamResponse:
+        if "Origin" in request.headers:
+            raise web.HTTPForbidden(text="Requests from web browsers are not allowed")
+        if self.api_token is not None:
+            authorization = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(authorization.encode(), f"Bearer {self.api_token}".encode()):
+                raise web.HTTPUnauthorized(text="Invalid or missing API token")
+        if request.method == "POST" and request.content_type != "application/json":
+            raise web.HTTPUnsupportedMediaType(text="The request body must be 'application/json'")
+        return await handler(request)
+
+    @web.middleware
+    async def _error_middleware(self, request: web.Request, handler: Handler) -> web.StreamResponse:
+        try:
+            return await handler(request)
+        except ValueError as error:
+            # includes invalid configurations
+            return web.json_response({"error": str(error)}, status=400)
+        except RuntimeError as error:
+            # the guild does not match what the configuration requires, e.g., missing channels
+            logger.exception("Could not handle %s %s", request.method, request.path)
+            return web.json_response({"error": str(error)}, status=409)
+        except discord.HTTPException as error:
+            logger.exception("Could not handle %s %s", request.method, request.path)
+            return web.json_response({"error": str(error)}, status=502)
+
+    def _get_guild(self, request: web.Request) -> discord.Guild:
+        guild_id = int(request.match_info["guild_id"])
+        guild = self.get_guild(guild_id)
+        if guild is None:
+            raise web.HTTPNotFound(text=f"Could not find guild with ID {guild_id}")
+        return guild
+
+    @asynccontextmanager
+    async def _queue_for_guild(self, guild: discord.Guild) -> AsyncIterator[None]:
+        """Wait until previous requests for the guild are handled."""
+        async with self._guild_locks.setdefault(guild.id, asyncio.Lock()):
+            with log_context(guild=guild.id):
+                yield
+
+    @staticmethod
+    async def _read_config(request: web.Request) -> GuildConfig:
+        return GuildConfig.model_validate_json(await request.text())
+
+    async def handle_export(self, request: web.Request) -> web.Response:
+        guild = self._get_guild(request)
+        async with self._queue_for_guild(guild):
+            exporter = GuildExporter(guild, max_concurrency=self.max_concurrency)
+            guild_config = await exporter.export_configuration()
+        return web.json_response(text=guild_config.model_dump_json())
+
+    async def handle_plan(self, request: web.Request) -> web.Response:
+        """Compare the guild's snapshot to a configuration, like 'discord-guild snapshot'."""
+        guild = self._get_guild(request)
+        template = await self._read_config(request)
+        async with self._queue_for_guild(guild):
+            snapshot = await SnapshotRefresher(self.http, guild.id).refresh_snapshot(
+                self._snapshots.get(guild.id)
+            )
+            self._snapshots[guild.id] = snapshot
+        return web.json_response(text=snapshot.diff_config(template).model_dump_json())
+
+    async def handle_apply(self, request: web.Request) -> web.Response:
+        """Apply a configuration and return the divergences found by the verification."""
+        guild = self._get_guild(request)
+        template = await self._read_config(request)
+        async with self._queue_for_guild(guild):
+            configurator = GuildConfigurator(guild, max_concurrency=self.max_concurrency)
+            applied_template = self._applied_templates.pop(guild.id, None)
+            if applied_template is None or "full" in request.query:
+                logger.info("Applying configuration to guild %d", guild.id)
+                await configurator.apply_configuration(template)
+            else:
+                diff = diff_configs(applied_template, template)
+                logger.info("Applying configuration changes to guild %d: %s", guild.id, diff)
+                await configurator.apply_changes(template, diff)
+            # only kept after a successful apply, so a failed apply is repeated completely
+            self._applied_templates[guild.id] = template
+
+            divergences = ConfigDiff()
+            if "verify" in request.query:
+                verifier = WriteVerifier(configurator, max_concurrency=self.max_concurrency)
+                divergences = await verifier.verify(template)
+        return web.json_response(text=divergences.model_dump_json())
+
+
+def bind_unix_socket(path: Path) -> socket.socket:
+    """Bind a Unix socket which only the owner may use, replacing the socket of a dead process.
+
+    The socket is created with restrictive permissions, so it is never accessible by others.
+    """
+    if path.is_socket():
+        remove_stale_socket(path)
+    unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the umask applies to the whole process, nothing else runs until it is restored
+    previous_umask = os.umask(SOCKET_UMASK)
+    try:
+        unix_socket.bind(str(path))
+    except OSError:
+        unix_socket.close()
+        raise
+    finally:
+        os.umask(previous_umask)
+    return unix_socket
+
+
+def remove_stale_socket(path: Path) -> None:
+    """Remove a socket file if no process listens on it anymore."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except ConnectionRefusedError:
+            logger.info("Removing stale socket %s", path)
+            path.unlink()
+            return
+    raise RuntimeError(f"Socket {path} is used by another process")
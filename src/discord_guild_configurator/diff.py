@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Final, Literal
+
+from pydantic import Field, computed_field
+
+from discord_guild_configurator._utils import StrictBaseModel
+from discord_guild_configurator.generated_models import PERMISSION_VALUES
+from discord_guild_configurator.models import (
+    ForumChannel,
+    TextChannel,
+    VoiceChannel,
+    get_template_key,
+    merge_permission_masks,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from discord_guild_configurator.models import (
+        Category,
+        ChannelTemplate,
+        GuildConfig,
+        GuildSettings,
+        OverwriteMasks,
+        Role,
+    )
+
+# - channel: type, category, position, forum tags
+# - permissions: merged category and channel permission overwrites
+# - topic: channel topic
+# - messages: default messages
+ChannelAspect = Literal["channel", "permissions", "topic", "messages"]
+
+# Discord returns at most 100 messages per history request
+MESSAGES_PER_HISTORY_REQUEST: Final = 100
+
+# one name per permission bit, e.g., 'view_channel' for its alias 'read_messages'
+PERMISSION_NAMES: Final = {value: name for name, value in PERMISSION_VALUES.items()}
+
+
+class RoleChange(StrictBaseModel):
+    name: str
+    added: bool = False
+    renamed_from: str | None = None
+    changed_fields: list[str] = Field(default_factory=list)
+    requests: int
+
+
+class CategoryChange(StrictBaseModel):
+    name: str
+    added: bool = False
+    renamed_from: str | None = None
+    moved: bool = False
+    requests: int
+
+
+class OverwriteChange(StrictBaseModel):
+    role: str
+    # permission -> new value, None if the permission is no longer overwritten
+    permissions: dict[str, bool | None]
+
+
+class ChannelChange(StrictBaseModel):
+    name: str
+    category: str
+    added: bool = False
+    renamed_from: str | None = None
+    moved: bool = False
+    overwrites: list[OverwriteChange] = Field(default_factory=list)
+    topic_changed: bool = False
+    messages_changed: bool = False
+    tags_added: list[str] = Field(default_factory=list)
+    # added, changed, or reordered tags
+    tags_changed: bool = False
+    require_tag_changed: bool = False
+    requests: int
+
+    @property
+    def aspects(self) -> list[ChannelAspect]:
+        aspects: list[ChannelAspect] = []
+        if (
+            self.added
+            or self.renamed_from
+            or self.moved
+            or self.tags_changed
+            or self.require_tag_changed
+        ):
+            aspects.append("channel")
+        if self.overwrites:
+            aspects.append("permissions")
+        if self.topic_changed:
+            aspects.append("topic")
+        if self.messages_changed:
+            aspects.append("messages")
+        return aspects
+
+
+class GuildSettingsChange(StrictBaseModel):
+    changed_fields: list[str]
+    requests: int
+
+
+class ConfigDiff(StrictBaseModel):
+    """Structural difference between two guild configurations.
+
+    Objects are identified by their template key, which defaults to the name. Removed objects
+    are not listed, since the configurator never deletes anything.
+
+    The number of requests is an estimate which assumes that the guild matches the old
+    configuration. It includes requests for reading channel histories.
+    """
+
+    roles: list[RoleChange] = Field(default_factory=list)
+    categories: list[CategoryChange] = Field(default_factory=list)
+    channels: list[ChannelChange] = Field(default_factory=list)
+    guild_settings: GuildSettingsChange | None = None
+
+    def is_empty(self) -> bool:
+        return not (self.roles or self.categories or self.channels or self.guild_settings)
+
+    @computed_field
+    @property
+    def estimated_requests(self) -> int:
+        changes: list[RoleChange | CategoryChange | ChannelChange | GuildSettingsChange] = [
+            *self.roles,
+            *self.categories,
+            *self.channels,
+        ]
+        if self.guild_settings is not None:
+            changes.append(self.guild_settings)
+        return sum(change.requests for change in changes)
+
+
+def diff_configs(old: GuildConfig, new: GuildConfig) -> ConfigDiff:
+    """Determine which objects of `new` differ from `old`.
+
+    Runs in linear time over the number of roles, categories, and channels.
+    """
+    old_roles = {get_template_key(role): role for role in old.roles}
+    roles = [
+        change
+        for role in new.roles
+        if (change := _diff_role(old_roles.get(get_template_key(role)), role)) is not None
+    ]
+
+    old_categories = {
+        get_template_key(category): (position, category)
+        for position, category in enumerate(old.categories)
+    }
+    categories = [
+        change
+        for position, category in enumerate(new.categories)
+        if (
+            change := _diff_category(
+                old_categories.get(get_template_key(category)), position, category
+            )
+        )
+        is not None
+    ]
+
+    old_channels = _index_channels(old)
+    channels = [
+        change
+        for key, new_channel in _index_channels(new).items()
+        if (change := new_channel.diff(old_channels.get(key))) is not None
+    ]
+
+    return ConfigDiff(
+        roles=roles,
+        categories=categories,
+        channels=channels,
+        guild_settings=_diff_guild_settings(old, new),
+    )
+
+
+def diff_observed_objects(
+    template: GuildConfig,
+    *,
+    roles: Mapping[str, Role | None],
+    categories: Mapping[str, tuple[int, Category] | None],
+    channels: Mapping[str, tuple[Category, ChannelTemplate, int] | None],
+    guild_settings: GuildSettings | None = None,
+) -> ConfigDiff:
+    """Determine which observed objects of a guild differ from `template`.
+
+    Objects are identified by their template key, `None` means that the object does not exist.
+    Categories are given with their position, channels with their category and position.
+    Observed channels contain their complete permission overwrites, so their category must not
+    have overwrites. Guild settings are only compared if `guild_settings` are given.
+    """
+    template_roles = {get_template_key(role): role for role in template.roles}
+    template_categories = {
+        get_template_key(category): (position, category)
+        for position, category in enumerate(template.categories)
+    }
+    template_channels = _index_channels(template)
+
+    return ConfigDiff(
+        roles=[
+            change
+            for key, role in roles.items()
+            if (change := _diff_role(role, template_roles[key])) is not None
+        ],
+        categories=[
+            change
+            for key, category in categories.items()
+            if (
+                change := _diff_category(
+                    category, template_categories[key][0], template_categories[key][1]
+                )
+            )
+            is not None
+        ],
+        channels=[
+            change
+            for key, channel in channels.items()
+            if (
+                change := template_channels[key].diff(
+                    None if channel is None else _IndexedChannel(template, *channel)
+                )
+            )
+            is not None
+        ],
+        guild_settings=(
+            None if guild_settings is None else _diff_guild_settings(guild_settings, template)
+        ),
+    )
+
+
+def _diff_category(
+    old: tuple[int, Category] | None, position: int, new: Category
+) -> CategoryChange | None:
+    if old is None:
+        return CategoryChange(name=new.name, added=True, requests=1)
+
+    old_position, old_category = old
+    change = CategoryChange(name=new.name, requests=0)
+    if old_category.name != new.name:
+        change.renamed_from = old_category.name
+        change.requests += 1
+    if old_position != position:
+        change.moved = True
+        change.requests += 1
+    if not (change.renamed_from or change.moved):
+        return None
+    return change
+
+
+def _diff_role(old: Role | None, new: Role) -> RoleChange | None:
+    if old is None:
+        return RoleChange(name=new.name, added=True, requests=1)
+
+    changed_fields = [
+        field
+        for field in ("name", "color", "hoist", "mentionable")
+        if getattr(old, field) != getattr(new, field)
+    ]
+    # the order of permissions is not stored by Discord
+    if old.permissions_mask != new.permissions_mask:
+        changed_fields.append("permissions")
+    if not changed_fields:
+        return None
+    # the configurator sends one request per changed field, but never changes the color of
+    # '@everyone'
+    requests = len(changed_fields)
+    if new.name == "@everyone" and "color" in changed_fields:
+        requests -= 1
+    return RoleChange(
+        name=new.name,
+        renamed_from=old.name if old.name != new.name else None,
+        changed_fields=changed_fields,
+        requests=requests,
+    )
+
+
+def _diff_guild_settings(old: GuildSettings, new: GuildSettings) -> GuildSettingsChange | None:
+    changed_fields = [
+        field
+        for field in (
+            "system_channel",
+            "community_features",
+            "verification_level",
+            "default_notifications",
+            "explicit_content_filter",
+            "preferred_locale",
+        )
+        if getattr(old, field) != getattr(new, field)
+    ]
+    if not changed_fields:
+        return None
+
+    requests = 0
+    if old.system_channel.name != new.system_channel.name:
+        requests += 1
+    if old.system_channel.model_dump(exclude={"name"}) != new.system_channel.model_dump(
+        exclude={"name"}
+    ):
+        requests += 1
+    if old.community_features is None and new.community_features is not None:
+        # raise verification level, set notification level, enable 'COMMUNITY'
+        requests += 3
+    return GuildSettingsChange(changed_fields=changed_fields, requests=requests)
+
+
+class _IndexedChannel:
+    def __init__(
+        self, config: GuildConfig, category: Category, channel: ChannelTemplate, position: int
+    ) -> None:
+        self.config: Final[GuildConfig] = config
+        self.category: Final[Category] = category
+        self.channel: Final[ChannelTemplate] = channel
+        self.position: Final[int] = position
+
+    def diff(self, old: _IndexedChannel | None) -> ChannelChange | None:
+        new_channel = self.channel
+        if old is None or old.channel.type != new_channel.type:
+            # the configurator creates a new channel, and keeps the old one
+            return self._diff_new_channel()
+
+        old_channel = old.channel
+        change = ChannelChange(
+            name=new_channel.name,
+            category=self.category.name,
+            overwrites=_diff_overwrites(old.merged_overwrites(), self.merged_overwrites()),
+            topic_changed=_get_topic(old_channel) != _get_topic(new_channel),
+            messages_changed=_get_messages(old_channel) != _get_messages(new_channel),
+            requests=0,
+        )
+
+        # name, category, and position are updated separately
+        if new_channel.name != old_channel.name:
+            change.renamed_from = old_channel.name
+            change.requests += 1
+        if get_template_key(self.category) != get_template_key(old.category):
+            change.moved = True
+            change.requests += 1
+        if self.position != old.position:
+            change.moved = True
+            change.requests += 1
+        if change.overwrites:
+            change.requests += 1
+        if change.topic_changed:
+            change.requests += 1
+        if change.messages_changed:
+            change.requests += _estimate_message_requests(
+                _get_messages(old_channel), _get_messages(new_channel)
+            )
+        if isinstance(new_channel, ForumChannel) and isinstance(old_channel, ForumChannel):
+            _diff_forum_tags(change, old_channel, new_channel)
+
+        if not change.aspects:
+            return None
+        return change
+
+    def _diff_new_channel(self) -> ChannelChange:
+        channel = self.channel
+        overwrites = _diff_overwrites({}, self.merged_overwrites())
+        change = ChannelChange(
+            name=channel.name,
+            category=self.category.name,
+            added=True,
+            overwrites=overwrites,
+            topic_changed=not isinstance(channel, VoiceChannel),
+            messages_changed=bool(_get_messages(channel)),
+            # the channel is created with its overwrites, topic, and forum tags
+            requests=1,
+        )
+        if change.messages_changed:
+            change.requests += _estimate_message_requests([], _get_messages(channel))
+        if isinstance(channel, ForumChannel):
+            change.tags_added = [tag.name for tag in channel.forum_tags]
+            change.tags_changed = bool(channel.tags)
+            change.require_tag_changed = channel.require_tag
+            if channel.require_tag:
+                # 'require_tag' cannot be set on creation
+                change.requests += 1
+        return change
+
+    def merged_overwrites(self) -> OverwriteMasks:
+        # resolved, so moving overwrites into role groups or overwrite sets is not a change
+        return merge_permission_masks(self.config.resolve_overwrites(self.category, self.channel))
+
+
+def _diff_overwrites(old: OverwriteMasks, new: OverwriteMasks) -> list[OverwriteChange]:
+    # compared as masks, so permission aliases are not a change
+    changes = []
+    for role in old.keys() | new.keys():
+        old_allow, old_deny = old.get(role, (0, 0))
+        new_allow, new_deny = new.get(role, (0, 0))
+        changed_bits = (old_allow ^ new_allow) | (old_deny ^ new_deny)
+        changed_permissions = {
+            name: bool(new_allow & bit) if (new_allow | new_deny) & bit else None
+            for bit, name in sorted(PERMISSION_NAMES.items(), key=lambda item: item[1])
+            if changed_bits & bit
+        }
+        if changed_permissions:
+            changes.append(OverwriteChange(role=role, permissions=changed_permissions))
+    return sorted(changes, key=lambda change: change.role)
+
+
+def _estimate_message_requests(old_messages: list[str], new_messages: list[str]) -> int:
+    if not new_messages:
+        # the configurator leaves channels without default messages alone
+        return 0
+    history_requests = max(1, math.ceil(len(old_messages) / MESSAGES_PER_HISTORY_REQUEST))
+    return history_requests + len(old_messages) + len(new_messages)
+
+
+def _diff_forum_tags(change: ChannelChange, old: ForumChannel, new: ForumChannel) -> None:
+    old_tag_names = {tag.name for tag in old.forum_tags}
+    change.tags_added = [tag.name for tag in new.forum_tags if tag.name not in old_tag_names]
+    change.tags_changed = new.forum_tags != old.forum_tags
+    change.require_tag_changed = new.require_tag != old.require_tag
+    if change.tags_changed or change.require_tag_changed:
+        # tags and 'require_tag' are updated with a single request
+        change.requests += 1
+
+
+def _get_topic(channel: ChannelTemplate) -> str | None:
+    return None if isinstance(channel, VoiceChannel) else channel.topic
+
+
+def _get_messages(channel: ChannelTemplate) -> list[str]:
+    return channel.channel_messages if isinstance(channel, TextChannel) else []
+
+
+def _index_channels(config: GuildConfig) -> dict[str, _IndexedChannel]:
+    channels: dict[str, _IndexedChannel] = {}
+    # channel positions are global, not per-category
+    position = 0
+    for category in config.categories:
+        for channel in category.channels:
+            channels[get_template_key(channel)] = _IndexedChannel(
+                config, category, channel, position
+            )
+            position += 1
+    return channels
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import TYPE_CHECKING, Final, Literal, get_args
+
+from discord_guild_configurator.logs import log_context
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterable, Awaitable, Callable, Collection
+
+    from discord_guild_configurator.journal import OperationJournal
+    from discord_guild_configurator.phases import Phase
+    from discord_guild_configurator.profiling import PhaseProfiler
+
+logger = logging.getLogger(__name__)
+
+# classes of operations, from highest to lowest priority:
+# - security: role permissions, permission overwrites, and new channels with their overwrites
+# - structure: categories, guild settings, and other changes required by later operations
+# - cosmetic: positions, names, topics, and default messages
+Priority = Literal["security", "structure", "cosmetic"]
+PRIORITIES: Final[tuple[Priority, ...]] = get_args(Priority)
+
+
+class Operation:
+    def __init__(  # noqa: PLR0913 (keyword-only options)
+        self,
+        key: str,
+        action: Callable[[], Awaitable[None]],
+        *,
+        dependencies: Collection[str] = (),
+        priority: Priority = "structure",
+        recorded: bool = True,
+        phase: Phase | None = None,
+    ) -> None:
+        """Wrap an idempotent action of a configuration plan.
+
+        `key` identifies the operation in journals and in the `dependencies` of other
+        operations. If more operations are ready than can run at the same time, operations with
+        a higher `priority` are started first. Operations which are not `recorded` in the
+        journal are always executed, even if a previous run completed them. Profiles of the
+        action are attributed to its `phase`.
+        """
+        self.key: Final[str] = key
+        self.action: Final[Callable[[], Awaitable[None]]] = action
+        self.dependencies: Final[Collection[str]] = dependencies
+        self.priority: Final[Priority] = priority
+        self.recorded: Final[bool] = recorded
+        self.phase: Final[Phase | None] = phase
+
+
+class OperationExecutor:
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 5,
+        journal: OperationJournal | None = None,
+        profiler: PhaseProfiler | None = None,
+    ) -> None:
+        """Execute planned operations concurrently, in the order given by their dependencies.
+
+        Operations are started as soon as they were planned and all their dependencies are
+        completed, so execution overlaps with planning. Dependencies on operations which were
+        not planned before are ignored, e.g., operations of phases which are not selected.
+
+        Ready operations are started by priority, then in planning order. Dependencies inherit
+        the priority of operations which depend on them, so a security operation never waits
+        for cosmetic operations which are queued behind other operations.
+
+        If a `journal` is given, operations recorded in it are skipped, and completed operations
+        are recorded. If a `profiler` is given, planning and each operation are profiled in
+        their phase.
+
+        Completed operations are released, only their keys are kept, so memory is bounded by the
+        operations which are not completed yet.
+
+        The time until all security operations were completed is logged as 'time to secure
+        state'. Each executor executes a single plan.
+        """
+        self.max_concurrency: Final[int] = max_concurrency
+        self.journal: Final[OperationJournal | None] = journal
+        self.profiler: Final[PhaseProfiler | None] = profiler
+
+        # seconds from the start until all security operations were completed, None before
+        self.time_to_secure_state: float | None = None
+
+        # planned operations which are not completed yet
+        self._operations: Final[dict[str, Operation]] = {}
+        self._completed_events: Final[dict[str, asyncio.Event]] = {}
+        self._completed_keys: Final[set[str]] = set()
+        # priority rank of each uncompleted operation, including inherited priorities
+        self._ranks: Final[dict[str, int]] = {}
+        # operations waiting for a free slot: (key, future which is set when the slot is free)
+        self._waiting: Final[list[tuple[str, asyncio.Future[None]]]] = []
+        self._free_slots = max_concurrency
+        self._planning_order: Final[dict[str, int]] = {}
+        self._pending_security_keys: Final[set[str]] = set()
+        self._planning_completed = False
+        self._start_time = 0.0
+
+    async def execute(self, operations: AsyncIterable[Operation]) -> None:
+        """Execute all operations.
+
+        If an operation fails, no further operations are started, running operations are
+        cancelled, and the first exception is raised.
+        """
+        self._start_time = time.monotonic()
+        counter = itertools.count()
+        if self.profiler is not None:
+            operations = self.profiler.profile_iterator("planning", operations)
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                async for operation in operations:
+                    if operation.key in self._operations or operation.key in self._completed_keys:
+                        raise ValueError(f"Duplicate operation: {operation.key}")
+                    self._operations[operation.key] = operation
+                    self._completed_events[operation.key] = asyncio.Event()
+                    self._planning_order[operation.key] = next(counter)
+                    self._ranks[operation.key] = PRIORITIES.index(operation.priority)
+                    self._inherit_priority(operation)
+                    if operation.priority == "security":
+                        self._pending_security_keys.add(operation.key)
+                    task_group.create_task(self._execute_operation(operation))
+                self._planning_completed = True
+                self._check_secure_state()
+        except ExceptionGroup as error:
+            # report the failure like a sequential run
+            raise error.exceptions[0] from None
+
+    def _inherit_priority(self, operation: Operation) -> None:
+        """Raise the priority of all uncompleted dependencies to the priority of `operation`."""
+        unvisited_keys = [operation.key]
+        while unvisited_keys:
+            key = unvisited_keys.pop()
+            for dependency in self._operations[key].dependencies:
+                if dependency in self._ranks and self._ranks[dependency] > self._ranks[key]:
+                    self._ranks[dependency] = self._ranks[key]
+                    unvisited_keys.append(dependency)
+
+    async def _execute_operation(self, operation: Operation) -> None:
+        with log_context(phase=operation.phase, object=operation.key):
+            await self._execute_operation_in_context(operation)
+
+    async def _execute_operation_in_context(self, operation: Operation) -> None:
+        for dependency in operation.dependencies:
+            # completed and unplanned dependencies have no event
+            completed_event = self._completed_events.get(dependency)
+            if completed_event is not None:
+                await completed_event.wait()
+
+        if not (
+            operation.recorded
+            and self.journal is not None
+            and self.journal.is_completed(operation.key)
+        ):
+            await self._acquire_slot(operation.key)
+            try:
+                if self.profiler is None:
+                    await operation.action()
+                else:
+                    await self.profiler.profile_awaitable(
+                        operation.phase or "other", operation.action()
+                    )
+            finally:
+                self._release_slot()
+            if operation.recorded and self.journal is not None:
+                self.journal.record(operation.key)
+        else:
+            logger.debug("Skip completed operation %s", operation.key)
+
+        self._complete(operation.key)
+        self._pending_security_keys.discard(operation.key)
+        self._check_secure_state()
+
+    def _complete(self, key: str) -> None:
+        """Wake up dependent operations, and release the completed operation."""
+        self._completed_events.pop(key).set()
+        self._completed_keys.add(key)
+        del self._operations[key]
+        del self._ranks[key]
+        del self._planning_order[key]
+
+    async def _acquire_slot(self, key: str) -> None:
+        if self._free_slots > 0 and not self._waiting:
+            self._free_slots -= 1
+            return
+        slot = asyncio.get_running_loop().create_future()
+        self._waiting.append((key, slot))
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                # the slot was granted, but is not used
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        # priorities of waiting operations might be raised while they wait, so the next
+        # operation is searched instead of kept in a heap
+        self._waiting[:] = [(key, slot) for key, slot in self._waiting if not slot.done()]
+        if not self._waiting:
+            self._free_slots += 1
+            return
+        key, slot = min(
+            self._waiting,
+            key=lambda waiting: (self._ranks[waiting[0]], self._planning_order[waiting[0]]),
+        )
+        self._waiting.remove((key, slot))
+        slot.set_result(None)
+
+    def _check_secure_state(self) -> None:
+        if (
+            self.time_to_secure_state is None
+            and self._planning_completed
+            and not self._pending_security_keys
+        ):
+            self.time_to_secure_state = time.monotonic() - self._start_time
+            logger.info("Reached secure state after %.1f seconds", self.time_to_secure_state)
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Final
+
+import discord
+
+from discord_guild_configurator.models import (
+    Category,
+    CommunityFeatures,
+    ForumChannel,
+    ForumTag,
+    GuildConfig,
+    GuildSettings,
+    PermissionOverwrite,
+    Role,
+    SystemChannel,
+    TextChannel,
+    VoiceChannel,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator, Mapping, Sequence
+
+logger = logging.getLogger(__name__)
+
+# role name -> permission name -> allowed (True) or denied (False)
+OverwritesByRole = dict[str, dict[str, bool]]
+
+# names which can be referenced as '<<#name>>' or '<<@&name>>' in channel messages
+MENTIONABLE_NAME_PATTERN: Final = re.compile("^[a-zA-Z0-9 _-]+$")
+
+
+class GuildExporter:
+    def __init__(self, guild: discord.Guild, *, max_concurrency: int = 10) -> None:
+        """Export the configuration of an existing guild.
+
+        Everything except channel messages is read from the client's cache.
+        Channel histories are fetched concurrently, with at most `max_concurrency` requests
+        in flight.
+
+        Configurations require unique names, so roles, categories, channels, and forum tags
+        whose name was already exported are skipped with a warning.
+        """
+        self.guild: Final[discord.Guild] = guild
+        self.max_concurrency: Final[int] = max_concurrency
+        self._history_semaphore: Final = asyncio.Semaphore(max_concurrency)
+        # roles which are not exported, so their permission overwrites are not exported either
+        self._skipped_role_ids: Final[set[int]] = set()
+
+    async def export_configuration(self) -> GuildConfig:
+        settings = self.export_settings()
+        role_names = {role.name for role in settings.roles}
+        categories = [category async for category in self.iter_categories(role_names)]
+        return GuildConfig.model_validate({**settings.model_dump(), "categories": categories})
+
+    def export_settings(self) -> GuildSettings:
+        """Export everything except the categories."""
+        logger.info("Exporting roles and guild settings")
+        return GuildSettings(
+            roles=self.export_roles(),
+            system_channel=self.export_system_channel(),
+            community_features=self.export_community_features(),
+            verification_level=self.guild.verification_level.name,
+            default_notifications=self.guild.default_notifications.name,
+            explicit_content_filter=self.guild.explicit_content_filter.name,
+            preferred_locale=self.guild.preferred_locale.name,
+        )
+
+    def export_roles(self) -> list[Role]:
+        roles = []
+        role_names = set()
+        # highest role first, '@everyone' last
+        for role in sorted(self.guild.roles, reverse=True):
+            if role.managed:
+                logger.debug("Skip managed role %s", role.name)
+                continue
+            if role.name in role_names:
+                logger.warning("Skip role %s (%d): Duplicate name", role.name, role.id)
+                self._skipped_role_ids.add(role.id)
+                continue
+            role_names.add(role.name)
+            roles.append(self.export_role(role))
+        return roles
+
+    @staticmethod
+    def export_role(role: discord.Role) -> Role:
+        return Role(
+            name=role.name,
+            color=f"#{role.colour.value:06X}",
+            hoist=role.hoist,
+            mentionable=role.mentionable,
+            permissions=[name for name, value in role.permissions if value],  # type: ignore[invalid-argument-type]
+        )
+
+    async def iter_categories(self, role_names: set[str]) -> AsyncIterator[Category]:
+        """Export the categories, and yield them in guild order as soon as they are exported.
+
+        Up to `max_concurrency` categories are exported ahead of the category which is yielded
+        next, the semaphore limits the number of requests.
+        """
+        category_tasks: deque[asyncio.Task[Category]] = deque()
+        try:
+            for category, channels in self._iter_unique_categories():
+                category_tasks.append(
+                    asyncio.create_task(self.export_category(category, channels, role_names))
+                )
+                if len(category_tasks) > self.max_concurrency:
+                    yield await category_tasks.popleft()
+            while category_tasks:
+                yield await category_tasks.popleft()
+        finally:
+            for task in category_tasks:
+                task.cancel()
+
+    def _iter_unique_categories(
+        self,
+    ) -> Iterator[tuple[discord.CategoryChannel, list[discord.abc.GuildChannel]]]:
+        category_names = set()
+        channel_names = set()
+        for category, channels in self.guild.by_category():
+            if category is None:
+                for channel in channels:
+                    logger.warning("Skip channel %s: Not part of a category", channel.name)
+                continue
+            if category.name in category_names:
+                logger.warning("Skip category %s (%d): Duplicate name", category.name, category.id)
+                continue
+            category_names.add(category.name)
+
+            unique_channels = []
+            for channel in channels:
+                if channel.name in channel_names:
+                    logger.warning("Skip channel %s (%d): Duplicate name", channel.name, channel.id)
+                    continue
+                channel_names.add(channel.name)
+                unique_channels.append(channel)
+            yield category, unique_channels
+
+    async def export_category(
+        self,
+        category: discord.CategoryChannel,
+        channels: Sequence[discord.abc.GuildChannel],
+        role_names: set[str],
+    ) -> Category:
+        logger.debug("Export category %s", category.name)
+        category_overwrites = self.get_overwrites_by_role(
+            self._without_skipped_roles(category.overwrites), role_names
+        )
+
+        channel_tasks = []
+        for channel in channels:
+            if not isinstance(
+                channel, (discord.TextChannel, discord.ForumChannel, discord.VoiceChannel)
+            ):
+                logger.warning("Skip channel %s: Unsupported type %s", channel.name, channel.type)
+                continue
+            channel_overwrites = self.get_overwrites_by_role(
+                self._without_skipped_roles(channel.overwrites), role_names
+            )
+            channel_tasks.append(
+                self.export_channel(
+                    channel,
+                    self.fold_overwrites(
+                        self.subtract_overwrites(channel_overwrites, category_overwrites)
+                    ),
+                )
+            )
+
+        exported_category = Category(
+            name=category.name,
+            channels=list(await asyncio.gather(*channel_tasks)),
+            permission_overwrites=self.fold_overwrites(category_overwrites),
+        )
+        logger.info("Exported category %s", category.name)
+        return exported_category
+
+    async def export_channel(
+        self,
+        channel: discord.TextChannel | discord.ForumChannel | discord.VoiceChannel,
+        permission_overwrites: list[PermissionOverwrite],
+        *,
+        include_messages: bool = True,
+    ) -> TextChannel | ForumChannel | VoiceChannel:
+        """Export a channel, text channels without messages if `include_messages` is False."""
+        logger.debug("Export channel %s", channel.name)
+        if isinstance(channel, discord.TextChannel):
+            return TextChannel(
+                name=channel.name,
+                topic=channel.topic or "",
+                permission_overwrites=permission_overwrites,
+                channel_messages=(
+                    await self.export_channel_messages(channel) if include_messages else []
+                ),
+            )
+        if isinstance(channel, discord.ForumChannel):
+            return ForumChannel(
+                name=channel.name,
+                topic=channel.topic or "",
+                permission_overwrites=permission_overwrites,
+                tags=[self.export_forum_tag(tag) for tag in self._unique_tags(channel)],
+                require_tag=channel.flags.require_tag,
+            )
+        return VoiceChannel(name=channel.name, permission_overwrites=permission_overwrites)
+
+    @staticmethod
+    def _unique_tags(channel: discord.ForumChannel) -> list[discord.ForumTag]:
+        tags: dict[str, discord.ForumTag] = {}
+        for tag in channel.available_tags:
+            if tag.name in tags:
+                logger.warning("Skip tag %s of channel %s: Duplicate name", tag.name, channel.name)
+                continue
+            tags[tag.name] = tag
+        return list(tags.values())
+
+    @staticmethod
+    def export_forum_tag(tag: discord.ForumTag) -> str | ForumTag:
+        if tag.emoji is None and not tag.moderated:
+            return tag.name
+        return ForumTag(
+            name=tag.name,
+            emoji=str(tag.emoji) if tag.emoji is not None else None,
+            moderated=tag.moderated,
+        )
+
+    async def export_channel_messages(self, channel: discord.TextChannel) -> list[str]:
+        messages = []
+        async with self._history_semaphore:
+            async for message in channel.history(limit=None, oldest_first=True):
+                if not message.author.bot:
+                    # same rule as the configurator: channels with human messages are left alone
+                    logger.debug("Channel %s has messages from non-bot users", channel.name)
+                    return []
+                messages.append(self.replace_mentions_with_placeholders(message.content))
+        return messages
+
+    def replace_mentions_with_placeholders(self, message: str) -> str:
+        def replace_channel_mention(match: re.Match[str]) -> str:
+            channel = self.guild.get_channel(int(match.group(1)))
+            if channel is None or not MENTIONABLE_NAME_PATTERN.match(channel.name):
+                return match.group(0)
+            return f"<<#{channel.name}>>"
+
+        def replace_role_mention(match: re.Match[str]) -> str:
+            role = self.guild.get_role(int(match.group(1)))
+            if role is None or not MENTIONABLE_NAME_PATTERN.match(role.name):
+                return match.group(0)
+            return f"<<@&{role.name}>>"
+
+        message = re.sub(r"<#(\d+)>", replace_channel_mention, message)
+        return re.sub(r"<@&(\d+)>", replace_role_mention, message)
+
+    def _without_skipped_roles(
+        self,
+        overwrites: Mapping[
+            discord.Role | discord.Member | discord.Object, discord.PermissionOverwrite
+        ],
+    ) -> dict[discord.Role | discord.Member | discord.Object, discord.PermissionOverwrite]:
+        return {
+            target: overwrite
+            for target, overwrite in overwrites.items()
+            if target.id not in self._skipped_role_ids
+        }
+
+    @staticmethod
+    def get_overwrites_by_role(
+        overwrites: Mapping[
+            discord.Role | discord.Member | discord.Object, discord.PermissionOverwrite
+        ],
+        role_names: set[str],
+    ) -> OverwritesByRole:
+        overwrites_by_role: OverwritesByRole = {}
+        for target, overwrite in overwrites.items():
+            if not isinstance(target, discord.Role) or target.name not in role_names:
+                logger.debug("Skip permission overwrite for %s", target)
+                continue
+            overwrites_by_role[target.name] = {
+                permission: value for permission, value in overwrite if value is not None
+            }
+        return overwrites_by_role
+
+    @staticmethod
+    def subtract_overwrites(
+        channel_overwrites: OverwritesByRole, category_overwrites: OverwritesByRole
+    ) -> OverwritesByRole:
+        """Remove channel overwrites which are already defined by the category."""
+        remaining_overwrites: OverwritesByRole = {}
+        for role_name, overwrites in channel_overwrites.items():
+            inherited = category_overwrites.get(role_name, {})
+            remaining = {
+                permission: value
+                for permission, value in overwrites.items()
+                if inherited.get(permission) != value
+            }
+            if remaining:
+                remaining_overwrites[role_name] = remaining
+        return remaining_overwrites
+
+    @staticmethod
+    def fold_overwrites(overwrites_by_role: OverwritesByRole) -> list[PermissionOverwrite]:
+        """Group roles with identical overwrites into a single `PermissionOverwrite`."""
+        roles_by_overwrite: dict[tuple[tuple[str, ...], tuple[str, ...]], list[str]]
+        roles_by_overwrite = defaultdict(list)
+        for role_name, overwrites in overwrites_by_role.items():
+            allow = tuple(sorted(permission for permission, value in overwrites.items() if value))
+            deny = tuple(
+                sorted(permission for permission, value in overwrites.items() if not value)
+            )
+            roles_by_overwrite[allow, deny].append(role_name)
+
+        return [
+            PermissionOverwrite(roles=roles, allow=list(allow), deny=list(deny))  # type: ignore[invalid-argument-type]
+            for (allow, deny), roles in roles_by_overwrite.items()
+        ]
+
+    def export_system_channel(self) -> SystemChannel:
+        system_channel = self.guild.system_channel
+        if system_channel is None:
+            raise RuntimeError("The guild has no system channel")
+        flags = self.guild.system_channel_flags
+        return SystemChannel(
+            name=system_channel.name,
+            guild_reminder_notifications=flags.guild_reminder_notifications,
+            join_notification_replies=flags.join_notification_replies,
+            join_notifications=flags.join_notifications,
+            premium_subscriptions=flags.premium_subscriptions,
+            role_subscription_purchase_notification_replies=flags.role_subscription_purchase_notification_replies,
+            role_subscription_purchase_notifications=flags.role_subscription_purchase_notifications,
+        )
+
+    def export_community_features(self) -> CommunityFeatures | None:
+        if "COMMUNITY" not in self.guild.features:
+            return None
+
+        rules_channel = self.guild.rules_channel
+        public_updates_channel = self.guild.public_updates_channel
+        safety_alerts_channel = self.guild.safety_alerts_channel
+        if rules_channel is None or public_updates_channel is None or safety_alerts_channel is None:
+            raise RuntimeError(
+                "The 'COMMUNITY' feature is enabled, but not all community channels are set"
+            )
+        return CommunityFeatures(
+            guild_description=self.guild.description,
+            rules_channel=rules_channel.name,
+            public_updates_channel=public_updates_channel.name,
+            safety_alerts_channel=safety_alerts_channel.name,
+        )
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import TYPE_CHECKING, Final
+
+import discord
+import yarl
+from discord.ext.commands import AutoShardedBot
+
+from discord_guild_configurator.logs import log_context
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Collection
+
+logger = logging.getLogger(__name__)
+
+# Discord allows one IDENTIFY per rate limit bucket every 5 seconds
+IDENTIFY_INTERVAL: Final = 5.0
+
+
+class IdentifyLimiter:
+    def __init__(self, max_concurrency: int) -> None:
+        """Limit IDENTIFY requests to the session start limit of the bot.
+
+        Shards are assigned to `max_concurrency` buckets by `shard_id % max_concurrency`.
+        Shards of different buckets identify at the same time, shards of the same bucket
+        identify one after another, with `IDENTIFY_INTERVAL` seconds in between.
+        """
+        self.max_concurrency: Final[int] = max_concurrency
+        self._locks: Final[dict[int, asyncio.Lock]] = {}
+        self._last_identify_times: Final[dict[int, float]] = {}
+
+    async def wait(self, shard_id: int) -> None:
+        bucket = shard_id % self.max_concurrency
+        async with self._locks.setdefault(bucket, asyncio.Lock()):
+            last_identify_time = self._last_identify_times.get(bucket, -math.inf)
+            delay = last_identify_time + IDENTIFY_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_identify_times[bucket] = time.monotonic()
+
+
+class FleetConfigurationBot(AutoShardedBot):
+    def __init__(
+        self,
+        action: Callable[[discord.Guild], Awaitable[None]],
+        *,
+        guild_ids: Collection[int] | None = None,
+        max_concurrent_guilds: int = 10,
+    ) -> None:
+        """Discord bot which runs an action on many guilds and then stops itself.
+
+        The bot is automatically sharded. Shards are started concurrently, as fast as the
+        session start limit of the bot allows. The action runs on each guild of a shard as soon
+        as the shard is ready, without waiting for other shards. The action runs on up to
+        `max_concurrent_guilds` guilds at the same time.
+
+        If `guild_ids` are given, only these guilds are configured. Otherwise, all guilds of
+        the bot are configured. Guild members are neither requested on startup nor cached.
+
+        Failed actions are logged, and do not stop the other guilds. The IDs of the failed and
+        the missing guilds are collected in `failed_guild_ids`.
+        """
+        intents = discord.Intents.all()
+        intents.presences = False
+        super().__init__(
+            intents=intents,
+            command_prefix="$",
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            chunk_guilds_at_startup=False,
+        )
+
+        self.action: Final[Callable[[discord.Guild], Awaitable[None]]] = action
+        self.guild_ids: Final[frozenset[int] | None] = (
+            None if guild_ids is None else frozenset(guild_ids)
+        )
+        self.failed_guild_ids: Final[set[int]] = set()
+
+        self._guild_semaphore: Final = asyncio.Semaphore(max_concurrent_guilds)
+        self._identify_limiter: IdentifyLimiter | None = None
+        self._started_guild_ids: Final[set[int]] = set()
+        self._guild_tasks: Final[set[asyncio.Task[None]]] = set()
+        # guilds whose action was started, but is not done yet
+        self._pending_guild_count = 0
+        self._all_shards_ready = False
+
+    async def launch_shards(self) -> None:
+        """Connect all shards, in rounds of shards which may identify at the same time."""
+        if self.is_closed():
+            return
+
+        # the gateway also returns the session start limit, so it is fetched for fixed shard counts
+        shard_count, gateway_url, session_start_limit = await self.http.get_bot_gateway()
+        if self.shard_count is None:
+            self.shard_count = shard_count
+        self._connection.shard_count = self.shard_count
+        shard_ids = self.shard_ids or range(self.shard_count)
+        self._connection.shard_ids = shard_ids
+
+        max_concurrency = session_start_limit["max_concurrency"]
+        self._identify_limiter = IdentifyLimiter(max_concurrency)
+        logger.info(
+            "Launching %d shards, %d at a time",
+            len(shard_ids),
+            min(max_concurrency, len(shard_ids)),
+        )
+        gateway = yarl.URL(gateway_url)
+        for start in range(0, len(shard_ids), max_concurrency):
+            await asyncio.gather(
+                *(
+                    self.launch_shard(gateway, shard_id, initial=shard_id == shard_ids[0])
+                    for shard_id in shard_ids[start : start + max_concurrency]
+                )
+            )
+
+    async def before_identify_hook(self, shard_id: int | None, *, initial: bool = False) -> None:
+        if self._identify_limiter is None:
+            await super().before_identify_hook(shard_id, initial=initial)
+        else:
+            await self._identify_limiter.wait(shard_id or 0)
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        """Event handler for a shard which received all its guilds."""
+        logger.info("Shard %d is ready", shard_id)
+        for guild in self.guilds:
+            if guild.shard_id == shard_id:
+                self._start_guild(guild)
+
+    async def on_ready(self) -> None:
+        """Event handler for all shards being ready."""
+        # 'on_ready' is dispatched again after reconnects
+        if self._all_shards_ready:
+            return
+        self._all_shards_ready = True
+
+        for guild in self.guilds:
+            self._start_guild(guild)
+        if self.guild_ids is not None:
+            missing_guild_ids = self.guild_ids - self._started_guild_ids
+            if missing_guild_ids:
+                logger.error("Could not find guilds with IDs %s", sorted(missing_guild_ids))
+                self.failed_guild_ids.update(missing_guild_ids)
+        await self._close_if_done()
+
+    def _start_guild(self, guild: discord.Guild) -> None:
+        if guild.id in self._started_guild_ids or (
+            self.guild_ids is not None and guild.id not in self.guild_ids
+        ):
+            return
+        self._started_guild_ids.add(guild.id)
+        self._pending_guild_count += 1
+        task = asyncio.create_task(self._run_action(guild))
+        self._guild_tasks.add(task)
+        task.add_done_callback(self._guild_tasks.discard)
+
+    async def _run_action(self, guild: discord.Guild) -> None:
+        try:
+            async with self._guild_semaphore:
+                logger.info("Configuring guild %s (%d)", guild.name, guild.id)
+                with log_context(guild=guild.id):
+                    await self.action(guild)
+        except Exception:
+            # any failure only fails this guild, otherwise the bot would never stop
+            logger.exception("Could not configure guild %s (%d)", guild.name, guild.id)
+            self.failed_guild_ids.add(guild.id)
+        finally:
+            self._pending_guild_count -= 1
+            await self._close_if_done()
+
+    async def _close_if_done(self) -> None:
+        if self._all_shards_ready and self._pending_guild_count == 0:
+            await self.close()
@@ -1,13 +1,11 @@
-from typing import Annotated, Literal
-
-import discord
-import pydantic
+from typing import Final, Literal
 
 Permissions = Literal[
     "add_reactions",
     "administrator",
     "attach_files",
     "ban_members",
+    "bypass_slowmode",
     "change_nickname",
     "connect",
     "create_events",
@@ -37,6 +35,7 @@ Permissions = Literal[
     "moderate_members",
     "move_members",
     "mute_members",
+    "pin_messages",
     "priority_speaker",
     "read_message_history",
     "read_messages",
@@ -46,6 +45,7 @@ Permissions = Literal[
     "send_polls",
     "send_tts_messages",
     "send_voice_messages",
+    "set_voice_channel_status",
     "speak",
     "stream",
     "use_application_commands",
@@ -61,55 +61,164 @@ Permissions = Literal[
     "view_creator_monetization_analytics",
     "view_guild_insights",
 ]
-VerificationLevel = Annotated[
-    discord.VerificationLevel,
-    pydantic.PlainValidator(
-        lambda value: discord.VerificationLevel[value] if isinstance(value, str) else value
-    ),
-    pydantic.PlainSerializer(lambda value: value.name),
-    pydantic.Field(
-        json_schema_extra={
-            "enum": [option.name for option in discord.VerificationLevel],
-            "type": "string",
-        },
-    ),
+PERMISSION_VALUES: Final[dict[Permissions, int]] = {
+    "add_reactions": 1 << 6,
+    "administrator": 1 << 3,
+    "attach_files": 1 << 15,
+    "ban_members": 1 << 2,
+    "bypass_slowmode": 1 << 52,
+    "change_nickname": 1 << 26,
+    "connect": 1 << 20,
+    "create_events": 1 << 44,
+    "create_expressions": 1 << 43,
+    "create_instant_invite": 1 << 0,
+    "create_polls": 1 << 49,
+    "create_private_threads": 1 << 36,
+    "create_public_threads": 1 << 35,
+    "deafen_members": 1 << 23,
+    "embed_links": 1 << 14,
+    "external_emojis": 1 << 18,
+    "external_stickers": 1 << 37,
+    "kick_members": 1 << 1,
+    "manage_channels": 1 << 4,
+    "manage_emojis": 1 << 30,
+    "manage_emojis_and_stickers": 1 << 30,
+    "manage_events": 1 << 33,
+    "manage_expressions": 1 << 30,
+    "manage_guild": 1 << 5,
+    "manage_messages": 1 << 13,
+    "manage_nicknames": 1 << 27,
+    "manage_permissions": 1 << 28,
+    "manage_roles": 1 << 28,
+    "manage_threads": 1 << 34,
+    "manage_webhooks": 1 << 29,
+    "mention_everyone": 1 << 17,
+    "moderate_members": 1 << 40,
+    "move_members": 1 << 24,
+    "mute_members": 1 << 22,
+    "pin_messages": 1 << 51,
+    "priority_speaker": 1 << 8,
+    "read_message_history": 1 << 16,
+    "read_messages": 1 << 10,
+    "request_to_speak": 1 << 32,
+    "send_messages": 1 << 11,
+    "send_messages_in_threads": 1 << 38,
+    "send_polls": 1 << 49,
+    "send_tts_messages": 1 << 12,
+    "send_voice_messages": 1 << 46,
+    "set_voice_channel_status": 1 << 48,
+    "speak": 1 << 21,
+    "stream": 1 << 9,
+    "use_application_commands": 1 << 31,
+    "use_embedded_activities": 1 << 39,
+    "use_external_apps": 1 << 50,
+    "use_external_emojis": 1 << 18,
+    "use_external_sounds": 1 << 45,
+    "use_external_stickers": 1 << 37,
+    "use_soundboard": 1 << 42,
+    "use_voice_activation": 1 << 25,
+    "view_audit_log": 1 << 7,
+    "view_channel": 1 << 10,
+    "view_creator_monetization_analytics": 1 << 41,
+    "view_guild_insights": 1 << 19,
+}
+VerificationLevel = Literal[
+    "none",
+    "low",
+    "medium",
+    "high",
+    "highest",
 ]
-NotificationLevel = Annotated[
-    discord.NotificationLevel,
-    pydantic.PlainValidator(
-        lambda value: discord.NotificationLevel[value] if isinstance(value, str) else value
-    ),
-    pydantic.PlainSerializer(lambda value: value.name),
-    pydantic.Field(
-        json_schema_extra={
-            "enum": [option.name for option in discord.NotificationLevel],
-            "type": "string",
-        },
-    ),
+VERIFICATION_LEVEL_VALUES: Final[dict[VerificationLevel, int]] = {
+    "none": 0,
+    "low": 1,
+    "medium": 2,
+    "high": 3,
+    "highest": 4,
+}
+NotificationLevel = Literal[
+    "all_messages",
+    "only_mentions",
 ]
-Locale = Annotated[
-    discord.Locale,
-    pydantic.PlainValidator(
-        lambda value: discord.Locale[value] if isinstance(value, str) else value
-    ),
-    pydantic.PlainSerializer(lambda value: value.name),
-    pydantic.Field(
-        json_schema_extra={
-            "enum": [option.name for option in discord.Locale],
-            "type": "string",
-        },
-    ),
+NOTIFICATION_LEVEL_VALUES: Final[dict[NotificationLevel, int]] = {
+    "all_messages": 0,
+    "only_mentions": 1,
+}
+Locale = Literal[
+    "american_english",
+    "british_english",
+    "bulgarian",
+    "chinese",
+    "taiwan_chinese",
+    "croatian",
+    "czech",
+    "indonesian",
+    "danish",
+    "dutch",
+    "finnish",
+    "french",
+    "german",
+    "greek",
+    "hindi",
+    "hungarian",
+    "italian",
+    "japanese",
+    "korean",
+    "latin_american_spanish",
+    "lithuanian",
+    "norwegian",
+    "polish",
+    "brazil_portuguese",
+    "romanian",
+    "russian",
+    "spain_spanish",
+    "swedish",
+    "thai",
+    "turkish",
+    "ukrainian",
+    "vietnamese",
 ]
-ContentFilter = Annotated[
-    discord.ContentFilter,
-    pydantic.PlainValidator(
-        lambda value: discord.ContentFilter[value] if isinstance(value, str) else value
-    ),
-    pydantic.PlainSerializer(lambda value: value.name),
-    pydantic.Field(
-        json_schema_extra={
-            "enum": [option.name for option in discord.ContentFilter],
-            "type": "string",
-        },
-    ),
+LOCALE_VALUES: Final[dict[Locale, str]] = {
+    "american_english": "en-US",
+    "british_english": "en-GB",
+    "bulgarian": "bg",
+    "chinese": "zh-CN",
+    "taiwan_chinese": "zh-TW",
+    "croatian": "hr",
+    "czech": "cs",
+    "indonesian": "id",
+    "danish": "da",
+    "dutch": "nl",
+    "finnish": "fi",
+    "french": "fr",
+    "german": "de",
+    "greek": "el",
+    "hindi": "hi",
+    "hungarian": "hu",
+    "italian": "it",
+    "japanese": "ja",
+    "korean": "ko",
+    "latin_american_spanish": "es-419",
+    "lithuanian": "lt",
+    "norwegian": "no",
+    "polish": "pl",
+    "brazil_portuguese": "pt-BR",
+    "romanian": "ro",
+    "russian": "ru",
+    "spain_spanish": "es-ES",
+    "swedish": "sv-SE",
+    "thai": "th",
+    "turkish": "tr",
+    "ukrainian": "uk",
+    "vietnamese": "vi",
+}
+ContentFilter = Literal[
+    "disabled",
+    "no_role",
+    "all_members",
 ]
+CONTENT_FILTER_VALUES: Final[dict[ContentFilter, int]] = {
+    "disabled": 0,
+    "no_role": 1,
+    "all_members": 2,
+}
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from pydantic import Field
+
+from discord_guild_configurator._utils import StrictBaseModel
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class IdMapping(StrictBaseModel):
+    """Discord IDs of configured objects, by template key.
+
+    See `discord_guild_configurator.models.get_template_key`.
+    """
+
+    roles: dict[str, int] = Field(default_factory=dict)
+    categories: dict[str, int] = Field(default_factory=dict)
+    channels: dict[str, int] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> IdMapping:
+        """Load a mapping file. Returns an empty mapping if the file does not exist."""
+        if not path.exists():
+            return cls()
+        return cls.model_validate_json(path.read_text(encoding="UTF-8"))
+
+    def save(self, path: Path) -> None:
+        path.write_text(self.model_dump_json(indent=2) + "\n", encoding="UTF-8")
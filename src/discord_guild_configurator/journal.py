@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from discord_guild_configurator.chunked_config import ChunkedConfigReader
+    from discord_guild_configurator.models import GuildConfig
+
+logger = logging.getLogger(__name__)
+
+
+class OperationJournal:
+    def __init__(self, path: Path, *, scope: str) -> None:
+        """Append-only journal of completed operations.
+
+        Each line of the journal file is a JSON object with the keys 'scope' and 'operation'.
+        Only entries of the given `scope` are considered, so one file can be shared between
+        guilds and configurations.
+        """
+        self.path: Final[Path] = path
+        self.scope: Final[str] = scope
+        self._completed: Final[set[str]] = set(self._read_operations())
+        if self._completed:
+            logger.info("Found %d completed operations in %s", len(self._completed), path)
+
+    @classmethod
+    def for_configuration(
+        cls, path: Path, *, guild_id: int, template: GuildConfig
+    ) -> OperationJournal:
+        """Create a journal scoped to a guild and a configuration."""
+        config_hash = hashlib.sha256(template.model_dump_json().encode("UTF-8")).hexdigest()
+        return cls(path, scope=f"{guild_id}:{config_hash}")
+
+    @classmethod
+    def for_chunked_configuration(
+        cls, path: Path, *, guild_id: int, reader: ChunkedConfigReader
+    ) -> OperationJournal:
+        """Create a journal scoped to a guild and the content of a chunked configuration."""
+        return cls(path, scope=f"{guild_id}:{reader.hash_chunks()}")
+
+    def _read_entries(self) -> list[dict[str, str]]:
+        if not self.path.exists():
+            return []
+        entries = []
+        with self.path.open(encoding="UTF-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # the last line is incomplete if the process was killed while writing it
+                    logger.warning("Ignore invalid journal entry: %s", line.strip())
+        return entries
+
+    def _read_operations(self) -> list[str]:
+        return [
+            entry["operation"] for entry in self._read_entries() if entry["scope"] == self.scope
+        ]
+
+    def is_completed(self, operation: str) -> bool:
+        return operation in self._completed
+
+    def record(self, operation: str) -> None:
+        """Mark an operation as completed."""
+        self._completed.add(operation)
+        with self.path.open("a", encoding="UTF-8") as journal_file:
+            journal_file.write(json.dumps({"scope": self.scope, "operation": operation}) + "\n")
+
+    def clear(self) -> None:
+        """Remove all entries of this journal's scope."""
+        self._completed.clear()
+        other_entries = [entry for entry in self._read_entries() if entry["scope"] != self.scope]
+        if not other_entries:
+            self.path.unlink(missing_ok=True)
+            return
+        self.path.write_text(
+            "".join(json.dumps(entry) + "\n" for entry in other_entries), encoding="UTF-8"
+        )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import TYPE_CHECKING, Final, Literal, get_args
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
+LogFormat = Literal["text", "json"]
+LOG_FORMATS: Final[tuple[LogFormat, ...]] = get_args(LogFormat)
+
+# fields of structured log records, set with `log_context`
+CONTEXT_FIELDS: Final = ("guild", "phase", "object")
+
+# repeated debug messages are logged this often before they are sampled
+SAMPLING_BURST: Final = 10
+
+_log_context: Final[ContextVar[Mapping[str, object]]] = ContextVar("log_context")
+
+
+@contextmanager
+def log_context(**fields: object) -> Iterator[None]:
+    """Add fields to all log records of the current task, e.g., `guild`, `phase`, and `object`.
+
+    Tasks created within the context inherit its fields.
+    """
+    token = _log_context.set({**_log_context.get({}), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def configure_log_pipeline(
+    level: int, *, log_format: LogFormat = "text", sample_rate: int = 1
+) -> None:
+    """Log to stderr from a background thread.
+
+    Records are put into a queue, so logging does not block the event loop on writing. Only
+    their message and traceback are rendered when they are logged, since arguments might change
+    afterwards. Records are formatted and written by a background thread, which is stopped at
+    exit.
+
+    With `sample_rate` > 1, each debug message is logged `SAMPLING_BURST` times, and after that
+    only every `sample_rate`-th time. Messages are identified by their logger and format string.
+    """
+    stream_handler = logging.StreamHandler(stream=sys.stderr)
+    stream_handler.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(logging.BASIC_FORMAT)
+    )
+
+    queue: SimpleQueue[logging.LogRecord] = SimpleQueue()
+    queue_handler = _DeferredQueueHandler(queue)
+    # filters run when the record is logged, so they see the context of the logging task
+    queue_handler.addFilter(_is_relevant)
+    if sample_rate > 1:
+        queue_handler.addFilter(DebugSamplingFilter(sample_rate))
+    queue_handler.addFilter(_add_context_fields)
+
+    listener = QueueListener(queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logging.basicConfig(level=level, handlers=[queue_handler])
+
+
+def _is_relevant(record: logging.LogRecord) -> bool:
+    # silence irrelevant warning
+    return record.msg != "PyNaCl is not installed, voice will NOT be supported"
+
+
+def _add_context_fields(record: logging.LogRecord) -> bool:
+    for field, value in _log_context.get({}).items():
+        setattr(record, field, value)
+    return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    def __init__(self, sample_rate: int) -> None:
+        """Only let every `sample_rate`-th repetition of a debug message pass, after a burst."""
+        super().__init__()
+        self.sample_rate: Final[int] = sample_rate
+        self._counts: Final[Counter[tuple[str, object]]] = Counter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.name, record.msg)
+        self._counts[key] += 1
+        count = self._counts[key]
+        return count <= SAMPLING_BURST or (count - SAMPLING_BURST) % self.sample_rate == 0
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # unlike `QueueHandler`, the record is formatted by the background thread. Only the
+        # message and the traceback are rendered now, since the logging task might change the
+        # message arguments, and so the frames of the traceback are released.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as JSON objects, one per line, with their context fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, object] = {
+            "time": datetime.datetime.fromtimestamp(record.created, tz=datetime.UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = record.stack_info
+        return json.dumps(data, default=str)
@@ -2,19 +2,37 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import json
 import logging
 import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from discord_guild_configurator.bot import GuildConfigurationBot, run_bot
-from discord_guild_configurator.configurator import GuildConfigurator
-from discord_guild_configurator.models import GuildConfig
+from discord_guild_configurator.chunked_config import (
+    ChunkedConfigReader,
+    ChunkedConfigValidator,
+    is_chunked_config,
+    load_config,
+    load_settings,
+    open_chunked_config_writer,
+    write_chunked_config,
+)
+from discord_guild_configurator.logs import LOG_FORMATS, SAMPLING_BURST, configure_log_pipeline
+from discord_guild_configurator.phases import PHASES
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     import discord
 
+    from discord_guild_configurator.exporter import GuildExporter
+    from discord_guild_configurator.models import GuildConfig
+    from discord_guild_configurator.profiling import PhaseProfiler
+
+logger = logging.getLogger(__name__)
+
 DESCRIPTION = """\
 Configure a Discord guild.
 
@@ -34,6 +52,7 @@ It will:
     - Add missing categories, text channels, and forums
     - Update positions
     - Add missing forum tags
+    - Update emoji, 'moderated' flag, and order of forum tags
     - Update 'mandatory/optional' state of forum tags
     - Update category, text channel, and forum permission overwrites
 - Update category and channel permission overwrites
@@ -50,54 +69,972 @@ It will not:
 - Delete human-authored messages
 
 All operations are idempotent. Applying the same configuration twice will perform no changes.
+
+With '--only' and '--category', only the selected phases and categories are applied.
+Roles referenced by the selected categories are always created. The phases 'permissions',
+'topics', and 'messages' require the channels to exist. With '--category', the guild settings
+('system-channel' and 'community') are only applied if they are selected with '--only'.
+
+With '--watch-drift', the bot stays connected after applying the configuration and reverts
+manual changes to configured roles, categories, channels, and guild settings.
+
+With '--watch', the bot stays connected after applying the configuration and applies changes
+to the configuration file. Only objects whose configuration changed are updated.
+
+Chunked configurations (NDJSON files or directories, see 'split') are applied while they are
+read: each category is configured as soon as its chunk was validated. This does not apply to
+'--category', '--watch', and '--watch-drift', which require the complete configuration.
+
+With '--profile' and '--profile-memory', the CPU time and memory allocations of loading the
+configuration, of connecting until the guild is ready, of planning, and of each phase are
+written to '--profile-dir':
+- <PHASE>.pstats: CPU profile of each phase, e.g., for 'python -m pstats' or 'snakeviz'
+- allocations.txt: net allocated memory per phase, and the top allocation sites of loading the
+  configuration, of connecting, and of applying it
+"""
+
+EXPORT_DESCRIPTION = """\
+Export the configuration of an existing Discord guild.
+
+Requires the environment variable 'BOT_TOKEN' to be set.
+Requires bot privileges for receiving 'GUILD_MEMBER' events.
+
+It will export:
+- Roles, except roles managed by integrations
+- Categories, text channels, forums, and voice channels
+    - Permission overwrites for roles
+    - Channel topics
+    - Forum tags with emoji and 'moderated' flag, and their 'mandatory/optional' state
+    - Default messages, if all messages of a channel were sent by bots
+- System channel and 'Community Server' settings
+
+Output formats:
+- JSON (stdout, or if the output path ends with '.json'): the complete configuration, written
+  after it was exported and validated
+- NDJSON file (if the output path ends with '.ndjson') or directory: a chunked configuration
+  (see 'split'). Each category is written as soon as it was exported and validated, so large
+  guilds are exported with little memory.
+
+The exit status is non-zero if the exported configuration is invalid, e.g., if the system
+channel is not part of a category.
+
+Roles, categories, channels, and forum tags with a name which was already exported are skipped
+with a warning, since configurations require unique names.
+
+The exported configuration can be used with 'discord-guild-configurator'.
+"""
+
+DIFF_DESCRIPTION = """\
+Compare two Discord guild configuration files without connecting to Discord.
+
+Prints the changes required to update a guild from the old to the new configuration as JSON:
+- Added or changed roles
+- Added or moved categories
+- Added or moved channels
+    - Changed permission overwrites per role
+    - Changed topics and default messages
+    - Added or changed forum tags
+- Changed system channel and 'Community Server' settings
+
+Additionally, it estimates the number of requests required to apply the changes, assuming that
+the guild matches the old configuration.
+"""
+
+ROLE_ASSIGNMENT_DESCRIPTION = """\
+Assign roles to Discord guild members based on a CSV file.
+
+Requires the environment variable 'BOT_TOKEN' to be set.
+Requires bot privileges for receiving 'GUILD_MEMBER' events.
+
+The CSV file requires the columns 'member' and 'roles':
+- member: User ID or username
+- roles: Role names, separated by semicolons
+
+Only roles of the guild configuration are added or removed. Other roles are kept.
+Members which are not listed in the CSV file are not changed.
+Members listed in multiple rows receive the roles of all their rows. The rows of a member must be
+consecutive, because the CSV file is processed while it is read.
+Each member is updated with at most one request.
+"""
+
+MEMBER_EXPORT_DESCRIPTION = """\
+Export all members of a Discord guild to a CSV or NDJSON file.
+
+Requires the environment variable 'BOT_TOKEN' to be set.
+Requires bot privileges for receiving 'GUILD_MEMBER' events.
+
+Members are fetched page by page and written immediately, without caching all members.
+Each row contains the member's ID, name, display name, roles, and join date.
+"""
+
+BOOTSTRAP_DESCRIPTION = """\
+Create a new Discord guild from a guild configuration.
+
+Requires the environment variable 'BOT_TOKEN' to be set.
+Requires a bot which is member of less than 10 guilds. The bot becomes the owner of the guild.
+
+The configuration is compiled to a guild creation payload, which creates all roles,
+categories, and channels with their permission overwrites and topics in a single request.
+Afterward, only the remaining settings are configured:
+- System channel
+- 'Community Server' features
+- Forum tags and channel positions
+- Channel's default messages
+
+An invite link for the system channel is printed, so humans can join the new guild.
+
+With '--payload-file', the payload is only written to a file, without connecting to Discord.
+"""
+
+VALIDATE_DESCRIPTION = """\
+Validate Discord guild configuration files without connecting to Discord.
+
+Prints all validation errors and exits with a non-zero status if any file is invalid.
+Chunked configurations are validated chunk by chunk.
+"""
+
+SPLIT_DESCRIPTION = """\
+Split a Discord guild configuration into chunks.
+
+Chunked configurations contain the roles and guild settings in one chunk, and each category in
+a separate chunk. All commands accept them instead of JSON configuration files.
+
+Output formats:
+- NDJSON file (if the output path ends with '.ndjson'): one chunk per line
+- Directory: 'guild.json' and one JSON file per category, ordered by file name. The directory
+  must be empty or contain a chunked configuration, which is replaced. Other files are kept.
+"""
+
+SNAPSHOT_DESCRIPTION = """\
+Create or refresh a snapshot of a Discord guild.
+
+Requires the environment variable 'BOT_TOKEN' to be set.
+Requires bot privileges for viewing the audit log.
+
+A snapshot stores the roles, channels, and settings of a guild, without channel messages.
+Existing snapshots are refreshed from the guild's audit log: only the guild and the channels
+which changed since the last refresh are fetched again. Snapshots older than the audit log
+retention of 45 days are created again.
+
+With '--config-file', the changes required to update the guild to the configuration are printed
+as JSON, like 'plan'. Default messages are not compared. Objects are compared by name, or by ID
+if they are in the '--id-mapping-file' written by 'apply'.
+"""
+
+DAEMON_DESCRIPTION = """\
+Run a long-running configurator service with a local API.
+
+Requires the environment variable 'BOT_TOKEN' to be set. With '--port', the environment variable
+'DAEMON_TOKEN' must be set as well, and requests must carry it in an
+'Authorization: Bearer <DAEMON_TOKEN>' header.
+
+The bot connects once and keeps its session, gateway cache, and HTTP connections warm, so
+requests only cost the REST calls they need. The API is served on a Unix socket or on localhost:
+- GET /guilds/<GUILD_ID>/export: export the guild configuration as JSON
+- POST /guilds/<GUILD_ID>/plan: print the changes required to update the guild to the
+  configuration in the request body, like 'snapshot --config-file'
+- POST /guilds/<GUILD_ID>/apply: apply the configuration in the request body and return the
+  remaining divergences as JSON. Query parameters:
+    - verify: verify written objects, like 'apply --verify'
+    - full: apply the complete configuration. Otherwise, only changes to the configuration
+      previously applied by the daemon are applied. The first apply for a guild is always full.
+
+Requests for the same guild are queued, requests for different guilds run concurrently.
+
+The Unix socket is only accessible by the user running the daemon. A socket file left behind by
+a daemon which is no longer running is replaced.
+
+Request bodies must be sent with 'Content-Type: application/json'. Requests with an 'Origin'
+header, i.e., from web browsers, are rejected.
 """
 
+FLEET_DESCRIPTION = """\
+Apply a Discord guild configuration to many guilds.
 
-def configure_logging(*, verbose: bool = False, debug: bool = False) -> None:
+Requires the environment variable 'BOT_TOKEN' to be set.
+
+The configuration is applied to all guilds of the bot, or to the guilds given by '--guild-id'.
+The bot is automatically sharded: shards are started concurrently, as fast as the bot's session
+start limit allows, and each guild is configured as soon as its shard is ready.
+
+A guild which cannot be configured is logged and does not stop the other guilds. The exit status
+is non-zero if any guild failed or was not found.
+"""
+
+CLI_DESCRIPTION = """\
+Manage Discord guilds based on configuration files.
+
+Run '<command> --help' for details on a command.
+"""
+
+
+def add_logging_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--verbose", action="store_true", help="Enable INFO logging")
+    parser.add_argument("--debug", action="store_true", help="Enable DEBUG logging")
+    parser.add_argument(
+        "--log-format",
+        choices=LOG_FORMATS,
+        default="text",
+        help="Format of log lines. 'json' adds the guild, phase, and object (default: text)",
+    )
+    parser.add_argument(
+        "--log-sample-rate",
+        type=int,
+        default=1,
+        help=(
+            "Only log every N-th repetition of a DEBUG message, after its first "
+            f"{SAMPLING_BURST} occurrences (default: 1, log all)"
+        ),
+    )
+
+
+def configure_logging(args: argparse.Namespace) -> None:
     log_level = logging.WARNING
-    if verbose:
+    if args.verbose:
         log_level = logging.INFO
-    if debug:
+    if args.debug:
         log_level = logging.DEBUG
-    log_handler = logging.StreamHandler(stream=sys.stderr)
-    log_handler.addFilter(
-        # silence irrelevant warning
-        lambda record: record.msg != "PyNaCl is not installed, voice will NOT be supported"
+    configure_log_pipeline(log_level, log_format=args.log_format, sample_rate=args.log_sample_rate)
+
+
+def get_bot_token() -> str:
+    bot_token = os.getenv("BOT_TOKEN")
+    if bot_token is None:
+        raise RuntimeError("'BOT_TOKEN' environment variable is not set")
+    return bot_token
+
+
+def add_apply_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild to configure")
+    parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to the guild configuration (JSON, NDJSON, or directory)",
+    )
+    parser.add_argument(
+        "--journal-file",
+        type=Path,
+        help=(
+            "Path to a journal of completed operations. "
+            "If a previous run was interrupted, completed operations are skipped."
+        ),
+    )
+    parser.add_argument(
+        "--id-mapping-file",
+        type=Path,
+        help=(
+            "Path to a file mapping configured objects to Discord IDs. "
+            "Objects are looked up by ID, so renamed objects are not recreated. "
+            "The file is created or updated after applying the configuration."
+        ),
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=PHASES,
+        help="Only apply the given phase (can be repeated). Default: all phases",
+    )
+    parser.add_argument(
+        "--category",
+        action="append",
+        help="Only apply the given category (can be repeated). Default: all categories",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=5,
+        help="Maximum number of concurrent operations (default: 5)",
     )
-    logging.basicConfig(level=log_level, handlers=[log_handler])
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help=(
+            "Fetch written roles, categories, channels, and guild settings after applying the "
+            "configuration, and apply divergent objects again. Chunked configurations are loaded "
+            "completely."
+        ),
+    )
+    parser.add_argument(
+        "--watch-drift",
+        action="store_true",
+        help="Stay connected and revert manual changes to configured objects",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Stay connected and apply changes to the configuration file",
+    )
+    parser.add_argument("--profile", action="store_true", help="Profile the CPU time of each phase")
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Trace the memory allocations of each phase",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        default=Path("profile"),
+        help="Directory for the profiling results (default: profile)",
+    )
+    add_logging_arguments(parser)
 
 
-def main() -> None:
+def run_apply(args: argparse.Namespace) -> None:
     """Run this application."""
+    from discord_guild_configurator.bot import GuildConfigurationBot
+    from discord_guild_configurator.configurator import GuildConfigurator
+    from discord_guild_configurator.id_mapping import IdMapping
+    from discord_guild_configurator.journal import OperationJournal
+    from discord_guild_configurator.verification import WriteVerifier
+    from discord_guild_configurator.watcher import ConfigFileWatcher, DriftWatcher
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+
+    profiler = create_profiler(args)
+
+    if is_chunked_config(args.config_file) and not (
+        args.category or args.verify or args.watch or args.watch_drift
+    ):
+        run_chunked_apply(args, bot_token, profiler)
+        return
+
+    with profile_section(profiler, "load-config"):
+        guild_config = load_config(args.config_file)
+
+    drift_watcher: DriftWatcher | None = None
+    config_file_watcher: ConfigFileWatcher | None = None
+    background_tasks: set[asyncio.Task[None]] = set()
+
+    async def configure_guild(guild: discord.Guild) -> None:
+        nonlocal drift_watcher, config_file_watcher
+        if profiler is not None:
+            profiler.stop("ready")
+
+        # 'on_ready' is dispatched again after reconnects, so the watchers might already exist
+        template = guild_config if config_file_watcher is None else config_file_watcher.template
+        journal = None
+        if args.journal_file is not None:
+            journal = OperationJournal.for_configuration(
+                args.journal_file, guild_id=guild.id, template=template
+            )
+        id_mapping = None
+        if args.id_mapping_file is not None:
+            id_mapping = IdMapping.load(args.id_mapping_file)
+        configurator = GuildConfigurator(
+            guild,
+            journal=journal,
+            id_mapping=id_mapping,
+            max_concurrency=args.max_concurrency,
+            profiler=profiler,
+        )
+        with profile_allocations(profiler, "apply"):
+            await configurator.apply_configuration(
+                template, phases=args.only, categories=args.category
+            )
+        if args.verify:
+            await WriteVerifier(configurator, max_concurrency=args.max_concurrency).verify(template)
+        if id_mapping is not None:
+            id_mapping.save(args.id_mapping_file)
+
+        if args.watch_drift and drift_watcher is None:
+            logger.info("Watching for manual changes")
+            drift_watcher = DriftWatcher(configurator, template)
+            drift_watcher.register(bot)
+        if args.watch and config_file_watcher is None:
+            config_file_watcher = ConfigFileWatcher(
+                configurator, args.config_file, template, drift_watcher=drift_watcher
+            )
+            task = asyncio.create_task(config_file_watcher.run())
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+
+    bot = GuildConfigurationBot(
+        args.guild_id, configure_guild, close_after_action=not (args.watch or args.watch_drift)
+    )
+    run_profiled_bot(bot, bot_token, profiler)
+
+
+def create_profiler(args: argparse.Namespace) -> PhaseProfiler | None:
+    if not (args.profile or args.profile_memory):
+        return None
+
+    from discord_guild_configurator.profiling import PhaseProfiler
+
+    return PhaseProfiler(args.profile_dir, cpu=args.profile, memory=args.profile_memory)
+
+
+@contextmanager
+def profile_section(profiler: PhaseProfiler | None, phase: str) -> Iterator[None]:
+    """Profile a sequential section in a phase of its own, including its allocation sites."""
+    if profiler is None:
+        yield
+        return
+    with profiler.trace_allocations(phase), profiler.profile(phase):
+        yield
+
+
+@contextmanager
+def profile_allocations(profiler: PhaseProfiler | None, section: str) -> Iterator[None]:
+    if profiler is None:
+        yield
+        return
+    with profiler.trace_allocations(section):
+        yield
+
+
+def run_profiled_bot(bot: discord.Client, bot_token: str, profiler: PhaseProfiler | None) -> None:
+    """Run a bot whose action stops the 'ready' phase of the profiler."""
+    from discord_guild_configurator.bot import run_bot
+
+    if profiler is None:
+        asyncio.run(run_bot(bot, bot_token))
+        return
+
+    with profiler.trace_allocations("ready"):
+        profiler.start("ready")
+        asyncio.run(run_bot(bot, bot_token))
+    profiler.stop("ready")
+    profiler.write_results()
+
+
+def run_chunked_apply(
+    args: argparse.Namespace, bot_token: str, profiler: PhaseProfiler | None
+) -> None:
+    """Apply a chunked configuration while it is read."""
+    from discord_guild_configurator.bot import GuildConfigurationBot
+    from discord_guild_configurator.configurator import GuildConfigurator
+    from discord_guild_configurator.id_mapping import IdMapping
+    from discord_guild_configurator.journal import OperationJournal
+
+    async def configure_guild(guild: discord.Guild) -> None:
+        if profiler is not None:
+            profiler.stop("ready")
+        with profile_section(profiler, "load-config"):
+            reader = ChunkedConfigReader(args.config_file)
+        journal = None
+        if args.journal_file is not None:
+            journal = OperationJournal.for_chunked_configuration(
+                args.journal_file, guild_id=guild.id, reader=reader
+            )
+        id_mapping = None
+        if args.id_mapping_file is not None:
+            id_mapping = IdMapping.load(args.id_mapping_file)
+        configurator = GuildConfigurator(
+            guild,
+            journal=journal,
+            id_mapping=id_mapping,
+            max_concurrency=args.max_concurrency,
+            profiler=profiler,
+        )
+        with profile_allocations(profiler, "apply"):
+            await configurator.apply_chunked_configuration(reader, phases=args.only)
+        if id_mapping is not None:
+            id_mapping.save(args.id_mapping_file)
+
+    run_profiled_bot(GuildConfigurationBot(args.guild_id, configure_guild), bot_token, profiler)
+
+
+def main() -> None:
     parser = argparse.ArgumentParser(
         description=DESCRIPTION,
         formatter_class=argparse.RawTextHelpFormatter,
     )
-    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild to configure")
+    add_apply_arguments(parser)
+    run_apply(parser.parse_args())
+
+
+def add_export_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild to export")
+    parser.add_argument(
+        "--output-file",
+        type=Path,
+        help=(
+            "Path to the exported configuration (JSON file, or NDJSON file or directory for "
+            "a chunked configuration). Default: JSON on stdout"
+        ),
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of concurrent requests for fetching channel messages (default: 10)",
+    )
+    add_logging_arguments(parser)
+
+
+def run_export(args: argparse.Namespace) -> None:
+    """Run the guild exporter."""
+    from discord_guild_configurator.bot import GuildConfigurationBot, run_bot
+    from discord_guild_configurator.exporter import GuildExporter
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+    export_failed = False
+
+    async def export_guild(guild: discord.Guild) -> None:
+        nonlocal export_failed
+        exporter = GuildExporter(guild, max_concurrency=args.max_concurrency)
+        try:
+            if args.output_file is None or args.output_file.suffix == ".json":
+                write_json_export(await exporter.export_configuration(), args.output_file)
+            else:
+                await export_chunks(exporter, args.output_file)
+        except ValueError:
+            logger.exception("The exported configuration is invalid")
+            export_failed = True
+
+    bot = GuildConfigurationBot(args.guild_id, export_guild)
+    asyncio.run(run_bot(bot, bot_token))
+    if export_failed:
+        sys.exit(1)
+
+
+def write_json_export(config: GuildConfig, output_file: Path | None) -> None:
+    config_str = config.model_dump_json(indent=2) + "\n"
+    if output_file is None:
+        sys.stdout.write(config_str)
+    else:
+        output_file.write_text(config_str, encoding="UTF-8")
+
+
+async def export_chunks(exporter: GuildExporter, output: Path) -> None:
+    """Export the configuration as chunked configuration, writing each chunk when exported.
+
+    Chunks are validated incrementally, like chunked configurations are read. An invalid
+    chunk stops the export, earlier chunks stay written.
+    """
+    settings = exporter.export_settings()
+    validator = ChunkedConfigValidator(settings)
+    with open_chunked_config_writer(output) as writer:
+        writer.write_settings(settings)
+        async for category in exporter.iter_categories({role.name for role in settings.roles}):
+            validator.verify_category(category)
+            writer.write_category(category)
+    validator.verify_complete()
+
+
+def export_main() -> None:
+    parser = argparse.ArgumentParser(
+        description=EXPORT_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    add_export_arguments(parser)
+    run_export(parser.parse_args())
+
+
+def add_plan_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "old_config_file",
+        type=Path,
+        help="Path to the old configuration (JSON, NDJSON, or directory)",
+    )
+    parser.add_argument(
+        "new_config_file",
+        type=Path,
+        help="Path to the new configuration (JSON, NDJSON, or directory)",
+    )
+
+
+def run_plan(args: argparse.Namespace) -> None:
+    """Run the offline configuration diff."""
+    from discord_guild_configurator.diff import diff_configs
+
+    old_config = load_config(args.old_config_file)
+    new_config = load_config(args.new_config_file)
+    diff = diff_configs(old_config, new_config)
+    sys.stdout.write(diff.model_dump_json(indent=2) + "\n")
+
+
+def diff_main() -> None:
+    parser = argparse.ArgumentParser(
+        description=DIFF_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    add_plan_arguments(parser)
+    run_plan(parser.parse_args())
+
+
+def add_assign_roles_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild")
     parser.add_argument(
         "--config-file",
         type=Path,
         required=True,
-        help="Path to the guild configuration file (JSON)",
+        help="Path to the guild configuration (JSON, NDJSON, or directory)",
     )
-    parser.add_argument("--verbose", action="store_true", help="Enable INFO logging")
-    parser.add_argument("--debug", action="store_true", help="Enable DEBUG logging")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--csv-file", type=Path, required=True, help="Path to the member roles file (CSV)"
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=Path,
+        help=(
+            "Path to a progress file. "
+            "If a previous run was interrupted, updated members are skipped."
+        ),
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=5,
+        help="Maximum number of concurrent member updates (default: 5)",
+    )
+    add_logging_arguments(parser)
 
-    bot_token = os.getenv("BOT_TOKEN")
-    if bot_token is None:
-        raise RuntimeError("'BOT_TOKEN' environment variable is not set")
 
-    configure_logging(debug=args.debug, verbose=args.verbose)
+def run_assign_roles(args: argparse.Namespace) -> None:
+    """Run the role assignment."""
+    from discord_guild_configurator.bot import GuildConfigurationBot, run_bot
+    from discord_guild_configurator.members import RoleAssigner
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+
+    guild_settings = load_settings(args.config_file)
+
+    async def assign_roles(guild: discord.Guild) -> None:
+        role_assigner = RoleAssigner(
+            guild,
+            [role.name for role in guild_settings.roles],
+            max_concurrency=args.max_concurrency,
+            progress_file=args.progress_file,
+        )
+        await role_assigner.assign_roles_from_csv(args.csv_file)
+
+    bot = GuildConfigurationBot(args.guild_id, assign_roles)
+    asyncio.run(run_bot(bot, bot_token))
+
+
+def role_assignment_main() -> None:
+    parser = argparse.ArgumentParser(
+        description=ROLE_ASSIGNMENT_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    add_assign_roles_arguments(parser)
+    run_assign_roles(parser.parse_args())
+
+
+def add_export_members_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild")
+    parser.add_argument(
+        "--output-file", type=Path, required=True, help="Path to the member export file"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "ndjson"],
+        default="csv",
+        help="Format of the member export file (default: csv)",
+    )
+    add_logging_arguments(parser)
+
+
+def run_export_members(args: argparse.Namespace) -> None:
+    """Run the member export."""
+    from discord_guild_configurator.bot import GuildConfigurationBot, run_bot
+    from discord_guild_configurator.members import MemberExporter
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+
+    async def export_members(guild: discord.Guild) -> None:
+        member_exporter = MemberExporter(guild)
+        await member_exporter.export_members(args.output_file, output_format=args.format)
+
+    bot = GuildConfigurationBot(args.guild_id, export_members, cache_members=False)
+    asyncio.run(run_bot(bot, bot_token))
+
+
+def member_export_main() -> None:
+    parser = argparse.ArgumentParser(
+        description=MEMBER_EXPORT_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    add_export_members_arguments(parser)
+    run_export_members(parser.parse_args())
+
+
+def add_bootstrap_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--name", required=True, help="Name of the new guild")
+    parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to the guild configuration (JSON, NDJSON, or directory)",
+    )
+    parser.add_argument(
+        "--payload-file",
+        type=Path,
+        help="Only write the guild creation payload to this file (JSON), do not create the guild",
+    )
+    add_logging_arguments(parser)
+
+
+def run_bootstrap(args: argparse.Namespace) -> None:
+    """Run the guild bootstrap."""
+    from discord_guild_configurator.bootstrap import (
+        BOOTSTRAP_PHASES,
+        GuildPayloadCompiler,
+        create_guild,
+    )
+    from discord_guild_configurator.bot import GuildConfigurationBot, run_bot
+    from discord_guild_configurator.configurator import GuildConfigurator
 
-    guild_config = GuildConfig.model_validate_json(args.config_file.read_text(encoding="UTF-8"))
+    configure_logging(args)
+
+    guild_config = load_config(args.config_file)
+    payload = GuildPayloadCompiler(guild_config).compile(name=args.name)
+    if args.payload_file is not None:
+        args.payload_file.write_text(json.dumps(payload, indent=2) + "\n", encoding="UTF-8")
+        return
+
+    bot_token = get_bot_token()
 
     async def configure_guild(guild: discord.Guild) -> None:
         configurator = GuildConfigurator(guild)
+        await configurator.apply_configuration(guild_config, phases=BOOTSTRAP_PHASES)
+        invite = await configurator.get_channel(guild_config.system_channel.name).create_invite()
+        sys.stdout.write(f"Created guild {guild.id}: {invite.url}\n")
+
+    async def bootstrap_guild() -> None:
+        guild_id = await create_guild(payload, bot_token)
+        await run_bot(GuildConfigurationBot(guild_id, configure_guild), bot_token)
+
+    asyncio.run(bootstrap_guild())
+
+
+def bootstrap_main() -> None:
+    parser = argparse.ArgumentParser(
+        description=BOOTSTRAP_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    add_bootstrap_arguments(parser)
+    run_bootstrap(parser.parse_args())
+
+
+def add_validate_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "config_files",
+        type=Path,
+        nargs="+",
+        help="Paths to the configurations (JSON, NDJSON, or directory)",
+    )
+
+
+def run_validate(args: argparse.Namespace) -> None:
+    """Run the offline configuration validation."""
+    valid = True
+    for config_file in args.config_files:
+        try:
+            if is_chunked_config(config_file):
+                # only one category is kept in memory
+                for _category in ChunkedConfigReader(config_file).iter_categories():
+                    pass
+            else:
+                load_config(config_file)
+        except (OSError, ValueError) as error:
+            sys.stderr.write(f"{config_file}: {error}\n")
+            valid = False
+    if not valid:
+        sys.exit(1)
+
+
+def add_split_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("config_file", type=Path, help="Path to the configuration file (JSON)")
+    parser.add_argument(
+        "output", type=Path, help="Path to the chunked configuration (NDJSON file or directory)"
+    )
+
+
+def run_split(args: argparse.Namespace) -> None:
+    """Run the configuration split."""
+    try:
+        write_chunked_config(load_config(args.config_file), args.output)
+    except ValueError as error:
+        sys.stderr.write(f"{error}\n")
+        sys.exit(1)
+
+
+def add_snapshot_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guild-id", type=int, required=True, help="ID of the guild")
+    parser.add_argument(
+        "--snapshot-file",
+        type=Path,
+        required=True,
+        help="Path to the snapshot file (JSON). Created if it does not exist.",
+    )
+    parser.add_argument(
+        "--config-file",
+        type=Path,
+        help="Path to a configuration to compare the snapshot to (JSON, NDJSON, or directory)",
+    )
+    parser.add_argument(
+        "--id-mapping-file",
+        type=Path,
+        help=(
+            "Path to a file mapping configured objects to Discord IDs, as written by 'apply'. "
+            "Objects are compared by ID. Without it, objects are compared by name."
+        ),
+    )
+    add_logging_arguments(parser)
+
+
+def run_snapshot(args: argparse.Namespace) -> None:
+    """Run the snapshot refresh."""
+    from discord_guild_configurator.id_mapping import IdMapping
+    from discord_guild_configurator.snapshot import refresh_snapshot_file
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+
+    snapshot = asyncio.run(
+        refresh_snapshot_file(args.snapshot_file, guild_id=args.guild_id, token=bot_token)
+    )
+    if args.config_file is not None:
+        id_mapping = None
+        if args.id_mapping_file is not None:
+            id_mapping = IdMapping.load(args.id_mapping_file)
+        diff = snapshot.diff_config(load_config(args.config_file), id_mapping)
+        sys.stdout.write(diff.model_dump_json(indent=2) + "\n")
+
+
+def add_daemon_arguments(parser: argparse.ArgumentParser) -> None:
+    listen_group = parser.add_mutually_exclusive_group(required=True)
+    listen_group.add_argument(
+        "--socket", type=Path, help="Path to the Unix socket on which the API is served"
+    )
+    listen_group.add_argument(
+        "--port", type=int, help="Port on localhost on which the API is served"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=5,
+        help="Maximum number of concurrent operations per request (default: 5)",
+    )
+    add_logging_arguments(parser)
+
+
+def run_daemon(args: argparse.Namespace) -> None:
+    """Run the configurator service."""
+    from discord_guild_configurator.bot import run_bot
+    from discord_guild_configurator.daemon import ConfiguratorDaemon
+
+    bot_token = get_bot_token()
+    api_token = None
+    if args.port is not None:
+        api_token = os.getenv("DAEMON_TOKEN")
+        if not api_token:
+            raise RuntimeError("'DAEMON_TOKEN' environment variable is required with '--port'")
+
+    configure_logging(args)
+
+    daemon = ConfiguratorDaemon(
+        socket_path=args.socket,
+        port=args.port,
+        api_token=api_token,
+        max_concurrency=args.max_concurrency,
+    )
+    asyncio.run(run_bot(daemon, bot_token))
+
+
+def add_fleet_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to the guild configuration (JSON, NDJSON, or directory)",
+    )
+    parser.add_argument(
+        "--guild-id",
+        type=int,
+        action="append",
+        help="Only configure the given guild (can be repeated). Default: all guilds of the bot",
+    )
+    parser.add_argument(
+        "--max-concurrent-guilds",
+        type=int,
+        default=10,
+        help="Maximum number of guilds which are configured at the same time (default: 10)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=5,
+        help="Maximum number of concurrent operations per guild (default: 5)",
+    )
+    add_logging_arguments(parser)
+
+
+def run_fleet(args: argparse.Namespace) -> None:
+    """Run the fleet configuration."""
+    from discord_guild_configurator.bot import run_bot
+    from discord_guild_configurator.configurator import GuildConfigurator
+    from discord_guild_configurator.fleet import FleetConfigurationBot
+
+    bot_token = get_bot_token()
+
+    configure_logging(args)
+
+    guild_config = load_config(args.config_file)
+
+    async def configure_guild(guild: discord.Guild) -> None:
+        configurator = GuildConfigurator(guild, max_concurrency=args.max_concurrency)
         await configurator.apply_configuration(guild_config)
 
-    bot = GuildConfigurationBot(args.guild_id, configure_guild)
+    bot = FleetConfigurationBot(
+        configure_guild,
+        guild_ids=args.guild_id,
+        max_concurrent_guilds=args.max_concurrent_guilds,
+    )
     asyncio.run(run_bot(bot, bot_token))
+    if bot.failed_guild_ids:
+        sys.stderr.write(f"Could not configure guilds: {sorted(bot.failed_guild_ids)}\n")
+        sys.exit(1)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description=CLI_DESCRIPTION,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(title="commands", required=True)
+    commands = [
+        ("apply", DESCRIPTION, add_apply_arguments, run_apply),
+        ("validate", VALIDATE_DESCRIPTION, add_validate_arguments, run_validate),
+        ("split", SPLIT_DESCRIPTION, add_split_arguments, run_split),
+        ("plan", DIFF_DESCRIPTION, add_plan_arguments, run_plan),
+        ("export", EXPORT_DESCRIPTION, add_export_arguments, run_export),
+        ("assign-roles", ROLE_ASSIGNMENT_DESCRIPTION, add_assign_roles_arguments, run_assign_roles),
+        (
+            "export-members",
+            MEMBER_EXPORT_DESCRIPTION,
+            add_export_members_arguments,
+            run_export_members,
+        ),
+        ("bootstrap", BOOTSTRAP_DESCRIPTION, add_bootstrap_arguments, run_bootstrap),
+        ("snapshot", SNAPSHOT_DESCRIPTION, add_snapshot_arguments, run_snapshot),
+        ("daemon", DAEMON_DESCRIPTION, add_daemon_arguments, run_daemon),
+        ("fleet", FLEET_DESCRIPTION, add_fleet_arguments, run_fleet),
+    ]
+    for name, description, add_arguments, run in commands:
+        subparser = subparsers.add_parser(
+            name,
+            description=description,
+            help=description.splitlines()[0],
+            formatter_class=argparse.RawTextHelpFormatter,
+        )
+        add_arguments(subparser)
+        subparser.set_defaults(run=run)
+
+    args = parser.parse_args()
+    args.run(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Final, Literal
+
+import discord
+
+from discord_guild_configurator.journal import OperationJournal
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterator
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# separator for multiple role names in a single CSV field
+ROLE_SEPARATOR: Final = ";"
+
+MemberExportFormat = Literal["csv", "ndjson"]
+MEMBER_EXPORT_FIELDS: Final = ["id", "name", "display_name", "roles", "joined_at"]
+
+
+class RoleAssigner:
+    def __init__(
+        self,
+        guild: discord.Guild,
+        managed_role_names: Collection[str],
+        *,
+        max_concurrency: int = 5,
+        progress_file: Path | None = None,
+    ) -> None:
+        """Assign roles to guild members based on a CSV file.
+
+        Only roles in `managed_role_names` are added or removed, all other roles of a member
+        are kept. Each member is updated with at most one request.
+
+        Members are updated by `max_concurrency` workers. Requests are additionally delayed by
+        discord.py if a rate limit is hit.
+
+        If a `progress_file` is given, updated members are recorded in it, and members recorded
+        by an interrupted previous run for the same CSV file are skipped.
+        """
+        self.guild: Final[discord.Guild] = guild
+        self.max_concurrency: Final[int] = max_concurrency
+        self.progress_file: Final[Path | None] = progress_file
+
+        self.managed_roles: Final[dict[str, discord.Role]] = {}
+        for role_name in managed_role_names:
+            role = discord.utils.get(guild.roles, name=role_name)
+            if role is None:
+                raise RuntimeError(f"Could not find role with name '{role_name}'")
+            if role.is_default():
+                continue
+            self.managed_roles[role_name] = role
+
+        self._members_by_name: dict[str, discord.Member] | None = None
+        self._statistics: Final[Counter[str]] = Counter()
+
+    async def assign_roles_from_csv(self, csv_file: Path) -> None:
+        """Assign roles to the members listed in a CSV file.
+
+        The CSV file requires the columns 'member' (user ID or username) and 'roles'
+        (role names separated by semicolons). Members may be listed in multiple consecutive
+        rows, they receive the roles of all these rows.
+
+        The CSV file is streamed: members are queued while the file is read, and at most
+        `2 * max_concurrency` members are waiting for a worker.
+        """
+        progress = None
+        if self.progress_file is not None:
+            progress = OperationJournal(
+                self.progress_file, scope=f"roles:{self.guild.id}:{_hash_file(csv_file)}"
+            )
+
+        queue: asyncio.Queue[tuple[str, list[str]]] = asyncio.Queue(
+            maxsize=2 * self.max_concurrency
+        )
+        workers = [
+            asyncio.create_task(self._worker(queue, progress)) for _ in range(self.max_concurrency)
+        ]
+
+        try:
+            for member_key, role_names in self.iter_role_names(csv_file):
+                await queue.put((member_key, role_names))
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        logger.info("Role assignment statistics: %s", dict(self._statistics))
+        if progress is not None:
+            progress.clear()
+
+    def iter_role_names(self, csv_file: Path) -> Iterator[tuple[str, list[str]]]:
+        """Yield the role names of each member, merging consecutive rows of the same member.
+
+        Rows of the same member are merged even if they refer to the member by ID and by
+        username. Members are keyed by their first row. A member whose rows are not
+        consecutive raises a `ValueError`, because the member may already have been updated
+        with the roles of the previous rows.
+        """
+        completed_members: set[int | str] = set()
+        current_member: int | str | None = None
+        current_key = ""
+        current_role_names: dict[str, None] = {}
+        with csv_file.open(encoding="UTF-8", newline="") as csv_content:
+            for row in csv.DictReader(csv_content):
+                member_key = row["member"].strip()
+                member = self.get_member(member_key)
+                member_identity = member.id if member is not None else member_key
+                if member_identity != current_member:
+                    if current_member is not None:
+                        yield current_key, list(current_role_names)
+                        completed_members.add(current_member)
+                    if member_identity in completed_members:
+                        raise ValueError(f"Rows of member {member_key} must be consecutive")
+                    current_member = member_identity
+                    current_key = member_key
+                    current_role_names = {}
+                for role_name in row["roles"].split(ROLE_SEPARATOR):
+                    if role_name.strip():
+                        current_role_names[role_name.strip()] = None
+        if current_member is not None:
+            yield current_key, list(current_role_names)
+
+    async def _worker(
+        self, queue: asyncio.Queue[tuple[str, list[str]]], progress: OperationJournal | None
+    ) -> None:
+        while True:
+            member_key, role_names = await queue.get()
+            try:
+                if progress is not None and progress.is_completed(member_key):
+                    self._statistics["skipped"] += 1
+                    continue
+                await self.assign_roles(member_key, role_names)
+                if progress is not None:
+                    progress.record(member_key)
+            except Exception:
+                # a failed worker would block the queue, so all errors only fail this member
+                logger.exception("Could not update roles of member %s", member_key)
+                self._statistics["failed"] += 1
+            finally:
+                queue.task_done()
+
+    async def assign_roles(self, member_key: str, role_names: list[str]) -> None:
+        member = self.get_member(member_key)
+        if member is None:
+            logger.warning("Could not find member %s", member_key)
+            self._statistics["not found"] += 1
+            return
+
+        expected_roles = set()
+        for role_name in role_names:
+            role = self.managed_roles.get(role_name)
+            if role is None:
+                logger.warning("Ignore role %s for member %s: Not managed", role_name, member_key)
+                continue
+            expected_roles.add(role)
+
+        current_roles = {role for role in member.roles if not role.is_default()}
+        managed_roles = set(self.managed_roles.values())
+        new_roles = (current_roles - managed_roles) | expected_roles
+        if new_roles == current_roles:
+            self._statistics["unchanged"] += 1
+            return
+
+        logger.debug("Update roles of member %s", member.name)
+        await member.edit(roles=sorted(new_roles))
+        self._statistics["updated"] += 1
+
+    def get_member(self, member_key: str) -> discord.Member | None:
+        if member_key.isdigit():
+            return self.guild.get_member(int(member_key))
+
+        if self._members_by_name is None:
+            # only built if the CSV file contains usernames
+            self._members_by_name = {member.name: member for member in self.guild.members}
+        return self._members_by_name.get(member_key)
+
+
+def _hash_file(path: Path) -> str:
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+class MemberExporter:
+    def __init__(self, guild: discord.Guild, *, progress_interval: int = 1000) -> None:
+        """Export guild members page by page via the REST API.
+
+        Members are written as soon as a page was received, so the memory usage does not grow
+        with the number of members. Progress is logged every `progress_interval` members.
+        """
+        self.guild: Final[discord.Guild] = guild
+        self.progress_interval: Final[int] = progress_interval
+
+    async def export_members(self, output_file: Path, *, output_format: MemberExportFormat) -> int:
+        """Write all guild members to a CSV or NDJSON file and return the number of members."""
+        with output_file.open("w", encoding="UTF-8", newline="") as output:
+            if output_format == "csv":
+                csv_writer = csv.DictWriter(output, fieldnames=MEMBER_EXPORT_FIELDS)
+                csv_writer.writeheader()
+
+                def write_row(row: dict[str, str | list[str] | None]) -> None:
+                    roles = row["roles"]
+                    csv_writer.writerow(
+                        {**row, "roles": ROLE_SEPARATOR.join(roles) if roles else ""}
+                    )
+            else:
+
+                def write_row(row: dict[str, str | list[str] | None]) -> None:
+                    output.write(json.dumps(row) + "\n")
+
+            start_time = time.perf_counter()
+            member_count = 0
+            async for member in self.guild.fetch_members(limit=None):
+                write_row(
+                    {
+                        "id": str(member.id),
+                        "name": member.name,
+                        "display_name": member.display_name,
+                        "roles": [role.name for role in member.roles if not role.is_default()],
+                        "joined_at": member.joined_at.isoformat() if member.joined_at else None,
+                    }
+                )
+                member_count += 1
+                if member_count % self.progress_interval == 0:
+                    output.flush()
+                    self._log_progress(member_count, start_time)
+
+        self._log_progress(member_count, start_time)
+        return member_count
+
+    @staticmethod
+    def _log_progress(member_count: int, start_time: float) -> None:
+        duration = time.perf_counter() - start_time
+        logger.info(
+            "Exported %d members in %.1f s (%.0f members/s)",
+            member_count,
+            duration,
+            member_count / duration if duration else 0,
+        )
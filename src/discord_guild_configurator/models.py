@@ -2,17 +2,22 @@ from __future__ import annotations
 
 import re
 import textwrap
+from collections import Counter, defaultdict
+from collections.abc import Mapping
 from typing import Annotated, Literal, Self
 
-import discord
 from pydantic import (
     AfterValidator,
+    BeforeValidator,
     Field,
+    PrivateAttr,
     model_validator,
 )
 
 from discord_guild_configurator._utils import StrictBaseModel
 from discord_guild_configurator.generated_models import (
+    PERMISSION_VALUES,
+    VERIFICATION_LEVEL_VALUES,
     ContentFilter,
     Locale,
     NotificationLevel,
@@ -25,30 +30,136 @@ MultilineString = Annotated[
     AfterValidator(lambda text: textwrap.dedent(text.strip("\r\n").rstrip())),
 ]
 
+# Enum members, e.g., 'discord.VerificationLevel.medium', are accepted instead of their names
+EnumName = BeforeValidator(
+    lambda value: value if isinstance(value, str) else getattr(value, "name", value)
+)
+
+# Stable identifier of a role, category, or channel in ID mapping files. Defaults to the name.
+# Keeping the key while changing the name renames the existing object instead of creating one.
+TemplateKey = Annotated[str | None, Field(exclude_if=lambda key: key is None)]
+
+
+def get_permission_mask(permissions: list[Permissions]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_VALUES[permission]
+    return mask
+
 
 class PermissionOverwrite(StrictBaseModel):
     roles: list[str]
     allow: list[Permissions] = Field(default_factory=list)
     deny: list[Permissions] = Field(default_factory=list)
 
+    # bit masks of `allow` and `deny`, computed once during validation
+    _allow_mask: int = PrivateAttr(default=0)
+    _deny_mask: int = PrivateAttr(default=0)
+
+    @model_validator(mode="after")
+    def compute_masks(self) -> Self:
+        self._allow_mask = get_permission_mask(self.allow)
+        self._deny_mask = get_permission_mask(self.deny)
+        return self
+
+    @property
+    def allow_mask(self) -> int:
+        return self._allow_mask
+
+    @property
+    def deny_mask(self) -> int:
+        return self._deny_mask
+
+
+def merge_permission_overwrites(
+    overwrite_templates: list[PermissionOverwrite],
+) -> dict[str, dict[str, bool]]:
+    """Merge overwrites to role name -> permission -> allowed. Later overwrites take precedence."""
+    overwrites_by_role: dict[str, dict[str, bool]] = defaultdict(dict)
+    for overwrite_template in overwrite_templates:
+        for role_name in overwrite_template.roles:
+            for permission in overwrite_template.allow:
+                overwrites_by_role[role_name][permission] = True
+            for permission in overwrite_template.deny:
+                overwrites_by_role[role_name][permission] = False
+    return dict(overwrites_by_role)
+
+
+# role name -> (allow mask, deny mask)
+OverwriteMasks = Mapping[str, tuple[int, int]]
+
+
+def merge_permission_masks(
+    overwrite_templates: list[PermissionOverwrite],
+) -> dict[str, tuple[int, int]]:
+    """Merge overwrites to role name -> (allow mask, deny mask).
+
+    Same precedence as `merge_permission_overwrites`: later overwrites take precedence, and
+    deny takes precedence over allow within an overwrite.
+    """
+    masks_by_role: dict[str, tuple[int, int]] = {}
+    for overwrite_template in overwrite_templates:
+        allow_mask = overwrite_template.allow_mask
+        deny_mask = overwrite_template.deny_mask
+        for role_name in overwrite_template.roles:
+            allow, deny = masks_by_role.get(role_name, (0, 0))
+            masks_by_role[role_name] = (
+                (allow | allow_mask) & ~deny_mask,
+                (deny & ~allow_mask) | deny_mask,
+            )
+    return masks_by_role
+
+
+class ForumTag(StrictBaseModel):
+    name: str = Field(max_length=20)
+    # unicode emoji or custom emoji ('<:name:id>')
+    emoji: str | None = Field(default=None, exclude_if=lambda emoji: emoji is None)
+    moderated: bool = Field(default=False, exclude_if=lambda moderated: not moderated)
+
 
 class ForumChannel(StrictBaseModel):
     type: Literal["forum"] = "forum"
 
     name: str
+    key: TemplateKey = None
     topic: MultilineString
     permission_overwrites: list[PermissionOverwrite] = Field(default_factory=list)
+    # names of sets in `GuildConfig.overwrite_sets`, applied before `permission_overwrites`
+    overwrite_sets: list[str] = Field(
+        default_factory=list, exclude_if=lambda overwrite_sets: not overwrite_sets
+    )
 
-    tags: list[str] = Field(default_factory=list)
+    # plain strings are tags without emoji which are not moderated
+    tags: list[str | ForumTag] = Field(default_factory=list)
     require_tag: bool = False
 
+    @property
+    def forum_tags(self) -> list[ForumTag]:
+        return [ForumTag(name=tag) if isinstance(tag, str) else tag for tag in self.tags]
+
+    @model_validator(mode="after")
+    def verify_unique_tag_names(self) -> Self:
+        duplicate_names = {
+            name
+            for name, count in Counter(tag.name for tag in self.forum_tags).items()
+            if count > 1
+        }
+        if duplicate_names:
+            raise ValueError(f"Duplicate forum tags: {duplicate_names}")
+        return self
+
 
 class TextChannel(StrictBaseModel):
     type: Literal["text"] = "text"
 
     name: str
+    key: TemplateKey = None
     topic: MultilineString
     permission_overwrites: list[PermissionOverwrite] = Field(default_factory=list)
+    # names of sets in `GuildConfig.overwrite_sets`, applied before `permission_overwrites`
+    overwrite_sets: list[str] = Field(
+        default_factory=list, exclude_if=lambda overwrite_sets: not overwrite_sets
+    )
 
     channel_messages: list[MultilineString] = Field(default_factory=list)
 
@@ -57,24 +168,52 @@ class VoiceChannel(StrictBaseModel):
     type: Literal["voice"] = "voice"
 
     name: str
+    key: TemplateKey = None
     permission_overwrites: list[PermissionOverwrite] = Field(default_factory=list)
+    # names of sets in `GuildConfig.overwrite_sets`, applied before `permission_overwrites`
+    overwrite_sets: list[str] = Field(
+        default_factory=list, exclude_if=lambda overwrite_sets: not overwrite_sets
+    )
+
+
+ChannelTemplate = TextChannel | ForumChannel | VoiceChannel
 
 
 class Category(StrictBaseModel):
     name: str
-    channels: list[
-        Annotated[TextChannel | ForumChannel | VoiceChannel, Field(discriminator="type")]
-    ]
+    key: TemplateKey = None
+    channels: list[Annotated[ChannelTemplate, Field(discriminator="type")]]
     permission_overwrites: list[PermissionOverwrite] = Field(default_factory=list)
+    # names of sets in `GuildConfig.overwrite_sets`, applied before `permission_overwrites`
+    overwrite_sets: list[str] = Field(
+        default_factory=list, exclude_if=lambda overwrite_sets: not overwrite_sets
+    )
 
 
 class Role(StrictBaseModel):
     name: str
+    key: TemplateKey = None
     color: str = Field(pattern=re.compile("^#[0-9A-F]{6}$"))
     hoist: bool = False
     mentionable: bool = False
     permissions: list[Permissions] = Field(default_factory=list)
 
+    # bit mask of `permissions`, computed once during validation
+    _permissions_mask: int = PrivateAttr(default=0)
+
+    @model_validator(mode="after")
+    def compute_permissions_mask(self) -> Self:
+        self._permissions_mask = get_permission_mask(self.permissions)
+        return self
+
+    @property
+    def permissions_mask(self) -> int:
+        return self._permissions_mask
+
+
+def get_template_key(template: Role | Category | ChannelTemplate) -> str:
+    return template.key or template.name
+
 
 class CommunityFeatures(StrictBaseModel):
     guild_description: str | None
@@ -93,22 +232,114 @@ class SystemChannel(StrictBaseModel):
     role_subscription_purchase_notifications: bool
 
 
-class GuildConfig(StrictBaseModel):
+class GuildSettings(StrictBaseModel):
+    """Everything of a guild configuration except the categories.
+
+    Chunked configurations store this separately from the categories, see `chunked_config`.
+    """
+
     roles: list[Role]
+    # group name -> role or group names, usable instead of role names in permission overwrites
+    role_groups: dict[str, list[str]] = Field(
+        default_factory=dict, exclude_if=lambda role_groups: not role_groups
+    )
+    # set name -> permission overwrites, referenced by categories and channels
+    overwrite_sets: dict[str, list[PermissionOverwrite]] = Field(
+        default_factory=dict, exclude_if=lambda overwrite_sets: not overwrite_sets
+    )
     system_channel: SystemChannel
-    categories: list[Category]
     community_features: CommunityFeatures | None
-    verification_level: VerificationLevel
-    default_notifications: NotificationLevel
-    explicit_content_filter: ContentFilter
-    preferred_locale: Locale
+    verification_level: Annotated[VerificationLevel, EnumName]
+    default_notifications: Annotated[NotificationLevel, EnumName]
+    explicit_content_filter: Annotated[ContentFilter, EnumName]
+    preferred_locale: Annotated[Locale, EnumName]
+
+    # channel template key -> merged overwrite masks, equal mappings are shared between channels
+    _overwrite_masks: dict[str, OverwriteMasks] = PrivateAttr(default_factory=dict)
+    _interned_masks: dict[tuple[tuple[str, tuple[int, int]], ...], OverwriteMasks] = PrivateAttr(
+        default_factory=dict
+    )
 
     @model_validator(mode="after")
-    def verify_system_channel_names(self) -> Self:
-        channel_names: list[str] = []
-        for category in self.categories:
-            channel_names.extend(channel.name for channel in category.channels)
+    def verify_verification_level(self) -> Self:
+        if (
+            self.community_features
+            and VERIFICATION_LEVEL_VALUES[self.verification_level]
+            < VERIFICATION_LEVEL_VALUES["medium"]
+        ):
+            raise ValueError(
+                "The Community feature requires a verification level of at least medium"
+            )
+        return self
 
+    @model_validator(mode="after")
+    def verify_unique_role_keys(self) -> Self:
+        duplicate_keys = {
+            key
+            for key, count in Counter(get_template_key(role) for role in self.roles).items()
+            if count > 1
+        }
+        if duplicate_keys:
+            raise ValueError(f"Duplicate names or keys: {duplicate_keys}")
+        return self
+
+    @model_validator(mode="after")
+    def verify_role_groups(self) -> Self:
+        role_names = {role.name for role in self.roles}
+        ambiguous_names = role_names & self.role_groups.keys()
+        if ambiguous_names:
+            raise ValueError(f"Role groups with the name of a role: {ambiguous_names}")
+
+        def visit(group_name: str, path: list[str]) -> None:
+            if group_name in path:
+                raise ValueError(f"Cyclic role group: {' -> '.join([*path, group_name])}")
+            for member in self.role_groups[group_name]:
+                if member in self.role_groups:
+                    visit(member, [*path, group_name])
+                elif member not in role_names:
+                    raise ValueError(f"Unknown role in role group '{group_name}': {member}")
+
+        for group_name in self.role_groups:
+            visit(group_name, [])
+        return self
+
+    @model_validator(mode="after")
+    def verify_overwrite_set_roles(self) -> Self:
+        missing_roles = self._get_missing_roles(
+            [overwrite for overwrites in self.overwrite_sets.values() for overwrite in overwrites]
+        )
+        if missing_roles:
+            raise ValueError(f"Missing roles in overwrite sets: {missing_roles}")
+        return self
+
+    def _get_missing_roles(self, overwrite_templates: list[PermissionOverwrite]) -> set[str]:
+        roles = {role.name for role in self.roles} | self.role_groups.keys()
+        return {
+            role
+            for overwrite in overwrite_templates
+            for role in overwrite.roles
+            if role not in roles
+        }
+
+    def verify_category_references(self, category: Category) -> None:
+        """Check that all roles and overwrite sets referenced by a category exist."""
+        unknown_sets = {
+            set_name
+            for template in (category, *category.channels)
+            for set_name in template.overwrite_sets
+            if set_name not in self.overwrite_sets
+        }
+        if unknown_sets:
+            raise ValueError(f"Unknown overwrite sets: {unknown_sets}")
+
+        overwrite_templates = list(category.permission_overwrites)
+        for channel in category.channels:
+            overwrite_templates.extend(channel.permission_overwrites)
+        missing_roles = self._get_missing_roles(overwrite_templates)
+        if missing_roles:
+            raise ValueError(f"Missing roles: {missing_roles}")
+
+    def get_required_channel_names(self) -> list[str]:
         required_channels = [self.system_channel.name]
         if self.community_features:
             required_channels.extend(
@@ -118,8 +349,65 @@ class GuildConfig(StrictBaseModel):
                     self.community_features.safety_alerts_channel,
                 ]
             )
+        return required_channels
+
+    def expand_roles(self, names: list[str]) -> list[str]:
+        """Replace role group names by the names of their roles, recursively."""
+        role_names: dict[str, None] = {}
+        for name in names:
+            if name in self.role_groups:
+                role_names.update(dict.fromkeys(self.expand_roles(self.role_groups[name])))
+            else:
+                role_names[name] = None
+        return list(role_names)
+
+    def resolve_overwrites(
+        self, category: Category, channel: ChannelTemplate
+    ) -> list[PermissionOverwrite]:
+        """Get the overwrites of a channel in order of precedence, with role groups expanded.
+
+        Category overwrites come before channel overwrites, and overwrite sets come before
+        explicit overwrites.
+        """
+        overwrite_templates: list[PermissionOverwrite] = []
+        for template in (category, channel):
+            for set_name in template.overwrite_sets:
+                overwrite_templates.extend(self.overwrite_sets[set_name])
+            overwrite_templates.extend(template.permission_overwrites)
+        if not self.role_groups:
+            return overwrite_templates
+        return [
+            overwrite.model_copy(update={"roles": self.expand_roles(overwrite.roles)})
+            for overwrite in overwrite_templates
+        ]
+
+    def compile_overwrite_masks(self, category: Category) -> None:
+        """Compile the merged overwrite masks of all channels of a verified category."""
+        for channel in category.channels:
+            masks = merge_permission_masks(self.resolve_overwrites(category, channel))
+            self._overwrite_masks[get_template_key(channel)] = self._interned_masks.setdefault(
+                tuple(masks.items()), masks
+            )
+
+    def get_overwrite_masks(self, channel: ChannelTemplate) -> OverwriteMasks:
+        """Get the merged overwrites of a channel as role name -> (allow mask, deny mask).
+
+        The masks are compiled during validation, the returned mapping must not be modified.
+        """
+        return self._overwrite_masks[get_template_key(channel)]
+
+
+class GuildConfig(GuildSettings):
+    categories: list[Category]
+
+    @model_validator(mode="after")
+    def verify_system_channel_names(self) -> Self:
+        channel_names: list[str] = []
+        for category in self.categories:
+            channel_names.extend(channel.name for channel in category.channels)
+
         missing_channels = [
-            channel for channel in required_channels if channel not in channel_names
+            channel for channel in self.get_required_channel_names() if channel not in channel_names
         ]
 
         if missing_channels:
@@ -128,30 +416,35 @@ class GuildConfig(StrictBaseModel):
         return self
 
     @model_validator(mode="after")
-    def verify_verification_level(self) -> Self:
-        if self.community_features and self.verification_level < discord.VerificationLevel.medium:  # type: ignore[unsupported-operator]
-            raise ValueError(
-                "The Community feature requires a verification level of at least medium"
-            )
+    def verify_unique_template_keys(self) -> Self:
+        # role keys are verified by `GuildSettings`
+        category_keys = [get_template_key(category) for category in self.categories]
+        channel_keys = [
+            get_template_key(channel)
+            for category in self.categories
+            for channel in category.channels
+        ]
+
+        duplicate_keys = {
+            key
+            for keys in (category_keys, channel_keys)
+            for key, count in Counter(keys).items()
+            if count > 1
+        }
+        if duplicate_keys:
+            raise ValueError(f"Duplicate names or keys: {duplicate_keys}")
+
         return self
 
     @model_validator(mode="after")
     def verify_permission_roles(self) -> Self:
-        roles = [role.name for role in self.roles]
-
-        missing_roles = set()
         for category in self.categories:
-            for overwrite in category.permission_overwrites:
-                for role in overwrite.roles:
-                    if role not in roles:
-                        missing_roles.add(role)
-            for channel in category.channels:
-                for overwrite in channel.permission_overwrites:
-                    for role in overwrite.roles:
-                        if role not in roles:
-                            missing_roles.add(role)
-
-        if missing_roles:
-            raise ValueError(f"Missing roles: {missing_roles}")
+            self.verify_category_references(category)
+        return self
 
+    @model_validator(mode="after")
+    def compile_all_overwrite_masks(self) -> Self:
+        # runs after all other validators, which ensure that all references can be resolved
+        for category in self.categories:
+            self.compile_overwrite_masks(category)
         return self
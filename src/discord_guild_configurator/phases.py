@@ -0,0 +1,7 @@
+from typing import Final, Literal, get_args
+
+# phases of applying a configuration, in order
+Phase = Literal[
+    "roles", "system-channel", "community", "channels", "permissions", "topics", "messages"
+]
+PHASES: Final[tuple[Phase, ...]] = get_args(Phase)
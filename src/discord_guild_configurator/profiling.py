@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Final, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Generator, Iterator
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# number of allocation sites per section in the allocation summary
+TOP_ALLOCATIONS: Final = 20
+ALLOCATIONS_FILE_NAME: Final = "allocations.txt"
+
+
+class PhaseProfiler:
+    def __init__(self, output_dir: Path, *, cpu: bool = True, memory: bool = False) -> None:
+        """Attribute CPU time and memory allocations to phases.
+
+        With `cpu`, each phase is profiled with its own `cProfile` profiler, which measures
+        process time, so waiting for Discord is not counted. With `memory`, allocations are
+        traced with `tracemalloc`, and the net allocated memory of each phase is recorded.
+
+        Coroutines are profiled step by step, i.e., only while they run and not while they wait.
+        Concurrent operations of different phases are thereby attributed to their own phase.
+
+        `write_results` writes one pstats file per phase and an allocation summary with the top
+        allocation sites of each section traced with `trace_allocations` to `output_dir`.
+        """
+        self.output_dir: Final[Path] = output_dir
+        self.cpu: Final[bool] = cpu
+        self.memory: Final[bool] = memory
+
+        self._profiles: Final[dict[str, cProfile.Profile]] = {}
+        self._net_allocations: Final[defaultdict[str, int]] = defaultdict(int)
+        # traced memory at the start of each running phase
+        self._running_phases: Final[dict[str, int]] = {}
+        self._allocation_stats: Final[dict[str, list[tracemalloc.StatisticDiff]]] = {}
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, phase: str) -> None:
+        """Start profiling a phase. Profiled phases must not overlap."""
+        self._running_phases[phase] = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        if self.cpu:
+            if phase not in self._profiles:
+                self._profiles[phase] = cProfile.Profile(time.process_time)
+            self._profiles[phase].enable()
+
+    def stop(self, phase: str) -> None:
+        """Stop profiling a phase. Does nothing if the phase is not running."""
+        if phase not in self._running_phases:
+            return
+        start_memory = self._running_phases.pop(phase)
+        if self.cpu:
+            self._profiles[phase].disable()
+        if self.memory:
+            self._net_allocations[phase] += tracemalloc.get_traced_memory()[0] - start_memory
+
+    @contextmanager
+    def profile(self, phase: str) -> Iterator[None]:
+        self.start(phase)
+        try:
+            yield
+        finally:
+            self.stop(phase)
+
+    @contextmanager
+    def trace_allocations(self, section: str) -> Iterator[None]:
+        """Record the top allocation sites of a section. Sections may contain phases."""
+        if not self.memory:
+            yield
+            return
+        start_snapshot = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            self._allocation_stats[section] = tracemalloc.take_snapshot().compare_to(
+                start_snapshot, "lineno"
+            )[:TOP_ALLOCATIONS]
+
+    async def profile_awaitable(self, phase: str, awaitable: Awaitable[T]) -> T:
+        return await _ProfiledAwaitable(self, phase, awaitable)
+
+    async def profile_iterator(self, phase: str, iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+        """Profile the production of each item of an asynchronous iterable."""
+        iterator = aiter(iterable)
+        while True:
+            try:
+                item = await self.profile_awaitable(phase, anext(iterator))
+            except StopAsyncIteration:
+                return
+            yield item
+
+    def write_results(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for phase, profile in self._profiles.items():
+            profile.dump_stats(self.output_dir / f"{phase}.pstats")
+            logger.info(
+                "Phase %s: %.3f seconds CPU time",
+                phase,
+                pstats.Stats(profile).get_stats_profile().total_tt,
+            )
+        if self.memory:
+            (self.output_dir / ALLOCATIONS_FILE_NAME).write_text(
+                self._format_allocations(), encoding="UTF-8"
+            )
+        logger.info("Wrote profiling results to %s", self.output_dir)
+
+    def _format_allocations(self) -> str:
+        lines = ["Net allocated memory per phase:"]
+        lines.extend(
+            f"  {phase}: {size / 1024:.1f} KiB" for phase, size in self._net_allocations.items()
+        )
+        for section, stats in self._allocation_stats.items():
+            lines.append(f"\nTop {len(stats)} allocation sites of {section}:")
+            lines.extend(f"  {stat}" for stat in stats)
+        return "\n".join(lines) + "\n"
+
+
+class _ProfiledAwaitable(Generic[T]):
+    def __init__(self, profiler: PhaseProfiler, phase: str, awaitable: Awaitable[T]) -> None:
+        """Awaitable which profiles each step of another awaitable, but not the time between.
+
+        Each step runs until the awaitable suspends, e.g., to wait for a response.
+        """
+        self.profiler: Final[PhaseProfiler] = profiler
+        self.phase: Final[str] = phase
+        self.steps: Final[Generator[Any, Any, T]] = awaitable.__await__()
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        sent_value: Any = None
+        error: BaseException | None = None
+        while True:
+            with self.profiler.profile(self.phase):
+                try:
+                    if error is None:
+                        yielded_value = self.steps.send(sent_value)
+                    else:
+                        yielded_value = self.steps.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+            try:
+                sent_value = yield yielded_value
+                error = None
+            except GeneratorExit:
+                self.steps.close()
+                raise
+            except BaseException as caught_error:  # noqa: BLE001 (e.g., cancellation)
+                # forwarded to the awaitable like `await` does
+                sent_value, error = None, caught_error
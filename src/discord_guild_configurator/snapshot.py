@@ -0,0 +1,579 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any, Final, Literal, TypeVar
+
+import discord
+from discord.http import Route
+from pydantic import Field
+
+from discord_guild_configurator._utils import StrictBaseModel
+from discord_guild_configurator.diff import diff_configs
+from discord_guild_configurator.exporter import GuildExporter, OverwritesByRole
+from discord_guild_configurator.generated_models import (
+    CONTENT_FILTER_VALUES,
+    LOCALE_VALUES,
+    NOTIFICATION_LEVEL_VALUES,
+    VERIFICATION_LEVEL_VALUES,
+)
+from discord_guild_configurator.id_mapping import IdMapping
+from discord_guild_configurator.models import (
+    Category,
+    ChannelTemplate,
+    CommunityFeatures,
+    ForumChannel,
+    ForumTag,
+    GuildConfig,
+    Role,
+    SystemChannel,
+    TextChannel,
+    VoiceChannel,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from discord.http import HTTPClient
+
+    from discord_guild_configurator.diff import ConfigDiff
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+TemplateT = TypeVar("TemplateT", Role, Category, ChannelTemplate)
+
+# Discord keeps audit log entries for 45 days, older snapshots cannot be refreshed
+AUDIT_LOG_RETENTION: Final = datetime.timedelta(days=45)
+AUDIT_LOG_PAGE_SIZE: Final = 100
+
+# audit log actions which change snapshotted objects
+GUILD_ACTIONS: Final = frozenset(
+    action.value
+    for action in (
+        discord.AuditLogAction.guild_update,
+        discord.AuditLogAction.role_create,
+        discord.AuditLogAction.role_update,
+        discord.AuditLogAction.role_delete,
+    )
+)
+CHANNEL_ACTIONS: Final = frozenset(
+    action.value
+    for action in (
+        discord.AuditLogAction.channel_create,
+        discord.AuditLogAction.channel_update,
+        discord.AuditLogAction.channel_delete,
+        discord.AuditLogAction.overwrite_create,
+        discord.AuditLogAction.overwrite_update,
+        discord.AuditLogAction.overwrite_delete,
+    )
+)
+
+# if more channels changed, all channels are fetched with a single request
+MAX_CHANNEL_REQUESTS: Final = 3
+
+# overwrite types: 0 = role, 1 = member
+ROLE_OVERWRITE_TYPE: Final = 0
+
+SnapshotChannelType = Literal["category", "text", "voice", "forum"]
+SNAPSHOT_CHANNEL_TYPES: Final[dict[int, SnapshotChannelType]] = {
+    discord.ChannelType.category.value: "category",
+    discord.ChannelType.text.value: "text",
+    discord.ChannelType.voice.value: "voice",
+    discord.ChannelType.forum.value: "forum",
+}
+
+# flag of forum channels which requires a tag for new posts
+REQUIRE_TAG_FLAG: Final = 1 << 4
+
+
+class RoleSnapshot(StrictBaseModel):
+    id: int
+    name: str
+    color: int
+    hoist: bool
+    mentionable: bool
+    managed: bool
+    position: int
+    permissions: int
+
+
+class OverwriteSnapshot(StrictBaseModel):
+    role_id: int
+    allow: int
+    deny: int
+
+
+class ChannelSnapshot(StrictBaseModel):
+    id: int
+    type: SnapshotChannelType
+    name: str
+    position: int
+    parent_id: int | None = None
+    topic: str | None = None
+    overwrites: list[OverwriteSnapshot] = Field(default_factory=list)
+    tags: list[ForumTag] = Field(default_factory=list)
+    require_tag: bool = False
+
+
+class GuildSettingsSnapshot(StrictBaseModel):
+    system_channel_id: int | None
+    system_channel_flags: int
+    community: bool
+    rules_channel_id: int | None
+    public_updates_channel_id: int | None
+    safety_alerts_channel_id: int | None
+    description: str | None
+    verification_level: int
+    default_notifications: int
+    explicit_content_filter: int
+    preferred_locale: str
+
+
+class GuildSnapshot(StrictBaseModel):
+    """Compact state of a guild's roles, channels, and settings, without channel messages.
+
+    Objects are stored with their Discord IDs, so changes from the audit log can be applied.
+    """
+
+    guild_id: int
+    # latest audit log entry which is reflected in the snapshot, None if the audit log was empty
+    audit_log_entry_id: int | None
+    refreshed_at: datetime.datetime
+    settings: GuildSettingsSnapshot
+    roles: list[RoleSnapshot]
+    channels: list[ChannelSnapshot]
+
+    @classmethod
+    def load(cls, path: Path) -> GuildSnapshot | None:
+        """Load a snapshot file. Returns None if the file does not exist."""
+        if not path.exists():
+            return None
+        return cls.model_validate_json(path.read_text(encoding="UTF-8"))
+
+    def save(self, path: Path) -> None:
+        path.write_text(self.model_dump_json() + "\n", encoding="UTF-8")
+
+    def diff_config(self, config: GuildConfig, id_mapping: IdMapping | None = None) -> ConfigDiff:
+        """Compare the snapshot to `config`, ignoring default messages.
+
+        Objects are matched by the template keys of their IDs in `id_mapping`, other objects
+        are matched by name, since the snapshot does not know their keys.
+        """
+        id_mapping = id_mapping or IdMapping()
+        categories = [
+            _strip_unmapped_key(category, id_mapping.categories).model_copy(
+                update={
+                    "channels": [
+                        _strip_unmapped_key(channel, id_mapping.channels).model_copy(
+                            update={"channel_messages": []}
+                            if isinstance(channel, TextChannel)
+                            else {}
+                        )
+                        for channel in category.channels
+                    ]
+                }
+            )
+            for category in config.categories
+        ]
+        roles = [_strip_unmapped_key(role, id_mapping.roles) for role in config.roles]
+        return diff_configs(
+            self.to_config(id_mapping),
+            config.model_copy(update={"roles": roles, "categories": categories}),
+        )
+
+    def to_config(self, id_mapping: IdMapping | None = None) -> GuildConfig:
+        """Convert the snapshot to a guild configuration, like the exporter does.
+
+        Objects whose ID is in `id_mapping` get their template key. Text channels have no
+        default messages, since messages are not part of snapshots.
+        """
+        id_mapping = id_mapping or IdMapping()
+        roles = {role.id: role for role in self.roles}
+        channels = {channel.id: channel for channel in self.channels}
+        role_names = {role.name for role in self.roles if not role.managed}
+        role_keys = _get_keys_by_id(id_mapping.roles)
+
+        def get_channel_name(channel_id: int | None, description: str) -> str:
+            if channel_id is None or channel_id not in channels:
+                raise RuntimeError(f"The guild has no {description}")
+            return channels[channel_id].name
+
+        return GuildConfig(
+            roles=[
+                self._convert_role(role, role_keys.get(role.id))
+                # highest role first, '@everyone' last
+                for role in sorted(
+                    self.roles, key=lambda role: (role.position, role.id), reverse=True
+                )
+                if not role.managed
+            ],
+            system_channel=self._convert_system_channel(
+                get_channel_name(self.settings.system_channel_id, "system channel")
+            ),
+            categories=self._convert_categories(roles, role_names, id_mapping),
+            community_features=(
+                CommunityFeatures(
+                    guild_description=self.settings.description,
+                    rules_channel=get_channel_name(self.settings.rules_channel_id, "rules channel"),
+                    public_updates_channel=get_channel_name(
+                        self.settings.public_updates_channel_id, "public updates channel"
+                    ),
+                    safety_alerts_channel=get_channel_name(
+                        self.settings.safety_alerts_channel_id, "safety alerts channel"
+                    ),
+                )
+                if self.settings.community
+                else None
+            ),
+            verification_level=_get_name(
+                VERIFICATION_LEVEL_VALUES, self.settings.verification_level
+            ),
+            default_notifications=_get_name(
+                NOTIFICATION_LEVEL_VALUES, self.settings.default_notifications
+            ),
+            explicit_content_filter=_get_name(
+                CONTENT_FILTER_VALUES, self.settings.explicit_content_filter
+            ),
+            preferred_locale=_get_name(LOCALE_VALUES, self.settings.preferred_locale),
+        )
+
+    @staticmethod
+    def _convert_role(role: RoleSnapshot, key: str | None) -> Role:
+        return Role(
+            name=role.name,
+            key=key,
+            color=f"#{role.color:06X}",
+            hoist=role.hoist,
+            mentionable=role.mentionable,
+            permissions=[name for name, value in discord.Permissions(role.permissions) if value],  # type: ignore[invalid-argument-type]
+        )
+
+    def _convert_system_channel(self, name: str) -> SystemChannel:
+        flags = discord.SystemChannelFlags()
+        flags.value = self.settings.system_channel_flags
+        return SystemChannel(
+            name=name,
+            guild_reminder_notifications=flags.guild_reminder_notifications,
+            join_notification_replies=flags.join_notification_replies,
+            join_notifications=flags.join_notifications,
+            premium_subscriptions=flags.premium_subscriptions,
+            role_subscription_purchase_notification_replies=flags.role_subscription_purchase_notification_replies,
+            role_subscription_purchase_notifications=flags.role_subscription_purchase_notifications,
+        )
+
+    def _convert_categories(
+        self, roles: dict[int, RoleSnapshot], role_names: set[str], id_mapping: IdMapping
+    ) -> list[Category]:
+        category_keys = _get_keys_by_id(id_mapping.categories)
+        channel_keys = _get_keys_by_id(id_mapping.channels)
+        # same order as the Discord UI: by position, voice channels after other channels
+        channels_by_category: dict[int, list[ChannelSnapshot]] = {
+            channel.id: [] for channel in self.channels if channel.type == "category"
+        }
+        for channel in sorted(
+            self.channels,
+            key=lambda channel: (channel.type == "voice", channel.position, channel.id),
+        ):
+            if channel.type == "category":
+                continue
+            if channel.parent_id not in channels_by_category:
+                logger.warning("Skip channel %s: Not part of a category", channel.name)
+                continue
+            channels_by_category[channel.parent_id].append(channel)
+
+        categories = []
+        for category in sorted(
+            (channel for channel in self.channels if channel.type == "category"),
+            key=lambda category: (category.position, category.id),
+        ):
+            category_overwrites = self._convert_overwrites(category, roles, role_names)
+            categories.append(
+                Category(
+                    name=category.name,
+                    key=category_keys.get(category.id),
+                    channels=[
+                        self._convert_channel(
+                            channel,
+                            GuildExporter.subtract_overwrites(
+                                self._convert_overwrites(channel, roles, role_names),
+                                category_overwrites,
+                            ),
+                            channel_keys.get(channel.id),
+                        )
+                        for channel in channels_by_category[category.id]
+                    ],
+                    permission_overwrites=GuildExporter.fold_overwrites(category_overwrites),
+                )
+            )
+        return categories
+
+    @staticmethod
+    def _convert_overwrites(
+        channel: ChannelSnapshot, roles: dict[int, RoleSnapshot], role_names: set[str]
+    ) -> OverwritesByRole:
+        overwrites_by_role: OverwritesByRole = {}
+        for overwrite in channel.overwrites:
+            role = roles.get(overwrite.role_id)
+            if role is None or role.name not in role_names:
+                logger.debug("Skip permission overwrite for role %d", overwrite.role_id)
+                continue
+            permission_overwrite = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(overwrite.allow), discord.Permissions(overwrite.deny)
+            )
+            overwrites_by_role[role.name] = {
+                permission: value for permission, value in permission_overwrite if value is not None
+            }
+        return overwrites_by_role
+
+    @staticmethod
+    def _convert_channel(
+        channel: ChannelSnapshot, overwrites: OverwritesByRole, key: str | None
+    ) -> TextChannel | ForumChannel | VoiceChannel:
+        permission_overwrites = GuildExporter.fold_overwrites(overwrites)
+        if channel.type == "text":
+            return TextChannel(
+                name=channel.name,
+                key=key,
+                topic=channel.topic or "",
+                permission_overwrites=permission_overwrites,
+            )
+        if channel.type == "forum":
+            return ForumChannel(
+                name=channel.name,
+                key=key,
+                topic=channel.topic or "",
+                permission_overwrites=permission_overwrites,
+                tags=[
+                    tag.name if tag.emoji is None and not tag.moderated else tag
+                    for tag in channel.tags
+                ],
+                require_tag=channel.require_tag,
+            )
+        return VoiceChannel(name=channel.name, key=key, permission_overwrites=permission_overwrites)
+
+
+def _get_name(values: dict[T, Any], value: object) -> T:
+    for name, candidate in values.items():
+        if candidate == value:
+            return name
+    raise ValueError(f"Unknown value: {value}")
+
+
+def _get_keys_by_id(ids_by_key: dict[str, int]) -> dict[int, str]:
+    return {object_id: key for key, object_id in ids_by_key.items()}
+
+
+def _strip_unmapped_key(template: TemplateT, ids_by_key: dict[str, int]) -> TemplateT:
+    """Remove the key of a template without ID, so it is matched by name."""
+    if template.key is None or template.key in ids_by_key:
+        return template
+    return template.model_copy(update={"key": None})
+
+
+class SnapshotRefresher:
+    def __init__(self, http: HTTPClient, guild_id: int) -> None:
+        """Create and refresh guild snapshots with REST requests, without the gateway.
+
+        A new snapshot requires three requests: the latest audit log entry, the guild with its
+        roles and settings, and all channels.
+
+        An existing snapshot is refreshed from the audit log entries after its latest entry.
+        Only the objects they changed are fetched again:
+        - Guild and role changes: the guild with its roles and settings (one request)
+        - Channel and overwrite changes: each changed channel, or all channels with a single
+          request if more than `MAX_CHANNEL_REQUESTS` channels changed
+        If nothing changed, only the audit log is read. Snapshots which are older than the
+        retention period of the audit log are replaced by new snapshots.
+
+        Requires the 'view_audit_log' permission.
+        """
+        self.http: Final[HTTPClient] = http
+        self.guild_id: Final[int] = guild_id
+
+    async def create_snapshot(self) -> GuildSnapshot:
+        logger.info("Creating snapshot of guild %d", self.guild_id)
+        # read before the objects, so changes made in between are applied by the next refresh
+        latest_entries = await self._get_audit_log_entries(limit=1)
+        guild_data, channels_data = await asyncio.gather(
+            self._get_guild(), self._get_all_channels()
+        )
+        return GuildSnapshot(
+            guild_id=self.guild_id,
+            audit_log_entry_id=int(latest_entries[0]["id"]) if latest_entries else None,
+            refreshed_at=discord.utils.utcnow(),
+            settings=_parse_settings(guild_data),
+            roles=[_parse_role(role_data) for role_data in guild_data["roles"]],
+            channels=_parse_channels(channels_data),
+        )
+
+    async def refresh_snapshot(self, snapshot: GuildSnapshot | None) -> GuildSnapshot:
+        """Apply the changes since the snapshot was refreshed, or create a new snapshot."""
+        if snapshot is None or snapshot.guild_id != self.guild_id:
+            return await self.create_snapshot()
+        if discord.utils.utcnow() - snapshot.refreshed_at > AUDIT_LOG_RETENTION:
+            logger.info("Snapshot is older than the audit log")
+            return await self.create_snapshot()
+
+        entries = await self._get_audit_log_entries_after(snapshot.audit_log_entry_id or 0)
+        update: dict[str, Any] = {"refreshed_at": discord.utils.utcnow()}
+        if not entries:
+            logger.info("Guild did not change since the snapshot was refreshed")
+            return snapshot.model_copy(update=update)
+
+        update["audit_log_entry_id"] = max(int(entry["id"]) for entry in entries)
+        action_types = {entry["action_type"] for entry in entries}
+        changed_channel_ids = {
+            int(entry["target_id"])
+            for entry in entries
+            if entry["action_type"] in CHANNEL_ACTIONS and entry.get("target_id") is not None
+        }
+        logger.info(
+            "Applying %d audit log entries, %d changed channels",
+            len(entries),
+            len(changed_channel_ids),
+        )
+
+        if action_types & GUILD_ACTIONS:
+            guild_data = await self._get_guild()
+            update["settings"] = _parse_settings(guild_data)
+            update["roles"] = [_parse_role(role_data) for role_data in guild_data["roles"]]
+        if len(changed_channel_ids) > MAX_CHANNEL_REQUESTS:
+            update["channels"] = _parse_channels(await self._get_all_channels())
+        elif changed_channel_ids:
+            changed_channels = await asyncio.gather(
+                *(self._get_channel(channel_id) for channel_id in changed_channel_ids)
+            )
+            update["channels"] = [
+                channel for channel in snapshot.channels if channel.id not in changed_channel_ids
+            ] + _parse_channels(
+                [channel_data for channel_data in changed_channels if channel_data is not None]
+            )
+        return snapshot.model_copy(update=update)
+
+    async def _get_audit_log_entries(self, **params: int) -> list[dict[str, Any]]:
+        data = await self.http.request(
+            Route("GET", "/guilds/{guild_id}/audit-logs", guild_id=self.guild_id),
+            params=params,
+        )
+        return data["audit_log_entries"]
+
+    async def _get_audit_log_entries_after(self, entry_id: int) -> list[dict[str, Any]]:
+        entries = []
+        while True:
+            page = await self._get_audit_log_entries(after=entry_id, limit=AUDIT_LOG_PAGE_SIZE)
+            entries.extend(page)
+            if len(page) < AUDIT_LOG_PAGE_SIZE:
+                return entries
+            entry_id = max(int(entry["id"]) for entry in page)
+
+    async def _get_guild(self) -> dict[str, Any]:
+        return await self.http.request(Route("GET", "/guilds/{guild_id}", guild_id=self.guild_id))
+
+    async def _get_all_channels(self) -> list[dict[str, Any]]:
+        return await self.http.request(
+            Route("GET", "/guilds/{guild_id}/channels", guild_id=self.guild_id)
+        )
+
+    async def _get_channel(self, channel_id: int) -> dict[str, Any] | None:
+        """Fetch a channel, or return None if it was deleted."""
+        try:
+            return await self.http.request(
+                Route("GET", "/channels/{channel_id}", channel_id=channel_id)
+            )
+        except discord.NotFound:
+            return None
+
+
+def _parse_settings(guild_data: dict[str, Any]) -> GuildSettingsSnapshot:
+    def get_id(key: str) -> int | None:
+        return None if guild_data.get(key) is None else int(guild_data[key])
+
+    return GuildSettingsSnapshot(
+        system_channel_id=get_id("system_channel_id"),
+        system_channel_flags=guild_data["system_channel_flags"],
+        community="COMMUNITY" in guild_data["features"],
+        rules_channel_id=get_id("rules_channel_id"),
+        public_updates_channel_id=get_id("public_updates_channel_id"),
+        safety_alerts_channel_id=get_id("safety_alerts_channel_id"),
+        description=guild_data.get("description"),
+        verification_level=guild_data["verification_level"],
+        default_notifications=guild_data["default_message_notifications"],
+        explicit_content_filter=guild_data["explicit_content_filter"],
+        preferred_locale=guild_data["preferred_locale"],
+    )
+
+
+def _parse_role(role_data: dict[str, Any]) -> RoleSnapshot:
+    return RoleSnapshot(
+        id=int(role_data["id"]),
+        name=role_data["name"],
+        color=role_data["color"],
+        hoist=role_data["hoist"],
+        mentionable=role_data["mentionable"],
+        managed=role_data["managed"],
+        position=role_data["position"],
+        permissions=int(role_data["permissions"]),
+    )
+
+
+def _parse_channels(channels_data: list[dict[str, Any]]) -> list[ChannelSnapshot]:
+    channels = []
+    for channel_data in channels_data:
+        channel_type = SNAPSHOT_CHANNEL_TYPES.get(channel_data["type"])
+        if channel_type is None:
+            logger.debug("Skip channel %s: Unsupported type", channel_data["name"])
+            continue
+        channels.append(
+            ChannelSnapshot(
+                id=int(channel_data["id"]),
+                type=channel_type,
+                name=channel_data["name"],
+                position=channel_data["position"],
+                parent_id=(
+                    None
+                    if channel_data.get("parent_id") is None
+                    else int(channel_data["parent_id"])
+                ),
+                topic=channel_data.get("topic"),
+                overwrites=[
+                    OverwriteSnapshot(
+                        role_id=int(overwrite["id"]),
+                        allow=int(overwrite["allow"]),
+                        deny=int(overwrite["deny"]),
+                    )
+                    for overwrite in channel_data.get("permission_overwrites", [])
+                    if overwrite["type"] == ROLE_OVERWRITE_TYPE
+                ],
+                tags=[_parse_tag(tag_data) for tag_data in channel_data.get("available_tags", [])],
+                require_tag=bool(channel_data.get("flags", 0) & REQUIRE_TAG_FLAG),
+            )
+        )
+    return channels
+
+
+def _parse_tag(tag_data: dict[str, Any]) -> ForumTag:
+    # same emoji format as discord.py, which is used by the exporter
+    emoji_name = tag_data.get("emoji_name") or ""
+    emoji_id = int(tag_data["emoji_id"]) if tag_data.get("emoji_id") else None
+    return ForumTag(
+        name=tag_data["name"],
+        emoji=(
+            str(discord.PartialEmoji(name=emoji_name, id=emoji_id))
+            if emoji_name or emoji_id
+            else None
+        ),
+        moderated=tag_data.get("moderated", False),
+    )
+
+
+async def refresh_snapshot_file(path: Path, *, guild_id: int, token: str) -> GuildSnapshot:
+    """Refresh the snapshot in `path`, or create it if it does not exist."""
+    async with discord.Client(intents=discord.Intents.none()) as client:
+        await client.login(token)
+        snapshot = await SnapshotRefresher(client.http, guild_id).refresh_snapshot(
+            GuildSnapshot.load(path)
+        )
+    snapshot.save(path)
+    return snapshot
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Final
+
+import discord
+
+from discord_guild_configurator.diff import ConfigDiff, diff_observed_objects
+from discord_guild_configurator.exporter import GuildExporter
+from discord_guild_configurator.models import (
+    Category,
+    CommunityFeatures,
+    ForumChannel,
+    SystemChannel,
+    TextChannel,
+    get_template_key,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Mapping
+
+    from discord_guild_configurator.configurator import GuildConfigurator
+    from discord_guild_configurator.models import ChannelTemplate, GuildConfig, Role
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteVerifier:
+    def __init__(
+        self, configurator: GuildConfigurator, *, max_retries: int = 1, max_concurrency: int = 5
+    ) -> None:
+        """Verify that Discord stored the roles, channels, and guild settings a configurator wrote.
+
+        Only objects which the configurator created or changed are fetched again. All roles and
+        all channels are fetched with one request each. Channel histories are only fetched for
+        channels whose messages were written, with at most `max_concurrency` requests in flight.
+        Guild settings are only verified if they were changed, using the guild Discord returned
+        for the last change. The fetched objects are compared to the configuration with the same
+        diff engine as 'discord-guild plan'.
+
+        Divergent objects and guild settings are applied again, up to `max_retries` times.
+        """
+        self.configurator: Final[GuildConfigurator] = configurator
+        self.max_retries: Final[int] = max_retries
+        self._exporter: Final = GuildExporter(configurator.guild, max_concurrency=max_concurrency)
+
+    @property
+    def guild(self) -> discord.Guild:
+        return self.configurator.guild
+
+    async def verify(self, template: GuildConfig) -> ConfigDiff:
+        """Verify all objects written so far, and return the divergences which remain."""
+        object_ids = set(self.configurator.written_ids)
+        message_channel_ids = set(self.configurator.written_message_channel_ids)
+        logger.info("Verifying %d written objects", len(object_ids | message_channel_ids))
+        diff = await self.diff_objects(template, object_ids, message_channel_ids)
+
+        for attempt in range(1, self.max_retries + 1):
+            if diff.is_empty():
+                break
+            logger.warning(
+                "Written objects differ from the configuration, applying them again (attempt %d):"
+                " %s",
+                attempt,
+                diff,
+            )
+            await self.configurator.apply_changes(template, diff)
+            message_channel_ids = set()
+            for change in diff.channels:
+                channel = self.configurator.find_text_channel(change.name)
+                if change.messages_changed and channel is not None:
+                    message_channel_ids.add(channel.id)
+            # objects created by the retry are verified as well
+            diff = await self.diff_objects(
+                template, self.configurator.written_ids, message_channel_ids
+            )
+
+        if diff.is_empty():
+            logger.info("All written objects match the configuration")
+        else:
+            logger.error("Written objects differ from the configuration: %s", diff)
+        return diff
+
+    async def diff_objects(
+        self,
+        template: GuildConfig,
+        object_ids: Collection[int],
+        message_channel_ids: Collection[int],
+    ) -> ConfigDiff:
+        """Fetch the configured objects with the given IDs, and compare them to `template`.
+
+        Default messages are only compared for channels in `message_channel_ids`.
+        """
+        written_guild = self.configurator.written_guild
+        if not object_ids and not message_channel_ids and written_guild is None:
+            return ConfigDiff()
+
+        fetched_roles, fetched_channels = await asyncio.gather(
+            self.guild.fetch_roles(), self.guild.fetch_channels()
+        )
+        roles_by_id = {role.id: role for role in fetched_roles}
+        channels_by_id = {channel.id: channel for channel in fetched_channels}
+
+        roles: dict[str, Role | None] = {}
+        for role_template in template.roles:
+            role = self.configurator.find_role(role_template.name)
+            if role is not None and role.id in object_ids:
+                roles[get_template_key(role_template)] = self._observe_role(
+                    role_template, roles_by_id.get(role.id)
+                )
+
+        categories: dict[str, tuple[int, Category] | None] = {}
+        configured_categories: dict[int, Category] = {}
+        for category_template in template.categories:
+            category = self.configurator.find_category(category_template.name)
+            if category is None:
+                continue
+            configured_categories[category.id] = category_template
+            if category.id in object_ids:
+                fetched_category = channels_by_id.get(category.id)
+                categories[get_template_key(category_template)] = (
+                    (fetched_category.position, Category(name=fetched_category.name, channels=[]))
+                    if isinstance(fetched_category, discord.CategoryChannel)
+                    else None
+                )
+
+        role_names = {role_template.name for role_template in template.roles}
+        channel_keys = []
+        observations = []
+        for category_template in template.categories:
+            for channel_template in category_template.channels:
+                channel = self.configurator.find_configured_channel(channel_template)
+                if channel is None or not (
+                    channel.id in object_ids or channel.id in message_channel_ids
+                ):
+                    continue
+                channel_keys.append(get_template_key(channel_template))
+                observations.append(
+                    self._observe_channel(
+                        channel_template,
+                        channels_by_id.get(channel.id),
+                        configured_categories,
+                        role_names=role_names,
+                        include_messages=channel.id in message_channel_ids,
+                    )
+                )
+        channels = dict(zip(channel_keys, await asyncio.gather(*observations), strict=True))
+
+        return diff_observed_objects(
+            template,
+            roles=roles,
+            categories=categories,
+            channels=channels,
+            guild_settings=(
+                None
+                if written_guild is None
+                else self._observe_guild_settings(template, written_guild, channels_by_id)
+            ),
+        )
+
+    def _observe_role(self, role_template: Role, role: discord.Role | None) -> Role | None:
+        if role is None:
+            return None
+        observed_role = self._exporter.export_role(role)
+        if role_template.name == "@everyone":
+            # the configurator never changes the color of '@everyone'
+            return observed_role.model_copy(update={"color": role_template.color})
+        return observed_role
+
+    @staticmethod
+    def _observe_guild_settings(
+        template: GuildConfig,
+        guild: discord.Guild,
+        channels_by_id: Mapping[int, discord.abc.GuildChannel],
+    ) -> GuildConfig:
+        """Observe the system channel and 'COMMUNITY' settings of a guild returned by Discord.
+
+        Only the settings applied by the configurator are observed, all other settings are
+        taken from `template`.
+        """
+        # guilds returned by the REST API have no channels, so channels are resolved by ID
+        channel_ids = {
+            "system": guild._system_channel_id,  # noqa: SLF001 (no public channel ID)
+            "rules": guild._rules_channel_id,  # noqa: SLF001 (no public channel ID)
+            "public_updates": guild._public_updates_channel_id,  # noqa: SLF001 (no public channel ID)
+            "safety_alerts": guild._safety_alerts_channel_id,  # noqa: SLF001 (no public channel ID)
+        }
+
+        def get_channel_name(channel: str) -> str:
+            channel_id = channel_ids[channel]
+            fetched_channel = None if channel_id is None else channels_by_id.get(channel_id)
+            return str(channel_id) if fetched_channel is None else fetched_channel.name
+
+        flags = guild.system_channel_flags
+        system_channel = SystemChannel(
+            name=get_channel_name("system"),
+            guild_reminder_notifications=flags.guild_reminder_notifications,
+            join_notification_replies=flags.join_notification_replies,
+            join_notifications=flags.join_notifications,
+            premium_subscriptions=flags.premium_subscriptions,
+            role_subscription_purchase_notification_replies=flags.role_subscription_purchase_notification_replies,
+            role_subscription_purchase_notifications=flags.role_subscription_purchase_notifications,
+        )
+        community_features = None
+        if "COMMUNITY" in guild.features:
+            community_features = CommunityFeatures(
+                guild_description=guild.description,
+                rules_channel=get_channel_name("rules"),
+                public_updates_channel=get_channel_name("public_updates"),
+                safety_alerts_channel=get_channel_name("safety_alerts"),
+            )
+        return template.model_copy(
+            update={"system_channel": system_channel, "community_features": community_features}
+        )
+
+    async def _observe_channel(
+        self,
+        channel_template: ChannelTemplate,
+        channel: discord.abc.GuildChannel | None,
+        configured_categories: Mapping[int, Category],
+        *,
+        role_names: set[str],
+        include_messages: bool,
+    ) -> tuple[Category, ChannelTemplate, int] | None:
+        if not isinstance(
+            channel, (discord.TextChannel, discord.ForumChannel, discord.VoiceChannel)
+        ):
+            return None
+
+        # observed overwrites are complete, so the observed category has none
+        overwrites = self._exporter.fold_overwrites(
+            self._exporter.get_overwrites_by_role(channel.overwrites, role_names)
+        )
+        observed_channel = await self._exporter.export_channel(
+            channel, overwrites, include_messages=include_messages
+        )
+        if isinstance(observed_channel, TextChannel) and isinstance(channel_template, TextChannel):
+            if not include_messages:
+                observed_channel = observed_channel.model_copy(
+                    update={"channel_messages": channel_template.channel_messages}
+                )
+        elif isinstance(observed_channel, ForumChannel) and isinstance(
+            channel_template, ForumChannel
+        ):
+            # the configurator keeps unconfigured tags after the configured ones
+            observed_channel = observed_channel.model_copy(
+                update={"tags": observed_channel.tags[: len(channel_template.tags)]}
+            )
+
+        category_template = (
+            None if channel.category_id is None else configured_categories.get(channel.category_id)
+        )
+        if category_template is None:
+            observed_category = Category(name=str(channel.category_id), channels=[])
+        else:
+            observed_category = category_template.model_copy(
+                update={"channels": [], "permission_overwrites": [], "overwrite_sets": []}
+            )
+        return observed_category, observed_channel, channel.position
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Final
+
+import discord
+
+from discord_guild_configurator.chunked_config import load_config
+from discord_guild_configurator.diff import diff_configs
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from discord.ext.commands import Bot
+
+    from discord_guild_configurator.configurator import GuildConfigurator
+    from discord_guild_configurator.models import GuildConfig
+
+logger = logging.getLogger(__name__)
+
+
+class DriftWatcher:
+    def __init__(
+        self,
+        configurator: GuildConfigurator,
+        template: GuildConfig,
+        *,
+        debounce_delay: float = 0.25,
+        max_reconciliations_per_minute: int = 5,
+    ) -> None:
+        """Revert manual changes to configured objects as soon as Discord reports them.
+
+        Gateway events only mark the touched objects as pending. Once no new event arrived for
+        `debounce_delay` seconds, only the pending objects are reconciled.
+
+        Objects which are reconciled more than `max_reconciliations_per_minute` times are
+        skipped, to avoid fighting endlessly with Discord or another bot.
+        """
+        self.configurator: Final[GuildConfigurator] = configurator
+        self.template: GuildConfig = template
+        self.debounce_delay: Final[float] = debounce_delay
+        self.max_reconciliations_per_minute: Final[int] = max_reconciliations_per_minute
+
+        self._pending_roles: set[str] = set()
+        self._pending_categories: set[str] = set()
+        self._pending_channels: set[str] = set()
+        self._pending_message_channels: set[str] = set()
+        self._pending_guild_settings = False
+
+        self._debounce_task: asyncio.Task[None] | None = None
+        self._reconcile_lock: Final = asyncio.Lock()
+        self._background_tasks: Final[set[asyncio.Task[None]]] = set()
+        self._reconciliation_times: Final[defaultdict[str, deque[float]]] = defaultdict(deque)
+
+    @property
+    def guild(self) -> discord.Guild:
+        return self.configurator.guild
+
+    def register(self, bot: Bot) -> None:
+        """Register the event listeners on the bot."""
+        bot.add_listener(self.on_guild_channel_update)
+        bot.add_listener(self.on_guild_channel_delete)
+        bot.add_listener(self.on_guild_role_update)
+        bot.add_listener(self.on_guild_role_delete)
+        bot.add_listener(self.on_guild_update)
+        bot.add_listener(self.on_raw_message_edit)
+        bot.add_listener(self.on_raw_message_delete)
+        bot.add_listener(self.on_raw_bulk_message_delete)
+
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        if after.guild.id == self.guild.id:
+            # the name might be the modified property, so both names are relevant
+            self._mark_channel(before)
+            self._mark_channel(after)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        if channel.guild.id == self.guild.id:
+            self._mark_channel(channel)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        if after.guild.id == self.guild.id:
+            self._pending_roles.update((before.name, after.name))
+            self._schedule_reconciliation()
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        if role.guild.id == self.guild.id:
+            self._pending_roles.add(role.name)
+            self._schedule_reconciliation()
+
+    async def on_guild_update(self, _before: discord.Guild, after: discord.Guild) -> None:
+        if after.id == self.guild.id:
+            self._pending_guild_settings = True
+            self._schedule_reconciliation()
+
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        self._mark_channel_messages(payload.guild_id, payload.channel_id)
+
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        self._mark_channel_messages(payload.guild_id, payload.channel_id)
+
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        self._mark_channel_messages(payload.guild_id, payload.channel_id)
+
+    def _mark_channel(self, channel: discord.abc.GuildChannel) -> None:
+        if isinstance(channel, discord.CategoryChannel):
+            self._pending_categories.add(channel.name)
+        else:
+            self._pending_channels.add(channel.name)
+        self._schedule_reconciliation()
+
+    def _mark_channel_messages(self, guild_id: int | None, channel_id: int) -> None:
+        if guild_id != self.guild.id:
+            return
+        channel = self.guild.get_channel(channel_id)
+        if channel is None:
+            return
+        self._pending_message_channels.add(channel.name)
+        self._schedule_reconciliation()
+
+    def _schedule_reconciliation(self) -> None:
+        if self._debounce_task is not None and not self._debounce_task.done():
+            self._debounce_task.cancel()
+        self._debounce_task = asyncio.create_task(self._reconcile_after_delay())
+
+    async def _reconcile_after_delay(self) -> None:
+        await asyncio.sleep(self.debounce_delay)
+        # the reconciliation must not be cancelled by new events, so it runs in its own task
+        task = asyncio.create_task(self.reconcile_pending())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def reconcile_pending(self) -> None:
+        """Reconcile all objects which were touched since the last reconciliation."""
+        async with self._reconcile_lock:
+            roles, self._pending_roles = self._pending_roles, set()
+            categories, self._pending_categories = self._pending_categories, set()
+            channels, self._pending_channels = self._pending_channels, set()
+            message_channels, self._pending_message_channels = (
+                self._pending_message_channels,
+                set(),
+            )
+            guild_settings, self._pending_guild_settings = self._pending_guild_settings, False
+
+            try:
+                for name in roles:
+                    if self._allow_reconciliation(f"role:{name}"):
+                        await self.configurator.reconcile_role(self.template, name)
+                for name in categories:
+                    if self._allow_reconciliation(f"category:{name}"):
+                        await self.configurator.reconcile_category(self.template, name)
+                for name in channels | message_channels:
+                    if self._allow_reconciliation(f"channel:{name}"):
+                        await self.configurator.reconcile_channel(
+                            self.template, name, include_messages=name in message_channels
+                        )
+                if guild_settings and self._allow_reconciliation("guild"):
+                    await self.configurator.reconcile_guild_settings(self.template)
+            except (discord.HTTPException, RuntimeError):
+                logger.exception("Reconciliation failed")
+
+    def _allow_reconciliation(self, key: str) -> bool:
+        now = time.monotonic()
+        reconciliation_times = self._reconciliation_times[key]
+        while reconciliation_times and reconciliation_times[0] < now - 60:
+            reconciliation_times.popleft()
+        if len(reconciliation_times) >= self.max_reconciliations_per_minute:
+            logger.warning("Skip reconciliation of %s: Changed too often", key)
+            return False
+        reconciliation_times.append(now)
+        return True
+
+
+class ConfigFileWatcher:
+    def __init__(
+        self,
+        configurator: GuildConfigurator,
+        config_file: Path,
+        template: GuildConfig,
+        *,
+        poll_interval: float = 0.5,
+        drift_watcher: DriftWatcher | None = None,
+    ) -> None:
+        """Apply changes to the configuration file while the bot stays connected.
+
+        The file is polled every `poll_interval` seconds. When it changed, the new configuration
+        is validated and only the difference to the previously applied configuration is applied.
+        Invalid configurations are logged and ignored.
+
+        If a `drift_watcher` is given, it is switched to the new configuration.
+        """
+        self.configurator: Final[GuildConfigurator] = configurator
+        self.config_file: Final[Path] = config_file
+        self.template: GuildConfig = template
+        self.poll_interval: Final[float] = poll_interval
+        self.drift_watcher: Final[DriftWatcher | None] = drift_watcher
+
+        self._last_modification = self._get_modification_time()
+
+    def _get_modification_time(self) -> int | None:
+        try:
+            if self.config_file.is_dir():
+                # chunks can be edited without changing the directory
+                return max(
+                    path.stat().st_mtime_ns
+                    for path in [self.config_file, *self.config_file.glob("*.json")]
+                )
+            return self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def run(self) -> None:
+        """Watch the configuration file until cancelled."""
+        logger.info("Watching configuration file %s", self.config_file)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            modification = self._get_modification_time()
+            if modification is None or modification == self._last_modification:
+                continue
+            self._last_modification = modification
+            await self.reload()
+
+    async def reload(self) -> None:
+        """Load the configuration file and apply the changes."""
+        try:
+            new_template = load_config(self.config_file)
+        except (OSError, ValueError):
+            logger.exception("Could not load configuration file %s", self.config_file)
+            return
+
+        diff = diff_configs(self.template, new_template)
+        if diff.is_empty():
+            logger.info("Configuration file changed, but the configuration is the same")
+            return
+
+        logger.info("Applying configuration changes: %s", diff)
+        try:
+            await self.configurator.apply_changes(new_template, diff)
+        except (discord.HTTPException, RuntimeError, ValueError):
+            logger.exception("Could not apply configuration changes")
+            return
+
+        self.template = new_template
+        if self.drift_watcher is not None:
+            self.drift_watcher.template = new_template